@@ -16,3 +16,86 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+
+import os
+
+from airflow import settings
+from airflow.exceptions import DagNotFound, TaskNotFound
+from airflow.models import DagBag, DagModel
+from airflow.utils.file import correct_maybe_zipped
+
+# The DAGs used by the API in this process by dag_id, with the location and
+# modification time of their file and the expiration date of their DagModel
+# when they were loaded
+_dag_cache = {}
+
+
+def _get_file_mtime(fileloc):
+    try:
+        return os.path.getmtime(fileloc)
+    except (OSError, TypeError):
+        return None
+
+
+def _get_dag_file(fileloc):
+    # The module of a zipped DAG is located inside the zip archive, and
+    # the DAGs folder is parsed when the file is not found at all
+    if fileloc and not os.path.isfile(fileloc):
+        fileloc = correct_maybe_zipped(fileloc)
+    if fileloc and os.path.isfile(fileloc):
+        return fileloc
+    return settings.DAGS_FOLDER
+
+
+def get_dag(dag_model):
+    """
+    Returns the DAG of a DagModel, parsing only the file or zip archive the
+    DAG is defined in. The DAG is kept for the following calls until this
+    file is modified or the DAG is expired, e.g. from the "Refresh" button of
+    the UI. If the file does not exist anymore, the whole DAGs folder is
+    parsed and the DAG is not kept.
+
+    :param dag_model: the DagModel of the DAG
+    :type dag_model: airflow.models.DagModel
+    :return: the DAG, or None if its file does not define it anymore
+    :rtype: airflow.models.DAG
+    """
+    fileloc = _get_dag_file(dag_model.fileloc)
+    mtime = _get_file_mtime(fileloc) if os.path.isfile(fileloc) else None
+    version = (fileloc, mtime, dag_model.last_expired)
+    cached = _dag_cache.get(dag_model.dag_id)
+    if cached is not None and mtime is not None and cached[0] == version:
+        return cached[1]
+
+    dag = DagBag(dag_folder=fileloc, include_examples=False).dags.get(dag_model.dag_id)
+    if dag is None or mtime is None:
+        _dag_cache.pop(dag_model.dag_id, None)
+    else:
+        _dag_cache[dag_model.dag_id] = (version, dag)
+    return dag
+
+
+def check_and_get_dag(dag_id, task_id=None):
+    """
+    Returns the DAG identified by dag_id, checking that it exists and, when
+    task_id is given, that it has this task.
+
+    :param dag_id: the id of the DAG
+    :type dag_id: str
+    :param task_id: the id of a task the DAG must have
+    :type task_id: str
+    :rtype: airflow.models.DAG
+    """
+    dag_model = DagModel.get_current(dag_id)
+    if dag_model is None:
+        raise DagNotFound("Dag id {} not found in DagModel".format(dag_id))
+
+    dag = get_dag(dag_model)
+    if dag is None:
+        error_message = "Dag id {} not found".format(dag_id)
+        raise DagNotFound(error_message)
+
+    if task_id and not dag.has_task(task_id):
+        error_message = 'Task {} not found in dag {}'.format(task_id, dag_id)
+        raise TaskNotFound(error_message)
+    return dag
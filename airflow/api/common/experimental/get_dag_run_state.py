@@ -17,22 +17,14 @@
 # specific language governing permissions and limitations
 # under the License.
 
-from airflow.exceptions import DagNotFound, DagRunNotFound
-from airflow.models import DagBag
+from airflow.api.common.experimental import check_and_get_dag
+from airflow.exceptions import DagRunNotFound
 
 
 def get_dag_run_state(dag_id, execution_date):
     """Return the task object identified by the given dag_id and task_id."""
 
-    dagbag = DagBag()
-
-    # Check DAG exists.
-    if dag_id not in dagbag.dags:
-        error_message = "Dag id {} not found".format(dag_id)
-        raise DagNotFound(error_message)
-
-    # Get DAG object and check Task Exists
-    dag = dagbag.get_dag(dag_id)
+    dag = check_and_get_dag(dag_id)
 
     # Get DagRun object and check that it exists
     dagrun = dag.get_dagrun(execution_date=execution_date)
@@ -18,8 +18,8 @@
 # under the License.
 from flask import url_for
 
-from airflow.exceptions import AirflowException
-from airflow.models import DagBag, DagRun
+from airflow.api.common.experimental import check_and_get_dag
+from airflow.models import DagRun
 
 
 def get_dag_runs(dag_id, state=None):
@@ -30,12 +30,7 @@ def get_dag_runs(dag_id, state=None):
     :return: List of DAG runs of a DAG with requested state,
     or all runs if the state is not specified
     """
-    dagbag = DagBag()
-
-    # Check DAG exists.
-    if dag_id not in dagbag.dags:
-        error_message = "Dag id {} not found".format(dag_id)
-        raise AirflowException(error_message)
+    check_and_get_dag(dag_id)
 
     dag_runs = list()
     state = state.lower() if state else None
@@ -17,26 +17,14 @@
 # specific language governing permissions and limitations
 # under the License.
 
-from airflow.exceptions import (DagNotFound, TaskNotFound,
-                                DagRunNotFound, TaskInstanceNotFound)
-from airflow.models import DagBag
+from airflow.api.common.experimental import check_and_get_dag
+from airflow.exceptions import DagRunNotFound, TaskInstanceNotFound
 
 
 def get_task_instance(dag_id, task_id, execution_date):
     """Return the task object identified by the given dag_id and task_id."""
 
-    dagbag = DagBag()
-
-    # Check DAG exists.
-    if dag_id not in dagbag.dags:
-        error_message = "Dag id {} not found".format(dag_id)
-        raise DagNotFound(error_message)
-
-    # Get DAG object and check Task Exists
-    dag = dagbag.get_dag(dag_id)
-    if not dag.has_task(task_id):
-        error_message = 'Task {} not found in dag {}'.format(task_id, dag_id)
-        raise TaskNotFound(error_message)
+    dag = check_and_get_dag(dag_id, task_id)
 
     # Get DagRun object and check that it exists
     dagrun = dag.get_dagrun(execution_date=execution_date)
@@ -176,6 +176,13 @@ def set_state(task, execution_date, upstream=False, downstream=False,
             tis_altered += qry_sub_dag.with_for_update().all()
         for ti in tis_altered:
             ti.state = state
+        # the altered task instances are not tracked by the incremental
+        # scheduler, make it examine the affected dag runs in full
+        session.query(DagRun).filter(
+            DagRun.dag_id.in_([dag.dag_id] + sub_dag_ids),
+            DagRun.execution_date.in_(confirmed_dates)
+        ).update({DagRun.last_scheduling_decision: None},
+                 synchronize_session='fetch')
     else:
         tis_altered = qry_dag.all()
         if len(sub_dag_ids) > 0:
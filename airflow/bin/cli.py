@@ -66,6 +66,7 @@ from airflow.utils.log.logging_mixin import (LoggingMixin, redirect_stderr,
                                              redirect_stdout)
 from airflow.www.app import cached_app, create_app, cached_appbuilder
 
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import exc
 
 api.load_auth()
@@ -138,8 +139,48 @@ def process_subdir(subdir):
         return subdir
 
 
+def _get_dag_fileloc(dag_id, dag_folder):
+    """
+    Returns the file a DAG was last loaded from by the scheduler, as recorded by
+    DAG.sync_to_db, when the file is in the given folder.
+
+    :param dag_id: the DAG to look up
+    :type dag_id: unicode
+    :param dag_folder: the folder the DAG should be loaded from
+    :type dag_folder: unicode
+    :rtype: unicode
+    """
+    dag_folder = os.path.realpath(dag_folder or settings.DAGS_FOLDER)
+    if not os.path.isdir(dag_folder):
+        return None
+
+    try:
+        with db.create_session() as session:
+            dag_model = session.query(DagModel).filter(DagModel.dag_id == dag_id).first()
+    except SQLAlchemyError:
+        # The metadata database is not needed by every command using get_dag
+        logging.debug("Could not look up the file of %s", dag_id, exc_info=True)
+        return None
+
+    fileloc = dag_model and dag_model.fileloc
+    if (fileloc and os.path.isfile(fileloc) and
+            os.path.realpath(fileloc).startswith(dag_folder + os.sep)):
+        return fileloc
+    return None
+
+
 def get_dag(args):
-    dagbag = DagBag(process_subdir(args.subdir))
+    subdir = process_subdir(args.subdir)
+
+    # Only parse the file of the DAG when it is known, instead of the whole folder
+    fileloc = _get_dag_fileloc(args.dag_id, subdir)
+    if fileloc:
+        dagbag = DagBag(fileloc, include_examples=False)
+        if args.dag_id in dagbag.dags:
+            return dagbag.dags[args.dag_id]
+        # The DAG moved to another file, or is a SubDAG created in another module
+
+    dagbag = DagBag(subdir)
     if args.dag_id not in dagbag.dags:
         raise AirflowException(
             'dag_id could not be found: {}. Either the dag did not exist or it failed to '
@@ -1000,7 +1041,9 @@ def scheduler(args):
         dag_id=args.dag_id,
         subdir=process_subdir(args.subdir),
         num_runs=args.num_runs,
-        do_pickle=args.do_pickle)
+        do_pickle=args.do_pickle,
+        profile_loops=args.profile_loops,
+        profile_file=args.profile_file)
 
     if args.daemon:
         pid, stdout, stderr, log_file = setup_locations("scheduler",
@@ -1030,9 +1073,11 @@ def scheduler(args):
         job.run()
 
 
-@cli_utils.action_logging
-def serve_logs(args):
-    print("Starting flask")
+def create_serve_logs_app():
+    """
+    Creates the app serving the task logs of a worker to the webserver. Byte
+    ranges of the logs can be requested with the Range header.
+    """
     import flask
     flask_app = flask.Flask(__name__)
 
@@ -1043,8 +1088,16 @@ def serve_logs(args):
             log,
             filename,
             mimetype="application/json",
-            as_attachment=False)
+            as_attachment=False,
+            conditional=True)
 
+    return flask_app
+
+
+@cli_utils.action_logging
+def serve_logs(args):
+    print("Starting flask")
+    flask_app = create_serve_logs_app()
     worker_log_server_port = int(conf.get('celery', 'WORKER_LOG_SERVER_PORT'))
     flask_app.run(host='0.0.0.0', port=worker_log_server_port)
 
@@ -1983,6 +2036,14 @@ class CLIFactory(object):
             ("-n", "--num_runs"),
             default=-1, type=int,
             help="Set the number of runs to execute before exiting"),
+        'profile_loops': Arg(
+            ("--profile_loops",),
+            default=0, type=int,
+            help="Capture a cProfile dump of the first N scheduler loops"),
+        'profile_file': Arg(
+            ("--profile_file",),
+            help="File to write the cProfile dump to, "
+                 "defaults to $AIRFLOW_HOME/scheduler.prof"),
         # worker
         'do_pickle': Arg(
             ("-p", "--do_pickle"),
@@ -2310,7 +2371,7 @@ class CLIFactory(object):
             'help': "Start a scheduler instance",
             'args': ('dag_id_opt', 'subdir', 'num_runs',
                      'do_pickle', 'pid', 'daemon', 'stdout', 'stderr',
-                     'log_file'),
+                     'log_file', 'profile_loops', 'profile_file'),
         }, {
             'func': worker,
             'help': "Start a Celery worker node",
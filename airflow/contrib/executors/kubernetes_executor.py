@@ -18,12 +18,16 @@
 import base64
 import json
 import multiprocessing
-from queue import Queue
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+from queue import Empty, Queue
 from dateutil import parser
 from uuid import uuid4
 import kubernetes
 from kubernetes import watch, client
 from kubernetes.client.rest import ApiException
+from sqlalchemy import and_, or_
 from airflow.configuration import conf
 from airflow.contrib.kubernetes.pod_launcher import PodLauncher
 from airflow.contrib.kubernetes.kube_client import get_kube_client
@@ -32,8 +36,10 @@ from airflow.executors.base_executor import BaseExecutor
 from airflow.executors import Executors
 from airflow.models import TaskInstance
 from airflow.models.kubernetes import KubeResourceVersion, KubeWorkerIdentifier
+from airflow.settings import Stats
 from airflow.utils.state import State
 from airflow.utils.db import provide_session, create_session
+from airflow.utils.helpers import chunks
 from airflow import configuration
 from airflow.exceptions import AirflowConfigException, AirflowException
 from airflow.utils.log.logging_mixin import LoggingMixin
@@ -139,6 +145,10 @@ class KubeConfig:
             self.kubernetes_section, 'delete_worker_pods')
         self.worker_pods_creation_batch_size = conf.getint(
             self.kubernetes_section, 'worker_pods_creation_batch_size')
+        self.worker_pods_creation_concurrency = conf.getint(
+            self.kubernetes_section, 'worker_pods_creation_concurrency')
+        self.worker_pods_creation_backoff = conf.getfloat(
+            self.kubernetes_section, 'worker_pods_creation_backoff')
         self.worker_service_account_name = conf.get(
             self.kubernetes_section, 'worker_service_account_name')
         self.image_pull_secrets = conf.get(self.kubernetes_section, 'image_pull_secrets')
@@ -254,12 +264,19 @@ class KubeConfig:
 
 
 class KubernetesJobWatcher(multiprocessing.Process, LoggingMixin, object):
+    # The number of finished pods remembered, finished pods that are not
+    # deleted, e.g. when delete_worker_pods is False, are forgotten oldest first
+    finished_pods_max_size = 10000
+
     def __init__(self, namespace, watcher_queue, resource_version, worker_uuid):
         multiprocessing.Process.__init__(self)
         self.namespace = namespace
         self.worker_uuid = worker_uuid
         self.watcher_queue = watcher_queue
         self.resource_version = resource_version
+        # The final state reported for every pod, so that the events replayed
+        # when the watch restarts don't report it again
+        self._finished_pods = OrderedDict()
 
     def run(self):
         kube_client = get_kube_client()
@@ -289,7 +306,7 @@ class KubernetesJobWatcher(multiprocessing.Process, LoggingMixin, object):
         for event in watcher.stream(kube_client.list_namespaced_pod, self.namespace,
                                     **kwargs):
             task = event['object']
-            self.log.info(
+            self.log.debug(
                 'Event: %s had an event of type %s',
                 task.metadata.name, event['type']
             )
@@ -299,6 +316,9 @@ class KubernetesJobWatcher(multiprocessing.Process, LoggingMixin, object):
                 task.metadata.name, task.status.phase, task.metadata.labels,
                 task.metadata.resource_version
             )
+            if event['type'] == 'DELETED':
+                # A deleted pod has no more events
+                self._finished_pods.pop(task.metadata.name, None)
             last_resource_version = task.metadata.resource_version
 
         return last_resource_version
@@ -323,15 +343,20 @@ class KubernetesJobWatcher(multiprocessing.Process, LoggingMixin, object):
 
     def process_status(self, pod_id, status, labels, resource_version):
         if status == 'Pending':
-            self.log.info('Event: %s Pending', pod_id)
-        elif status == 'Failed':
-            self.log.info('Event: %s Failed', pod_id)
-            self.watcher_queue.put((pod_id, State.FAILED, labels, resource_version))
-        elif status == 'Succeeded':
-            self.log.info('Event: %s Succeeded', pod_id)
-            self.watcher_queue.put((pod_id, None, labels, resource_version))
+            self.log.debug('Event: %s Pending', pod_id)
+        elif status in ('Failed', 'Succeeded'):
+            if self._finished_pods.get(pod_id) == status:
+                self.log.debug('Event: %s already reported as %s', pod_id, status)
+                return
+            self.log.info('Event: %s %s', pod_id, status)
+            self._finished_pods.pop(pod_id, None)
+            self._finished_pods[pod_id] = status
+            while len(self._finished_pods) > self.finished_pods_max_size:
+                self._finished_pods.popitem(last=False)
+            state = State.FAILED if status == 'Failed' else None
+            self.watcher_queue.put((pod_id, state, labels, resource_version))
         elif status == 'Running':
-            self.log.info('Event: %s is Running', pod_id)
+            self.log.debug('Event: %s is Running', pod_id)
         else:
             self.log.warn(
                 'Event: Invalid state: %s on pod: %s with labels: %s with '
@@ -353,6 +378,7 @@ class AirflowKubernetesScheduler(LoggingMixin):
         self.watcher_queue = multiprocessing.Queue()
         self.worker_uuid = worker_uuid
         self.kube_watcher = self._make_kube_watcher()
+        self._launch_pool = None
 
     def _make_kube_watcher(self):
         resource_version = KubeResourceVersion.get_current_resource_version()
@@ -379,20 +405,63 @@ class AirflowKubernetesScheduler(LoggingMixin):
         status
         """
         self.log.info('Kubernetes job is %s', str(next_job))
+        pod = self._make_pod(next_job)
+        # the watcher will monitor pods, so we do not block.
+        self.launcher.run_pod_async(pod)
+        self.log.debug("Kubernetes Job created!")
+
+    def launch_pods(self, next_jobs):
+        """
+        Creates the pods of several jobs, with at most
+        ``worker_pods_creation_concurrency`` creation calls in flight. The pods
+        are all built before the first one is created.
+
+        :param next_jobs: the jobs taken from the task_queue
+        :type next_jobs: list[tuple]
+        :return: the job, the ApiException raised when creating its pod or None,
+            and the time the creation call returned, for every job
+        :rtype: list[tuple]
+        """
+        self.log.info('Launching %s Kubernetes job(s)', len(next_jobs))
+        jobs_and_pods = [(next_job, self._make_pod(next_job)) for next_job in next_jobs]
+
+        concurrency = min(self.kube_config.worker_pods_creation_concurrency,
+                          len(jobs_and_pods))
+        if concurrency <= 1:
+            return [self._launch_pod(job_and_pod) for job_and_pod in jobs_and_pods]
+        if self._launch_pool is None:
+            self._launch_pool = ThreadPool(
+                processes=self.kube_config.worker_pods_creation_concurrency)
+        return self._launch_pool.map(self._launch_pod, jobs_and_pods, chunksize=1)
+
+    def _launch_pod(self, job_and_pod):
+        next_job, pod = job_and_pod
+        try:
+            # the watcher will monitor pods, so we do not block.
+            self.launcher.run_pod_async(pod)
+            error = None
+        except ApiException as e:
+            error = e
+        return next_job, error, time.time()
+
+    def _make_pod(self, next_job):
         key, command, kube_executor_config = next_job
         dag_id, task_id, execution_date, try_number = key
         self.log.debug("Kubernetes running for command %s", command)
         self.log.debug("Kubernetes launching image %s", self.kube_config.kube_image)
-        pod = self.worker_configuration.make_pod(
+        return self.worker_configuration.make_pod(
             namespace=self.namespace, worker_uuid=self.worker_uuid,
             pod_id=self._create_pod_id(dag_id, task_id),
             dag_id=dag_id, task_id=task_id, try_number=try_number,
             execution_date=self._datetime_to_label_safe_datestring(execution_date),
             airflow_command=command, kube_executor_config=kube_executor_config
         )
-        # the watcher will monitor pods, so we do not block.
-        self.launcher.run_pod_async(pod)
-        self.log.debug("Kubernetes Job created!")
+
+    def terminate(self):
+        if self._launch_pool is not None:
+            self._launch_pool.close()
+            self._launch_pool.join()
+            self._launch_pool = None
 
     def delete_pod(self, pod_id):
         if self.kube_config.delete_worker_pods:
@@ -414,11 +483,23 @@ class AirflowKubernetesScheduler(LoggingMixin):
 
         """
         self._health_check_kube_watcher()
-        while not self.watcher_queue.empty():
-            self.process_watcher_task()
 
-    def process_watcher_task(self):
-        pod_id, state, labels, resource_version = self.watcher_queue.get()
+        # Drain the events of the watcher in one batch, keeping only the last
+        # event of every pod. The last event of the batch comes last.
+        pod_events = OrderedDict()
+        while True:
+            try:
+                task = self.watcher_queue.get_nowait()
+            except Empty:
+                break
+            pod_events.pop(task[0], None)
+            pod_events[task[0]] = task
+
+        for task in pod_events.values():
+            self.process_watcher_task(task)
+
+    def process_watcher_task(self, task):
+        pod_id, state, labels, resource_version = task
         self.log.info(
             'Attempting to finish pod; pod_id: %s; state: %s; labels: %s',
             pod_id, state, labels
@@ -519,6 +600,11 @@ class AirflowKubernetesScheduler(LoggingMixin):
 
 
 class KubernetesExecutor(BaseExecutor, LoggingMixin):
+    # The number of task instances updated by a single UPDATE statement
+    STATE_UPDATE_CHUNK_SIZE = 100
+    # The longest wait before retrying to create a pod, in seconds
+    MAX_POD_CREATION_BACKOFF = 300
+
     def __init__(self):
         self.kube_config = KubeConfig()
         self.task_queue = None
@@ -526,6 +612,13 @@ class KubernetesExecutor(BaseExecutor, LoggingMixin):
         self.kube_scheduler = None
         self.kube_client = None
         self.worker_uuid = None
+        # When the tasks were handed to the executor, to measure the pod launch latency
+        self._queued_times = {}
+        # The number of failed pod creations, the time to retry at and when the task
+        # was handed to the executor, by task
+        self._pod_creation_retries = {}
+        # Set by end(), the tasks that fail or are backing off are dropped instead of retried
+        self._stopping = False
         super(KubernetesExecutor, self).__init__(parallelism=self.kube_config.parallelism)
 
     @provide_session
@@ -631,6 +724,7 @@ class KubernetesExecutor(BaseExecutor, LoggingMixin):
             key, command, executor_config
         )
         kube_executor_config = KubernetesExecutorConfig.from_dict(executor_config)
+        self._queued_times[key] = time.time()
         self.task_queue.put((key, command, kube_executor_config))
 
     def sync(self):
@@ -640,47 +734,115 @@ class KubernetesExecutor(BaseExecutor, LoggingMixin):
             self.log.debug('self.queued: %s', self.queued_tasks)
         self.kube_scheduler.sync()
 
-        last_resource_version = None
+        results = []
         while not self.result_queue.empty():
-            results = self.result_queue.get()
-            key, state, pod_id, resource_version = results
-            last_resource_version = resource_version
-            self.log.info('Changing state of %s to %s', results, state)
-            self._change_state(key, state, pod_id)
+            results.append(self.result_queue.get())
+        if results:
+            self._change_states(results)
+            # The resource version of the last event covers the whole batch
+            KubeResourceVersion.checkpoint_resource_version(results[-1][3])
 
-        KubeResourceVersion.checkpoint_resource_version(last_resource_version)
+        self._launch_queued_tasks()
 
+    def _launch_queued_tasks(self):
+        """
+        Creates the pods of the next batch of queued tasks, skipping the tasks
+        still backing off from a failed pod creation. Once the executor is
+        stopping, these tasks are dropped instead of being queued again.
+        """
+        next_jobs = []
+        now = time.time()
         for i in range(min((self.kube_config.worker_pods_creation_batch_size, self.task_queue.qsize()))):
             task = self.task_queue.get()
+            self.task_queue.task_done()
+            retry = self._pod_creation_retries.get(task[0])
+            if retry and retry[1] > now:
+                if self._stopping:
+                    self._drop_task(task[0])
+                else:
+                    # Still backing off
+                    self.task_queue.put(task)
+            else:
+                next_jobs.append(task)
+
+        if next_jobs:
+            for task, error, launch_time in self.kube_scheduler.launch_pods(next_jobs):
+                key = task[0]
+                queued_time = self._queued_times.pop(key, None)
+                if error is None:
+                    retry = self._pod_creation_retries.pop(key, None)
+                    if retry:
+                        queued_time = retry[2]
+                    if queued_time is not None:
+                        Stats.timing('kubernetes_executor.pod_launch_latency',
+                                     (launch_time - queued_time) * 1000)
+                else:
+                    self._retry_pod_creation(task, error, queued_time)
+
+    def _retry_pod_creation(self, task, error, queued_time=None):
+        key = task[0]
+        Stats.incr('kubernetes_executor.pod_creation_failures')
+        if self._stopping:
+            self.log.error('ApiException when attempting to run task %s: %s', key, error)
+            self._drop_task(key)
+            return
+        attempts, _, first_queued_time = self._pod_creation_retries.get(key, (0, None, queued_time))
+        attempts += 1
+        backoff = min(self.kube_config.worker_pods_creation_backoff * 2 ** (attempts - 1),
+                      self.MAX_POD_CREATION_BACKOFF)
+        self.log.error('ApiException when attempting to run task %s, re-queueing '
+                       'in %.1f seconds: %s', key, backoff, error)
+        self._pod_creation_retries[key] = (attempts, time.time() + backoff, first_queued_time)
+        self.task_queue.put(task)
+
+    def _drop_task(self, key):
+        """
+        Gives up on creating the pod of a task while the executor ends. The
+        task stays queued and is reset by clear_not_launched_queued_tasks on
+        the next start.
+        """
+        self.log.warning('Not launching task %s, the executor is shutting down', key)
+        self._pod_creation_retries.pop(key, None)
+        self._queued_times.pop(key, None)
 
-            try:
-                self.kube_scheduler.run_next(task)
-            except ApiException:
-                self.log.exception('ApiException when attempting ' +
-                                   'to run task, re-queueing.')
-                self.task_queue.put(task)
-
-    def _change_state(self, key, state, pod_id):
-        if state != State.RUNNING:
-            self.kube_scheduler.delete_pod(pod_id)
-            try:
-                self.log.info('Deleted pod: %s', str(key))
-                self.running.pop(key)
-            except KeyError:
-                self.log.debug('Could not find key: %s', str(key))
-                pass
-        self.event_buffer[key] = state
-        (dag_id, task_id, ex_time, try_number) = key
-        with create_session() as session:
-            item = session.query(TaskInstance).filter_by(
-                dag_id=dag_id,
-                task_id=task_id,
-                execution_date=ex_time
-            ).one()
+    def _change_states(self, results):
+        """
+        Reports the pods that finished to the scheduler, and updates the state
+        of their task instances in one transaction.
+
+        :param results: the key, state, pod id and resource version of the pods
+        :type results: list[tuple]
+        """
+        keys_by_state = {}
+        for key, state, pod_id, _ in results:
+            self.log.info('Changing state of %s to %s', key, state)
+            if state != State.RUNNING:
+                self.kube_scheduler.delete_pod(pod_id)
+                try:
+                    self.log.info('Deleted pod: %s', str(key))
+                    self.running.pop(key)
+                except KeyError:
+                    self.log.debug('Could not find key: %s', str(key))
+                    pass
+            self.event_buffer[key] = state
+            self.event_info[key] = {'pod_id': pod_id}
             if state:
-                item.state = state
-                session.add(item)
+                keys_by_state.setdefault(state, []).append(key)
+
+        with create_session() as session:
+            for state, keys in keys_by_state.items():
+                for keys_chunk in chunks(keys, self.STATE_UPDATE_CHUNK_SIZE):
+                    session.query(TaskInstance).filter(or_(*[
+                        and_(TaskInstance.dag_id == dag_id,
+                             TaskInstance.task_id == task_id,
+                             TaskInstance.execution_date == execution_date)
+                        for dag_id, task_id, execution_date, _ in keys_chunk
+                    ])).update({TaskInstance.state: state}, synchronize_session=False)
 
     def end(self):
         self.log.info('Shutting down Kubernetes executor')
+        self._stopping = True
+        while not self.task_queue.empty():
+            self._launch_queued_tasks()
         self.task_queue.join()
+        self.kube_scheduler.terminate()
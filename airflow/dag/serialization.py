@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""
+Serializes DAGs to JSON so that the webserver can display them without
+importing the DAG files. Only the attributes the webserver needs are kept:
+callables and other objects that cannot be represented in JSON are replaced
+by their string representation.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+try:
+    # Fix Python > 3.7 deprecation
+    from collections.abc import Mapping
+except ImportError:
+    # Preserve Python < 3.3 compatibility
+    from collections import Mapping
+
+import pendulum
+import six
+
+from airflow import configuration, settings
+from airflow.dag.base_dag import BaseDagBag
+from airflow.models import BaseOperator, DAG
+from airflow.models.serialized_dag import SerializedDagModel
+from airflow.utils import timezone
+from airflow.utils.db import provide_session
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+# The attributes of a DAG and of its tasks that are serialized, besides the
+# ones that need special handling
+DAG_FIELDS = (
+    'dag_id', 'description', 'start_date', 'end_date', 'full_filepath', 'fileloc',
+    'template_searchpath', 'concurrency', 'max_active_runs', 'dagrun_timeout',
+    'orientation', 'catchup', 'is_subdag', 'partial', 'params', 'doc_md',
+)
+TASK_FIELDS = (
+    'task_id', 'owner', 'email', 'email_on_retry', 'email_on_failure', 'retries',
+    'retry_delay', 'retry_exponential_backoff', 'max_retry_delay', 'start_date',
+    'end_date', 'depends_on_past', 'wait_for_downstream', 'adhoc', 'priority_weight',
+    'weight_rule', 'queue', 'pool', 'sla', 'execution_timeout', 'trigger_rule',
+    'run_as_user', 'task_concurrency', 'do_xcom_push', 'params',
+    'doc', 'doc_md', 'doc_rst', 'doc_json', 'doc_yaml',
+)
+
+
+def _serialize(value):
+    if value is None or isinstance(value, (bool, float) + six.integer_types + six.string_types):
+        return value
+    if isinstance(value, datetime):
+        return {'__type': 'datetime', '__var': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {'__type': 'timedelta', '__var': value.total_seconds()}
+    if isinstance(value, dict):
+        return {'__type': 'dict',
+                '__var': {six.text_type(k): _serialize(v) for k, v in value.items()}}
+    if isinstance(value, (set, frozenset)):
+        return {'__type': 'set',
+                '__var': sorted((_serialize(v) for v in value), key=six.text_type)}
+    if isinstance(value, (list, tuple)):
+        return [_serialize(v) for v in value]
+    return six.text_type(value)
+
+
+def _deserialize(value):
+    if isinstance(value, list):
+        return [_deserialize(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    type_, var = value['__type'], value['__var']
+    if type_ == 'datetime':
+        return timezone.parse(var)
+    if type_ == 'timedelta':
+        return timedelta(seconds=var)
+    if type_ == 'dict':
+        return {k: _deserialize(v) for k, v in var.items()}
+    if type_ == 'set':
+        return set(_deserialize(v) for v in var)
+    raise ValueError('Unknown serialized type {}'.format(type_))
+
+
+def _timezone_name(tz):
+    # pendulum timezones have a name, pytz ones a zone
+    return getattr(tz, 'name', None) or getattr(tz, 'zone', None)
+
+
+def serialize_task(task):
+    """
+    Returns the JSON compatible representation of a task.
+
+    :param task: the task to serialize
+    :type task: airflow.models.BaseOperator
+    :rtype: dict
+    """
+    data = {field: _serialize(getattr(task, field))
+            for field in TASK_FIELDS if hasattr(task, field)}
+    data.update({
+        'task_type': task.task_type,
+        'ui_color': task.ui_color,
+        'ui_fgcolor': task.ui_fgcolor,
+        'template_fields': list(task.template_fields),
+        'templates': {field: _serialize(getattr(task, field, None))
+                      for field in task.template_fields},
+        'downstream_task_ids': sorted(task.downstream_task_ids),
+    })
+    # A SubDagOperator refers to its sub-DAG, which is serialized on its own
+    subdag = getattr(task, 'subdag', None)
+    if isinstance(subdag, DAG):
+        data['subdag_id'] = subdag.dag_id
+    return data
+
+
+def serialize_dag(dag):
+    """
+    Returns the JSON compatible representation of a DAG and its tasks.
+
+    :param dag: the DAG to serialize
+    :type dag: airflow.models.DAG
+    :rtype: dict
+    """
+    data = {field: _serialize(getattr(dag, field, None)) for field in DAG_FIELDS}
+    data.update({
+        'schedule_interval': _serialize(dag.schedule_interval),
+        'timezone': _timezone_name(dag.timezone),
+        'default_view': dag._default_view,
+        'access_control': _serialize(dag.access_control),
+        'parent_dag_id': dag.parent_dag.dag_id if dag.parent_dag else None,
+        'tasks': [serialize_task(task) for task in dag.tasks],
+    })
+    return data
+
+
+class SerializedBaseOperator(BaseOperator):
+    """
+    A task loaded from its serialized representation. It can be displayed and
+    its templates rendered but it cannot be executed. A subclass named after
+    the original operator is created for every operator, so that the task type,
+    colors and templated fields of the original class are kept.
+
+    The ``subdag`` of a serialized SubDagOperator is set by the
+    ``SerializedDagBag`` from ``subdag_id``.
+    """
+    _classes = {}
+
+    subdag_id = None
+
+    @classmethod
+    def get_class(cls, task_type, ui_color, ui_fgcolor, template_fields):
+        """
+        Returns the subclass standing for an operator.
+
+        :rtype: type
+        """
+        key = (task_type, ui_color, ui_fgcolor, tuple(template_fields))
+        if key not in cls._classes:
+            cls._classes[key] = type(str(task_type), (cls,), {
+                'ui_color': ui_color,
+                'ui_fgcolor': ui_fgcolor,
+                'template_fields': tuple(template_fields),
+            })
+        return cls._classes[key]
+
+    def execute(self, context):
+        raise NotImplementedError('Serialized tasks cannot be executed')
+
+
+def deserialize_task(data, dag):
+    """
+    Rebuilds a task from its serialized representation and adds it to a DAG.
+    The dependencies of the task are not set.
+
+    :param data: the serialized task
+    :type data: dict
+    :param dag: the DAG of the task
+    :type dag: airflow.models.DAG
+    :rtype: SerializedBaseOperator
+    """
+    operator_class = SerializedBaseOperator.get_class(
+        data['task_type'], data['ui_color'], data['ui_fgcolor'], data['template_fields'])
+    task = operator_class(task_id=data['task_id'],
+                          start_date=_deserialize(data.get('start_date')),
+                          dag=dag)
+    for field in TASK_FIELDS:
+        if field in data:
+            setattr(task, field, _deserialize(data[field]))
+    for field, value in data['templates'].items():
+        setattr(task, field, _deserialize(value))
+    task.subdag_id = data.get('subdag_id')
+    return task
+
+
+def deserialize_dag(data):
+    """
+    Rebuilds a DAG and its tasks from their serialized representation. The
+    parent DAG of a sub-DAG is not loaded, see ``parent_dag_id``.
+
+    :param data: the serialized DAG
+    :type data: dict
+    :rtype: airflow.models.DAG
+    """
+    dag = DAG(
+        dag_id=data['dag_id'],
+        schedule_interval=_deserialize(data['schedule_interval']),
+        default_view=data['default_view'],
+        access_control=_deserialize(data['access_control']),
+    )
+    for field in DAG_FIELDS:
+        if field == 'dag_id':
+            continue
+        value = _deserialize(data[field])
+        if field == 'description':
+            dag._description = value
+        else:
+            setattr(dag, field, value)
+    if data['timezone']:
+        dag.timezone = pendulum.timezone(data['timezone'])
+    else:
+        dag.timezone = settings.TIMEZONE
+    dag.parent_dag_id = data['parent_dag_id']
+
+    for task_data in data['tasks']:
+        deserialize_task(task_data, dag)
+    for task_data in data['tasks']:
+        task = dag.get_task(task_data['task_id'])
+        for downstream_task_id in task_data['downstream_task_ids']:
+            task.set_downstream(dag.get_task(downstream_task_id))
+    return dag
+
+
+class SerializedDagBag(BaseDagBag, LoggingMixin):
+    """
+    A DagBag that loads the DAGs serialized by the scheduler from the metadata
+    database instead of importing the DAG files. The DAGs are kept in a least
+    recently used cache keyed by the hash of their serialization, so a DAG is
+    only loaded again once the scheduler stored a new version of it.
+
+    :param cache_size: the number of DAGs kept in the cache
+    :type cache_size: int
+    """
+
+    def __init__(self, cache_size=None):
+        if cache_size is None:
+            cache_size = configuration.conf.getint('webserver', 'serialized_dag_cache_size')
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @property
+    def dags(self):
+        """
+        A read-only mapping of the stored DAGs by dag_id, loaded when accessed.
+        """
+        return _SerializedDags(self)
+
+    @property
+    @provide_session
+    def dag_ids(self, session=None):
+        return [dag_id for dag_id, in session.query(SerializedDagModel.dag_id)]
+
+    @provide_session
+    def size(self, session=None):
+        """
+        :return: the number of stored DAGs
+        :rtype: int
+        """
+        return session.query(SerializedDagModel).count()
+
+    @provide_session
+    def get_dag(self, dag_id, session=None):
+        """
+        Gets the DAG out of the cache, or loads it if it was not cached or if
+        the scheduler stored a new version of it.
+
+        :return: the DAG, or None if no DAG is stored for this dag_id
+        :rtype: airflow.models.DAG
+        """
+        dag = self._get_dag(dag_id, session)
+        if dag is None:
+            return None
+        if dag.parent_dag_id and dag.parent_dag is None:
+            dag.parent_dag = self._get_dag(dag.parent_dag_id, session)
+        for task in dag.tasks:
+            if task.subdag_id is not None:
+                task.subdag = self._get_subdag(task, dag, session)
+        return dag
+
+    def _get_subdag(self, task, dag, session):
+        subdag = self.get_dag(task.subdag_id, session=session)
+        if subdag is None:
+            # The scheduler stores a sub-DAG along with its parent DAG
+            self.log.warning('Sub-DAG %s of %s is not stored yet', task.subdag_id, dag.dag_id)
+            subdag = DAG(dag_id=task.subdag_id, start_date=task.start_date)
+            subdag.is_subdag = True
+        subdag.parent_dag = dag
+        return subdag
+
+    def _get_dag(self, dag_id, session):
+        dag_hash = session.query(SerializedDagModel.dag_hash).filter(
+            SerializedDagModel.dag_id == dag_id).scalar()
+        if dag_hash is None:
+            return None
+
+        # Reinsert the entry to keep the cache in least recently used order
+        dag = self._cache.pop(dag_hash, None)
+        if dag is None:
+            row = session.query(SerializedDagModel.dag_hash, SerializedDagModel.data).filter(
+                SerializedDagModel.dag_id == dag_id).first()
+            if row is None:
+                return None
+            dag_hash, data = row
+            self.log.debug('Loading serialized DAG %s', dag_id)
+            dag = deserialize_dag(json.loads(data))
+        self._cache[dag_hash] = dag
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return dag
+
+    def collect_dags(self, only_if_updated=True):
+        """
+        Empties the cache, the DAGs are loaded again when they are used.
+        """
+        if not only_if_updated:
+            self._cache.clear()
+
+
+class _SerializedDags(Mapping):
+    def __init__(self, dagbag):
+        self._dagbag = dagbag
+
+    def __getitem__(self, dag_id):
+        dag = self._dagbag.get_dag(dag_id)
+        if dag is None:
+            raise KeyError(dag_id)
+        return dag
+
+    @provide_session
+    def __contains__(self, dag_id, session=None):
+        return session.query(SerializedDagModel.dag_id).filter(
+            SerializedDagModel.dag_id == dag_id).scalar() is not None
+
+    def __iter__(self):
+        return iter(self._dagbag.dag_ids)
+
+    def __len__(self):
+        return self._dagbag.size()
@@ -17,13 +17,15 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import time
+
 from builtins import range
-from collections import OrderedDict
 
 # To avoid circular imports
 import airflow.utils.dag_processing
 from airflow import configuration
 from airflow.utils.log.logging_mixin import LoggingMixin
+from airflow.utils.priority_queue import IndexedPriorityQueue
 from airflow.utils.state import State
 
 PARALLELISM = configuration.conf.getint('core', 'PARALLELISM')
@@ -41,9 +43,14 @@ class BaseExecutor(LoggingMixin):
         :type parallelism: int
         """
         self.parallelism = parallelism
-        self.queued_tasks = OrderedDict()
+        # An ordered dict of the queued commands by task instance key, which
+        # also keeps them sorted by priority
+        self.queued_tasks = IndexedPriorityQueue(priority=lambda task: task[1])
         self.running = {}
         self.event_buffer = {}
+        # Executor specific information about the events of the event buffer,
+        # like the id of the external job that ran the task
+        self.event_info = {}
 
     def start(self):  # pragma: no cover
         """
@@ -110,6 +117,22 @@ class BaseExecutor(LoggingMixin):
         """
         pass
 
+    def wait_for_events(self, timeout):
+        """
+        Blocks until the executor has events to report, or until the timeout
+        is over. Executors that are notified when their tasks finish should
+        override this so that callers waiting between two heartbeats are woken
+        up as soon as a task finishes, instead of sleeping.
+
+        :param timeout: how long to wait at most, in seconds
+        :type timeout: float
+        :return: whether the executor has events to report
+        :rtype: bool
+        """
+        if timeout > 0:
+            time.sleep(timeout)
+        return bool(self.event_buffer)
+
     def heartbeat(self):
         # Triggering new jobs
         if not self.parallelism:
@@ -121,13 +144,8 @@ class BaseExecutor(LoggingMixin):
         self.log.debug("%s in queue", len(self.queued_tasks))
         self.log.debug("%s open slots", open_slots)
 
-        sorted_queue = sorted(
-            [(k, v) for k, v in self.queued_tasks.items()],
-            key=lambda x: x[1][1],
-            reverse=True)
         for i in range(min((open_slots, len(self.queued_tasks)))):
-            key, (command, _, queue, simple_ti) = sorted_queue.pop(0)
-            self.queued_tasks.pop(key)
+            key, (command, _, queue, simple_ti) = self.queued_tasks.pop_highest()
             self.running[key] = command
             self.execute_async(key=key,
                                command=command,
@@ -138,37 +156,53 @@ class BaseExecutor(LoggingMixin):
         self.log.debug("Calling the %s sync method", self.__class__)
         self.sync()
 
-    def change_state(self, key, state):
+    def change_state(self, key, state, info=None):
         self.log.debug("Changing state: {}".format(key))
         self.running.pop(key, None)
         self.event_buffer[key] = state
+        if info is not None:
+            self.event_info[key] = info
 
-    def fail(self, key):
-        self.change_state(key, State.FAILED)
+    def fail(self, key, info=None):
+        self.change_state(key, State.FAILED, info)
 
-    def success(self, key):
-        self.change_state(key, State.SUCCESS)
+    def success(self, key, info=None):
+        self.change_state(key, State.SUCCESS, info)
 
-    def get_event_buffer(self, dag_ids=None):
+    def get_events(self, dag_ids=None):
         """
-        Returns and flush the event buffer. In case dag_ids is specified
-        it will only return and flush events for the given dag_ids. Otherwise
-        it returns and flushes all
+        Returns and flushes the events of the event buffer. In case dag_ids is
+        specified it will only return and flush events for the given dag_ids.
+        Otherwise it returns and flushes all
 
         :param dag_ids: to dag_ids to return events for, if None returns all
-        :return: a dict of events
+        :return: the key, state and executor specific information (or None)
+            of every event
+        :rtype: list[tuple]
         """
-        cleared_events = dict()
         if dag_ids is None:
             cleared_events = self.event_buffer
             self.event_buffer = dict()
         else:
+            cleared_events = dict()
             for key in list(self.event_buffer.keys()):
                 dag_id, _, _, _ = key
                 if dag_id in dag_ids:
                     cleared_events[key] = self.event_buffer.pop(key)
 
-        return cleared_events
+        return [(key, state, self.event_info.pop(key, None))
+                for key, state in cleared_events.items()]
+
+    def get_event_buffer(self, dag_ids=None):
+        """
+        Returns and flush the event buffer. In case dag_ids is specified
+        it will only return and flush events for the given dag_ids. Otherwise
+        it returns and flushes all
+
+        :param dag_ids: to dag_ids to return events for, if None returns all
+        :return: a dict of events
+        """
+        return {key: state for key, state, _ in self.get_events(dag_ids)}
 
     def execute_async(self,
                       key,
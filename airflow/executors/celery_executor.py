@@ -26,6 +26,8 @@ from multiprocessing import Pool, cpu_count
 
 from celery import Celery
 from celery import states as celery_states
+from celery.backends.base import BaseKeyValueStoreBackend
+from celery.backends.database import DatabaseBackend, Task as TaskDb, session_cleanup
 
 from airflow import configuration
 from airflow.config_templates.default_celery import DEFAULT_CELERY_CONFIG
@@ -40,6 +42,8 @@ CELERY_FETCH_ERR_MSG_HEADER = 'Error fetching Celery task state'
 
 CELERY_SEND_ERR_MSG_HEADER = 'Error sending Celery task'
 
+OPERATION_TIMEOUT = configuration.conf.getint('celery', 'operation_timeout')
+
 '''
 To start the celery worker, run the command:
 airflow worker
@@ -100,7 +104,7 @@ def fetch_celery_task_state(celery_task):
     """
 
     try:
-        with timeout(seconds=2):
+        with timeout(seconds=OPERATION_TIMEOUT):
             # Accessing state property of celery task will make actual network request
             # to get the current state of the task.
             res = (celery_task[0], celery_task[1].state)
@@ -111,11 +115,11 @@ def fetch_celery_task_state(celery_task):
     return res
 
 
-def send_task_to_executor(task_tuple):
+def send_task_to_executor(task_tuple, producer=None):
     key, simple_ti, command, queue, task = task_tuple
     try:
-        with timeout(seconds=2):
-            result = task.apply_async(args=[command], queue=queue)
+        with timeout(seconds=OPERATION_TIMEOUT):
+            result = task.apply_async(args=[command], queue=queue, producer=producer)
     except Exception as e:
         exception_traceback = "Celery Task ID: {}\n{}".format(key,
                                                               traceback.format_exc())
@@ -124,6 +128,116 @@ def send_task_to_executor(task_tuple):
     return key, command, result
 
 
+def send_tasks_to_executor(task_tuples):
+    """
+    Publish a batch of tasks over a single producer. The scope of this function is
+    global so that it can be called by subprocesses in the pool, which keep their
+    connection to the broker open between batches.
+
+    :param task_tuples: the tasks to send, as accepted by send_task_to_executor
+    :type task_tuples: list[tuple]
+    :return: a tuple of the key, the command and the async result of every task,
+        or ExceptionWithTraceback instead of the async result if it was not sent
+    :rtype: list[tuple]
+    """
+    task = task_tuples[0][4]
+    try:
+        with task.app.producer_or_acquire() as producer:
+            return [send_task_to_executor(task_tuple, producer=producer)
+                    for task_tuple in task_tuples]
+    except Exception as e:
+        exception_traceback = "Celery Task IDs: {}\n{}".format(
+            [task_tuple[0] for task_tuple in task_tuples], traceback.format_exc())
+        result = ExceptionWithTraceback(e, exception_traceback)
+        return [(key, command, result)
+                for key, _, command, _, _ in task_tuples]
+
+
+class BulkStateFetcher(LoggingMixin):
+    """
+    Fetches the state of many Celery tasks at once when the result backend
+    allows it: with a single ``SELECT ... WHERE task_id IN (...)`` query for the
+    database backend, and with a single ``mget`` call for the key/value store
+    backends like Redis. Other backends are queried one task at a time using a
+    pool of processes.
+
+    :param sync_parallelism: the number of processes used to query the other
+        backends
+    :type sync_parallelism: int
+    """
+
+    def __init__(self, sync_parallelism):
+        self._sync_parallelism = sync_parallelism
+
+    def get_many(self, celery_tasks):
+        """
+        :param celery_tasks: the Celery task keys and their async results
+        :type celery_tasks: list[tuple(str, celery.result.AsyncResult)]
+        :return: the Celery task keys and the Celery state of the tasks, or
+            ExceptionWithTraceback for the tasks whose state could not be fetched
+        :rtype: list[tuple[str, str] | ExceptionWithTraceback]
+        """
+        backend = app.backend
+        if isinstance(backend, DatabaseBackend):
+            fetch = self._get_many_from_db_backend
+        elif isinstance(backend, BaseKeyValueStoreBackend):
+            fetch = self._get_many_from_kv_backend
+        else:
+            return self._get_many_using_multiprocessing(celery_tasks)
+
+        try:
+            with timeout(seconds=OPERATION_TIMEOUT):
+                task_ids = [(key, async_result.task_id)
+                            for key, async_result in celery_tasks]
+                states = fetch(backend, [task_id for _, task_id in task_ids])
+        except Exception as e:
+            exception_traceback = "Celery Task IDs: {}\n{}".format(
+                [key for key, _ in celery_tasks], traceback.format_exc())
+            return [ExceptionWithTraceback(e, exception_traceback)]
+
+        # Tasks unknown to the result backend have not started yet
+        return [(key, states.get(task_id, celery_states.PENDING))
+                for key, task_id in task_ids]
+
+    @staticmethod
+    def _get_many_from_db_backend(backend, task_ids):
+        session = backend.ResultSession()
+        with session_cleanup(session):
+            rows = (session.query(TaskDb.task_id, TaskDb.status)
+                    .filter(TaskDb.task_id.in_(task_ids))
+                    .all())
+        return dict(rows)
+
+    @staticmethod
+    def _get_many_from_kv_backend(backend, task_ids):
+        keys = [backend.get_key_for_task(task_id) for task_id in task_ids]
+        values = backend.mget(keys)
+        # Redis returns a list of values while the cache backends return a
+        # dict of the keys that were found
+        if isinstance(values, dict):
+            values = [values.get(key) for key in keys]
+        return {
+            task_id: backend.decode_result(value)['status']
+            for task_id, value in zip(task_ids, values)
+            if value is not None
+        }
+
+    def _get_many_using_multiprocessing(self, celery_tasks):
+        num_processes = min(len(celery_tasks), self._sync_parallelism)
+        # Use chunking instead of a work queue to reduce context switching since
+        # tasks are roughly uniform in size
+        chunksize = max(1, int(math.ceil(1.0 * len(celery_tasks) / num_processes)))
+
+        # Recreate the process pool each sync in case processes in the pool die
+        sync_pool = Pool(processes=num_processes)
+        try:
+            return sync_pool.map(fetch_celery_task_state, celery_tasks,
+                                 chunksize=chunksize)
+        finally:
+            sync_pool.close()
+            sync_pool.join()
+
+
 class CeleryExecutor(BaseExecutor):
     """
     CeleryExecutor is recommended for production use of Airflow. It allows
@@ -138,14 +252,18 @@ class CeleryExecutor(BaseExecutor):
         super(CeleryExecutor, self).__init__()
 
         # Celery doesn't support querying the state of multiple tasks in parallel
-        # (which can become a bottleneck on bigger clusters) so we use
-        # a multiprocessing pool to speed this up.
+        # (which can become a bottleneck on bigger clusters) so we query the
+        # result backend directly when we can, and use a multiprocessing pool
+        # otherwise.
         # How many worker processes are created for checking celery task state.
         self._sync_parallelism = configuration.getint('celery', 'SYNC_PARALLELISM')
         if self._sync_parallelism == 0:
             self._sync_parallelism = max(1, cpu_count() - 1)
 
-        self._sync_pool = None
+        self.bulk_state_fetcher = BulkStateFetcher(self._sync_parallelism)
+        # Tasks are sent by a long lived pool of processes, so that they keep
+        # their connection to the broker open from one heartbeat to the next
+        self._send_pool = None
         self.tasks = {}
         self.last_state = {}
 
@@ -164,15 +282,19 @@ class CeleryExecutor(BaseExecutor):
         return max(1,
                    int(math.ceil(1.0 * to_send_count / self._sync_parallelism)))
 
-    def _num_tasks_per_fetch_process(self):
-        """
-        How many Celery tasks should be sent to each worker process.
+    def _get_send_pool(self):
+        if self._send_pool is None:
+            self._send_pool = Pool(processes=self._sync_parallelism)
+        return self._send_pool
 
-        :return: Number of tasks that should be used per process
-        :rtype: int
-        """
-        return max(1,
-                   int(math.ceil(1.0 * len(self.tasks) / self._sync_parallelism)))
+    def _close_send_pool(self, terminate=False):
+        if self._send_pool is not None:
+            if terminate:
+                self._send_pool.terminate()
+            else:
+                self._send_pool.close()
+            self._send_pool.join()
+            self._send_pool = None
 
     def heartbeat(self):
         # Triggering new jobs
@@ -185,83 +307,50 @@ class CeleryExecutor(BaseExecutor):
         self.log.debug("{} in queue".format(len(self.queued_tasks)))
         self.log.debug("{} open slots".format(open_slots))
 
-        sorted_queue = sorted(
-            [(k, v) for k, v in self.queued_tasks.items()],
-            key=lambda x: x[1][1],
-            reverse=True)
-
-        task_tuples_to_send = []
+        task_tuples_to_send = [
+            (key, simple_ti, command, queue, execute_command)
+            for key, (command, _, queue, simple_ti) in self.queued_tasks.highest(open_slots)
+        ]
 
-        for i in range(min((open_slots, len(self.queued_tasks)))):
-            key, (command, _, queue, simple_ti) = sorted_queue.pop(0)
-            task_tuples_to_send.append((key, simple_ti, command, queue,
-                                        execute_command))
-
-        cached_celery_backend = None
         if task_tuples_to_send:
-            tasks = [t[4] for t in task_tuples_to_send]
-
             # Celery state queries will stuck if we do not use one same backend
             # for all tasks.
-            cached_celery_backend = tasks[0].backend
-
-        if task_tuples_to_send:
-            # Use chunking instead of a work queue to reduce context switching
-            # since tasks are roughly uniform in size
-            chunksize = self._num_tasks_per_send_process(len(task_tuples_to_send))
-            num_processes = min(len(task_tuples_to_send), self._sync_parallelism)
-
-            send_pool = Pool(processes=num_processes)
-            key_and_async_results = send_pool.map(
-                send_task_to_executor,
-                task_tuples_to_send,
-                chunksize=chunksize)
-
-            send_pool.close()
-            send_pool.join()
+            cached_celery_backend = execute_command.backend
+
+            # Publish the tasks in batches over one producer each and handle
+            # every batch as soon as it has been sent
+            batch_size = self._num_tasks_per_send_process(len(task_tuples_to_send))
+            batches = [task_tuples_to_send[i:i + batch_size]
+                       for i in range(0, len(task_tuples_to_send), batch_size)]
+
+            for key_and_async_results in self._get_send_pool().imap_unordered(
+                    send_tasks_to_executor, batches):
+                for key, command, result in key_and_async_results:
+                    if isinstance(result, ExceptionWithTraceback):
+                        self.log.error(
+                            CELERY_SEND_ERR_MSG_HEADER + ":{}\n{}\n".format(
+                                result.exception, result.traceback))
+                    elif result is not None:
+                        # Only pops when enqueued successfully, otherwise keep it
+                        # and expect scheduler loop to deal with it.
+                        self.queued_tasks.pop(key)
+                        result.backend = cached_celery_backend
+                        self.running[key] = command
+                        self.tasks[key] = result
+                        self.last_state[key] = celery_states.PENDING
             self.log.debug('Sent all tasks.')
 
-            for key, command, result in key_and_async_results:
-                if isinstance(result, ExceptionWithTraceback):
-                    self.log.error(
-                        CELERY_SEND_ERR_MSG_HEADER + ":{}\n{}\n".format(
-                            result.exception, result.traceback))
-                elif result is not None:
-                    # Only pops when enqueued successfully, otherwise keep it
-                    # and expect scheduler loop to deal with it.
-                    self.queued_tasks.pop(key)
-                    result.backend = cached_celery_backend
-                    self.running[key] = command
-                    self.tasks[key] = result
-                    self.last_state[key] = celery_states.PENDING
-
         # Calling child class sync method
         self.log.debug("Calling the {} sync method".format(self.__class__))
         self.sync()
 
     def sync(self):
-        num_processes = min(len(self.tasks), self._sync_parallelism)
-        if num_processes == 0:
+        if not self.tasks:
             self.log.debug("No task to query celery, skipping sync")
             return
 
-        self.log.debug("Inquiring about %s celery task(s) using %s processes",
-                       len(self.tasks), num_processes)
-
-        # Recreate the process pool each sync in case processes in the pool die
-        self._sync_pool = Pool(processes=num_processes)
-
-        # Use chunking instead of a work queue to reduce context switching since tasks are
-        # roughly uniform in size
-        chunksize = self._num_tasks_per_fetch_process()
-
-        self.log.debug("Waiting for inquiries to complete...")
-        task_keys_to_states = self._sync_pool.map(
-            fetch_celery_task_state,
-            self.tasks.items(),
-            chunksize=chunksize)
-        self._sync_pool.close()
-        self._sync_pool.join()
+        self.log.debug("Inquiring about %s celery task(s)", len(self.tasks))
+        task_keys_to_states = self.bulk_state_fetcher.get_many(list(self.tasks.items()))
         self.log.debug("Inquiries completed.")
 
         for key_and_state in task_keys_to_states:
@@ -273,16 +362,17 @@ class CeleryExecutor(BaseExecutor):
             key, state = key_and_state
             try:
                 if self.last_state[key] != state:
+                    info = {'celery_task_id': self.tasks[key].task_id}
                     if state == celery_states.SUCCESS:
-                        self.success(key)
+                        self.success(key, info)
                         del self.tasks[key]
                         del self.last_state[key]
                     elif state == celery_states.FAILURE:
-                        self.fail(key)
+                        self.fail(key, info)
                         del self.tasks[key]
                         del self.last_state[key]
                     elif state == celery_states.REVOKED:
-                        self.fail(key)
+                        self.fail(key, info)
                         del self.tasks[key]
                         del self.last_state[key]
                     else:
@@ -298,3 +388,7 @@ class CeleryExecutor(BaseExecutor):
                     for task in self.tasks.values()]):
                 time.sleep(5)
         self.sync()
+        self._close_send_pool()
+
+    def terminate(self):
+        self._close_send_pool(terminate=True)
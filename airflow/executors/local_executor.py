@@ -38,18 +38,27 @@ the LocalExecutor, the worker processes are running waiting for tasks, once the
 LocalExecutor receives the call to shutdown the executor a poison token is sent to the
 workers to terminate them. Processes used in this strategy are of class QueuedLocalWorker.
 
+When `local_executor_in_process` is enabled, the workers run `airflow run` commands in a
+fork of themselves instead of in a new `airflow run` process: the fork starts with
+airflow already imported and the DAG file already parsed by the worker, which keeps the
+parsed DAGs between tasks. Other commands are always run in a subprocess.
+
 Arguably, `SequentialExecutor` could be thought as a LocalExecutor with limited
 parallelism of just 1 worker, i.e. `self.parallelism = 1`.
 This option could lead to the unification of the executor implementations, running
 locally, into just one `LocalExecutor` with multiple modes.
 """
 
+import logging
 import multiprocessing
+import os
+import signal
 import subprocess
-import time
-
+import sys
 from builtins import range
+from queue import Empty
 
+from airflow import configuration
 from airflow.executors.base_executor import BaseExecutor
 from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.utils.state import State
@@ -70,6 +79,10 @@ class LocalWorker(multiprocessing.Process, LoggingMixin):
         self.result_queue = result_queue
         self.key = None
         self.command = None
+        self.in_process = configuration.conf.getboolean('core', 'local_executor_in_process')
+        # The DagBags parsed by this worker and the modification time of their
+        # file, by the path of the file
+        self._dagbags = {}
 
     def execute_work(self, key, command):
         """
@@ -82,19 +95,96 @@ class LocalWorker(multiprocessing.Process, LoggingMixin):
         if key is None:
             return
         self.log.info("%s running %s", self.__class__.__name__, command)
+        if self.in_process and list(command[:2]) == ['airflow', 'run']:
+            state = self._execute_in_fork(command)
+        else:
+            state = self._execute_in_subprocess(command)
+        self.result_queue.put((key, state))
+
+    def _execute_in_subprocess(self, command):
         try:
             subprocess.check_call(command, close_fds=True)
-            state = State.SUCCESS
+            return State.SUCCESS
         except subprocess.CalledProcessError as e:
-            state = State.FAILED
             self.log.error("Failed to execute task %s.", str(e))
             # TODO: Why is this commented out?
             # raise e
-        self.result_queue.put((key, state))
+            return State.FAILED
+
+    def _execute_in_fork(self, command):
+        """
+        Runs an ``airflow run`` command in a fork of this worker, with the DAG
+        parsed by the worker.
+
+        :param command: the ``airflow run`` command to execute
+        :type command: list[str]
+        :return: the state of the command
+        :rtype: str
+        """
+        from airflow.bin import cli
+
+        args = cli.CLIFactory.get_parser().parse_args(command[1:])
+        dag = None if args.pickle else self._get_dag(args)
+
+        pid = os.fork()
+        if pid:
+            _, status = os.waitpid(pid, 0)
+            if status != 0:
+                self.log.error("Failed to execute task, %s exited with status %s.",
+                               command, status)
+                return State.FAILED
+            return State.SUCCESS
+
+        return_code = 1
+        try:
+            # The handlers of the scheduler are inherited through the worker
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            # The command line is logged by the CLI action loggers
+            sys.argv = list(command)
+            # The database connections of the worker are not reused by the fork,
+            # `airflow run` configures its own engine
+            args.func(args, dag=dag)
+            return_code = 0
+        except Exception:
+            self.log.exception("Failed to execute task %s.", command)
+        finally:
+            logging.shutdown()
+            # Skip the exit handlers and finalizers inherited from the worker
+            os._exit(return_code)
+
+    def _get_dag(self, args):
+        """
+        Returns the DAG of an ``airflow run`` command from the DagBags kept by
+        the worker. Only the file the DAG was last loaded from is parsed, again
+        only when it was modified.
+
+        :param args: the parsed arguments of the command
+        :type args: argparse.Namespace
+        :rtype: airflow.models.DAG
+        """
+        from airflow.bin import cli
+        from airflow.models import DagBag
+
+        dag_folder = cli.process_subdir(args.subdir)
+        if os.path.isfile(dag_folder):
+            fileloc = dag_folder
+        else:
+            fileloc = cli._get_dag_fileloc(args.dag_id, dag_folder)
+        if not fileloc:
+            # Unknown DAGs are looked up and reported by `airflow run` itself
+            return None
+
+        mtime = os.path.getmtime(fileloc)
+        loaded_mtime, dagbag = self._dagbags.get(fileloc, (None, None))
+        if dagbag is None or loaded_mtime != mtime:
+            dagbag = DagBag(fileloc, include_examples=False)
+            self._dagbags[fileloc] = (mtime, dagbag)
+        # A DAG that moved to another file is looked up by `airflow run` itself
+        return dagbag.dags.get(args.dag_id)
 
     def run(self):
         self.execute_work(self.key, self.command)
-        time.sleep(1)
 
 
 class QueuedLocalWorker(LocalWorker):
@@ -116,7 +206,6 @@ class QueuedLocalWorker(LocalWorker):
                 break
             self.execute_work(key, command)
             self.task_queue.task_done()
-            time.sleep(1)
 
 
 class LocalExecutor(BaseExecutor):
@@ -155,16 +244,21 @@ class LocalExecutor(BaseExecutor):
             self.executor.workers_active += 1
             local_worker.start()
 
+        def collect(self, results):
+            """
+            :param results: the key of a TI and the state it finished in
+            :type results: tuple(tuple(dag_id, task_id, execution_date), str)
+            """
+            self.executor.change_state(*results)
+            self.executor.workers_active -= 1
+
         def sync(self):
             while not self.executor.result_queue.empty():
-                results = self.executor.result_queue.get()
-                self.executor.change_state(*results)
-                self.executor.workers_active -= 1
+                self.collect(self.executor.result_queue.get())
 
         def end(self):
             while self.executor.workers_active > 0:
-                self.executor.sync()
-                time.sleep(0.5)
+                self.executor.wait_for_events(0.5)
 
     class _LimitedParallelism(object):
         """Implements LocalExecutor with limited parallelism using a task queue to
@@ -195,10 +289,16 @@ class LocalExecutor(BaseExecutor):
             """
             self.executor.queue.put((key, command))
 
+        def collect(self, results):
+            """
+            :param results: the key of a TI and the state it finished in
+            :type results: tuple(tuple(dag_id, task_id, execution_date), str)
+            """
+            self.executor.change_state(*results)
+
         def sync(self):
             while not self.executor.result_queue.empty():
-                results = self.executor.result_queue.get()
-                self.executor.change_state(*results)
+                self.collect(self.executor.result_queue.get())
 
         def end(self):
             # Sending poison pill to all worker
@@ -226,5 +326,21 @@ class LocalExecutor(BaseExecutor):
     def sync(self):
         self.impl.sync()
 
+    def wait_for_events(self, timeout):
+        """
+        Waits on the result queue, so that the caller is woken up as soon as a
+        worker reports that a task finished.
+        """
+        try:
+            if timeout > 0:
+                results = self.result_queue.get(timeout=timeout)
+            else:
+                results = self.result_queue.get_nowait()
+        except Empty:
+            return bool(self.event_buffer)
+        self.impl.collect(results)
+        self.impl.sync()
+        return True
+
     def end(self):
         self.impl.end()
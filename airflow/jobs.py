@@ -42,8 +42,9 @@ from sqlalchemy.orm.session import make_transient
 from airflow import configuration as conf
 from airflow import executors, models, settings
 from airflow.exceptions import AirflowException
-from airflow.models import DAG, DagRun, errors
+from airflow.models import DagRun, errors
 from airflow.models.dagpickle import DagPickle
+from airflow.models.serialized_dag import SerializedDagModel
 from airflow.models.slamiss import SlaMiss
 from airflow.settings import Stats
 from airflow.task.task_runner import get_task_runner
@@ -59,9 +60,11 @@ from airflow.utils.dag_processing import (AbstractDagFileProcessor,
 from airflow.utils.db import create_session, provide_session
 from airflow.utils.email import get_email_address_list, send_email
 from airflow.utils.log.logging_mixin import LoggingMixin, StreamLogWriter, set_context
+from airflow.utils.loop_profiler import LoopProfiler
 from airflow.utils.net import get_hostname
 from airflow.utils.sqlalchemy import UtcDateTime
 from airflow.utils.state import State
+from airflow.utils.trigger_rule import TriggerRule
 
 Base = models.base.Base
 ID_LEN = models.base.ID_LEN
@@ -321,9 +324,11 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         """
         self._file_path = file_path
         # Queue that's used to pass results from the child process.
-        self._result_queue = multiprocessing.Queue()
+        self._result_queue = None
         # The process that was launched to process the given .
         self._process = None
+        # The worker processing the file, when processes are reused
+        self._worker = None
         self._dag_id_white_list = dag_id_white_list
         self._pickle_dags = pickle_dags
         self._zombies = zombies
@@ -371,45 +376,12 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         """
         def helper():
             # This helper runs in the newly created process
-            log = logging.getLogger("airflow.processor")
-
-            stdout = StreamLogWriter(log, logging.INFO)
-            stderr = StreamLogWriter(log, logging.WARN)
-
-            set_context(log, file_path)
-
             try:
-                # redirect stdout/stderr to log
-                sys.stdout = stdout
-                sys.stderr = stderr
-
                 # Re-configure the ORM engine as there are issues with multiple processes
                 settings.configure_orm()
-
-                # Change the thread name to differentiate log lines. This is
-                # really a separate process, but changing the name of the
-                # process doesn't work, so changing the thread name instead.
-                threading.current_thread().name = thread_name
-                start_time = time.time()
-
-                log.info("Started process (PID=%s) to work on %s",
-                         os.getpid(), file_path)
-                scheduler_job = SchedulerJob(dag_ids=dag_id_white_list, log=log)
-                result = scheduler_job.process_file(file_path,
-                                                    zombies,
-                                                    pickle_dags)
-                result_queue.put(result)
-                end_time = time.time()
-                log.info(
-                    "Processing %s took %.3f seconds", file_path, end_time - start_time
-                )
-            except Exception:
-                # Log exceptions through the logging framework.
-                log.exception("Got an exception! Propagating...")
-                raise
+                result_queue.put(DagFileProcessor._process_file(
+                    file_path, pickle_dags, dag_id_white_list, thread_name, zombies))
             finally:
-                sys.stdout = sys.__stdout__
-                sys.stderr = sys.__stderr__
                 # We re-initialized the ORM within this Process above so we need to
                 # tear it down manually here
                 settings.dispose_orm()
@@ -420,17 +392,76 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         p.start()
         return p
 
-    def start(self):
+    @staticmethod
+    def _process_file(file_path, pickle_dags, dag_id_white_list, thread_name, zombies):
+        """
+        Processes the given file in the current process, with its output going to
+        the log of the file.
+
+        :return: the result of SchedulerJob.process_file()
+        :rtype: list[airflow.utils.dag_processing.SimpleDag]
         """
-        Launch the process and start processing the DAG.
+        log = logging.getLogger("airflow.processor")
+
+        stdout = StreamLogWriter(log, logging.INFO)
+        stderr = StreamLogWriter(log, logging.WARN)
+
+        set_context(log, file_path)
+
+        try:
+            # redirect stdout/stderr to log
+            sys.stdout = stdout
+            sys.stderr = stderr
+
+            # Change the thread name to differentiate log lines. This is
+            # really a separate process, but changing the name of the
+            # process doesn't work, so changing the thread name instead.
+            threading.current_thread().name = thread_name
+            start_time = time.time()
+
+            log.info("Started process (PID=%s) to work on %s",
+                     os.getpid(), file_path)
+            scheduler_job = SchedulerJob(dag_ids=dag_id_white_list, log=log)
+            result = scheduler_job.process_file(file_path,
+                                                zombies,
+                                                pickle_dags)
+            end_time = time.time()
+            log.info(
+                "Processing %s took %.3f seconds", file_path, end_time - start_time
+            )
+            return result
+        except Exception:
+            # Log exceptions through the logging framework.
+            log.exception("Got an exception! Propagating...")
+            raise
+        finally:
+            sys.stdout = sys.__stdout__
+            sys.stderr = sys.__stderr__
+
+    def start(self):
         """
-        self._process = DagFileProcessor._launch_process(
-            self._result_queue,
-            self.file_path,
-            self._pickle_dags,
-            self._dag_id_white_list,
-            "DagFileProcessor{}".format(self._instance_id),
-            self._zombies)
+        Launch the process and start processing the DAG, or hand the file to an
+        idle worker when ``[scheduler] dag_processor_reuse_processes`` is set.
+        """
+        thread_name = "DagFileProcessor{}".format(self._instance_id)
+        if conf.getboolean('scheduler', 'dag_processor_reuse_processes'):
+            self._worker = DagFileProcessorWorker.acquire()
+            self._worker.process_file(self.file_path,
+                                      self._pickle_dags,
+                                      self._dag_id_white_list,
+                                      thread_name,
+                                      self._zombies)
+            # The worker is terminated like a process when the file times out
+            self._process = self._worker
+        else:
+            self._result_queue = multiprocessing.Queue()
+            self._process = DagFileProcessor._launch_process(
+                self._result_queue,
+                self.file_path,
+                self._pickle_dags,
+                self._dag_id_white_list,
+                thread_name,
+                self._zombies)
         self._start_time = timezone.utcnow()
 
     def terminate(self, sigkill=False):
@@ -487,6 +518,18 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         if self._done:
             return True
 
+        if self._worker is not None:
+            # A worker that died, e.g. terminated on timeout, has no result
+            if not self._worker.is_alive():
+                self._done = True
+                return True
+            if self._worker.poll():
+                self._result = self._worker.recv()
+                self._done = True
+                self._worker.release()
+                return True
+            return False
+
         # In case result queue is corrupted.
         if self._result_queue and not self._result_queue.empty():
             self._result = self._result_queue.get_nowait()
@@ -528,6 +571,147 @@ class DagFileProcessor(AbstractDagFileProcessor, LoggingMixin):
         return self._start_time
 
 
+class DagFileProcessorWorker(LoggingMixin):
+    """
+    A long lived process that processes DAG files one after the other for the
+    DagFileProcessors of its parent process, when ``[scheduler]
+    dag_processor_reuse_processes`` is enabled. Workers are forked from the DAG
+    file processor manager, so they start with the modules it preloaded, and
+    configure their ORM engine once instead of once per file.
+
+    A worker processes the file of one DagFileProcessor at a time, and goes back
+    to the idle workers once its result was read. The modules imported from the
+    DAGs folder while processing a file are removed afterwards, so every file
+    imports them again, like in a new process.
+    """
+
+    # The workers of this process waiting for a file to process
+    _idle_workers = []
+
+    def __init__(self):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=DagFileProcessorWorker._run,
+                                                args=(child_conn, os.getpid()),
+                                                name="DagFileProcessorWorker")
+        # Daemonic processes are terminated when their parent exits
+        self._process.daemon = True
+        # The worker is forked without the signal handlers of the manager, which
+        # would clean up the processors of the manager if the worker is terminated
+        handlers = [(signum, signal.signal(signum, signal.SIG_DFL))
+                    for signum in (signal.SIGINT, signal.SIGTERM)]
+        try:
+            self._process.start()
+        finally:
+            for signum, handler in handlers:
+                signal.signal(signum, handler)
+        child_conn.close()
+
+    @classmethod
+    def acquire(cls):
+        """
+        Returns an idle worker of this process, or starts a new one.
+
+        :rtype: DagFileProcessorWorker
+        """
+        while cls._idle_workers:
+            worker = cls._idle_workers.pop()
+            if worker.is_alive():
+                return worker
+        return cls()
+
+    def release(self):
+        """
+        Makes the worker available to process another file, unless it died.
+        """
+        if self.is_alive():
+            DagFileProcessorWorker._idle_workers.append(self)
+
+    def process_file(self, file_path, pickle_dags, dag_id_white_list, thread_name, zombies):
+        """
+        Sends a file to the worker, see DagFileProcessor._launch_process for the
+        parameters. The result is read with recv once poll returns True.
+        """
+        self._conn.send((file_path, pickle_dags, dag_id_white_list, thread_name, zombies))
+
+    def poll(self):
+        """
+        :return: whether the result of the file is available
+        :rtype: bool
+        """
+        return self._conn.poll()
+
+    def recv(self):
+        """
+        :return: the result of SchedulerJob.process_file(), None if it failed
+        :rtype: list[airflow.utils.dag_processing.SimpleDag]
+        """
+        try:
+            return self._conn.recv()
+        except EOFError:
+            return None
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    @property
+    def exitcode(self):
+        return self._process.exitcode
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def terminate(self):
+        self._process.terminate()
+
+    def join(self, timeout=None):
+        self._process.join(timeout)
+
+    @staticmethod
+    def _run(conn, parent_pid):
+        # This runs in the worker process
+        # Re-configure the ORM engine as there are issues with multiple processes
+        settings.configure_orm()
+        try:
+            # Stop when the parent process is gone
+            while os.getppid() == parent_pid:
+                if not conn.poll(1):
+                    continue
+                try:
+                    args = conn.recv()
+                except EOFError:
+                    break
+
+                modules = set(sys.modules)
+                sys_path = list(sys.path)
+                result = None
+                try:
+                    result = DagFileProcessor._process_file(*args)
+                except Exception:
+                    # Already logged to the log of the file
+                    pass
+                finally:
+                    DagFileProcessorWorker._unload_dag_modules(modules, args[0])
+                    sys.path[:] = sys_path
+                conn.send(result)
+        finally:
+            settings.dispose_orm()
+
+    @staticmethod
+    def _unload_dag_modules(modules, file_path):
+        """
+        Removes the modules imported from the DAGs folder or from the folder of
+        the processed file that are not in the given module names.
+        """
+        folders = [os.path.realpath(folder) + os.sep for folder in
+                   (settings.DAGS_FOLDER, os.path.dirname(file_path))]
+        for name in set(sys.modules) - modules:
+            module_path = getattr(sys.modules[name], '__file__', None)
+            if (name.startswith('unusual_prefix_') or
+                    (module_path and os.path.realpath(module_path).startswith(tuple(folders)))):
+                del sys.modules[name]
+
+
 class SchedulerJob(BaseJob):
     """
     This SchedulerJob runs for a specific time interval and schedules the jobs
@@ -550,6 +734,8 @@ class SchedulerJob(BaseJob):
             processor_poll_interval=1.0,
             do_pickle=False,
             log=None,
+            profile_loops=0,
+            profile_file=None,
             *args, **kwargs):
         """
         :param dag_id: if specified, only schedule tasks with this DAG ID
@@ -568,6 +754,11 @@ class SchedulerJob(BaseJob):
         :param do_pickle: once a DAG object is obtained by executing the Python
             file, whether to serialize the DAG object to the DB
         :type do_pickle: bool
+        :param profile_loops: the number of scheduler loops to capture with
+            cProfile, 0 to disable profiling
+        :type profile_loops: int
+        :param profile_file: the file the cProfile stats are dumped to
+        :type profile_file: unicode
         """
         # for BaseJob compatibility
         self.dag_id = dag_id
@@ -594,9 +785,21 @@ class SchedulerJob(BaseJob):
             self.using_sqlite = True
 
         self.max_tis_per_query = conf.getint('scheduler', 'max_tis_per_query')
+        self.incremental_scheduling = conf.getboolean('scheduler',
+                                                      'incremental_scheduling')
+        self.incremental_scheduling_full_interval = conf.getint(
+            'scheduler', 'incremental_scheduling_full_interval')
         self.processor_agent = None
         self._last_loop = False
 
+        self.loop_profiler = LoopProfiler(
+            'scheduler.loop',
+            report_path=conf.get('scheduler', 'loop_report_path') or None,
+            report_size=conf.getint('scheduler', 'loop_report_size'),
+            profile_loops=profile_loops,
+            profile_path=profile_file or os.path.join(settings.AIRFLOW_HOME,
+                                                      'scheduler.prof'))
+
         signal.signal(signal.SIGINT, self._exit_gracefully)
         signal.signal(signal.SIGTERM, self._exit_gracefully)
 
@@ -939,29 +1142,141 @@ class SchedulerJob(BaseJob):
 
         for run in active_dag_runs:
             self.log.debug("Examining active DAG run: %s", run)
-            # this needs a fresh session sometimes tis get detached
-            tis = run.get_task_instances(state=(State.NONE,
-                                                State.UP_FOR_RETRY,
-                                                State.UP_FOR_RESCHEDULE))
-
-            # this loop is quite slow as it uses are_dependencies_met for
-            # every task (in ti.is_runnable). This is also called in
-            # update_state above which has already checked these tasks
-            for ti in tis:
-                task = dag.get_task(ti.task_id)
-
-                # fixme: ti.task is transient but needs to be set
-                ti.task = task
-
-                # future: remove adhoc
-                if task.adhoc:
-                    continue
+            scheduling_decision = timezone.utcnow()
+            # The task instances of a dag run are all evaluated again at least
+            # every incremental_scheduling_full_interval seconds
+            full_evaluation = (
+                not self.incremental_scheduling or
+                run.last_scheduling_decision is None or
+                (scheduling_decision - run.last_scheduling_decision).total_seconds() >=
+                self.incremental_scheduling_full_interval)
+            # the states of the finished tasks of the run are loaded once and
+            # shared by the dependency checks of all of its task instances
+            dep_context = DepContext(flag_upstream_failed=True)
+            if full_evaluation:
+                # this needs a fresh session sometimes tis get detached
+                tis = run.get_task_instances(state=(State.NONE,
+                                                    State.UP_FOR_RETRY,
+                                                    State.UP_FOR_RESCHEDULE))
+            else:
+                tis = self._get_task_instances_to_reevaluate(dag, run, dep_context,
+                                                             session=session)
+            self._evaluate_task_instances(dag, run, tis, queue, dep_context,
+                                          session=session)
+            if self.incremental_scheduling and full_evaluation:
+                self._record_scheduling_decision(run, scheduling_decision,
+                                                 session=session)
 
-                if ti.are_dependencies_met(
-                        dep_context=DepContext(flag_upstream_failed=True),
-                        session=session):
-                    self.log.debug('Queuing task: %s', ti)
-                    queue.append(ti.key)
+    @provide_session
+    def _evaluate_task_instances(self, dag, run, tis, queue, dep_context, session=None):
+        """
+        Checks the dependencies of the given task instances of a dag run and adds
+        the keys of the ones that can run to the queue.
+        """
+        if not tis:
+            return
+
+        dep_context.ensure_finished_tasks(run, session=session)
+
+        # this loop is quite slow as it uses are_dependencies_met for
+        # every task (in ti.is_runnable). This is also called in
+        # update_state above which has already checked these tasks
+        for ti in tis:
+            task = dag.get_task(ti.task_id)
+
+            # fixme: ti.task is transient but needs to be set
+            ti.task = task
+
+            # future: remove adhoc
+            if task.adhoc:
+                continue
+
+            if ti.are_dependencies_met(
+                    dep_context=dep_context,
+                    session=session):
+                self.log.debug('Queuing task: %s', ti)
+                queue.append(ti.key)
+
+    @provide_session
+    def _get_task_instances_to_reevaluate(self, dag, run, dep_context, session=None):
+        """
+        Returns the task instances of a dag run that may have become runnable since
+        the scheduler last evaluated all of them. These are the task instances
+        waiting for their upstream tasks that have at least one finished upstream
+        task instance, plus the task instances whose dependencies do not only
+        depend on their upstream tasks in the same dag run: tasks without upstream
+        tasks, with the dummy trigger rule, depending on the past or with custom
+        deps.
+
+        The finished task instances are found by their current state rather than
+        by comparing their end_date to the time of a previous examination, so a
+        task instance committed after that examination with an earlier end_date,
+        e.g. because of its callbacks or of the clock of its worker, is never
+        missed.
+
+        :param dag: the DAG the dag run belongs to
+        :type dag: airflow.models.DAG
+        :param run: the dag run to examine
+        :type run: airflow.models.DagRun
+        :param dep_context: the context the task instances are evaluated in, its
+            finished tasks are loaded if they were not yet
+        :type dep_context: airflow.ti_deps.dep_context.DepContext
+        :return: the task instances to evaluate
+        :rtype: list[airflow.models.TaskInstance]
+        """
+        TI = models.TaskInstance
+
+        finished_task_ids = set(
+            ti.task_id for ti in dep_context.ensure_finished_tasks(run, session=session))
+
+        task_ids = set()
+        for task in dag.tasks:
+            if (not task.upstream_task_ids or
+                    task.trigger_rule == TriggerRule.DUMMY or
+                    task.depends_on_past or
+                    type(task).deps is not models.BaseOperator.deps or
+                    task.upstream_task_ids & finished_task_ids):
+                task_ids.add(task.task_id)
+
+        self.log.debug("Re-evaluating %s task(s) of %s after %s finished",
+                       len(task_ids), run, len(finished_task_ids))
+
+        waiting_tis = TI.state.in_([State.UP_FOR_RETRY, State.UP_FOR_RESCHEDULE])
+        if task_ids:
+            waiting_tis = or_(waiting_tis,
+                              and_(TI.state.is_(None), TI.task_id.in_(task_ids)))
+        return (
+            session
+            .query(TI)
+            .filter(TI.dag_id == run.dag_id,
+                    TI.execution_date == run.execution_date,
+                    waiting_tis)
+            .all()
+        )
+
+    @provide_session
+    def _record_scheduling_decision(self, run, scheduling_decision, session=None):
+        """
+        Stores the time all the task instances of a dag run were last evaluated. The
+        update only applies if nobody reset the marker in the meantime, e.g. by
+        clearing task instances, so that such changes are never missed.
+
+        :param run: the examined dag run
+        :type run: airflow.models.DagRun
+        :param scheduling_decision: the time the examination started
+        :type scheduling_decision: datetime.datetime
+        """
+        DR = models.DagRun
+        if run.last_scheduling_decision is None:
+            previous_decision = DR.last_scheduling_decision.is_(None)
+        else:
+            previous_decision = DR.last_scheduling_decision == run.last_scheduling_decision
+        session.query(DR).filter(
+            DR.id == run.id,
+            previous_decision,
+        ).update({DR.last_scheduling_decision: scheduling_decision},
+                 synchronize_session=False)
+        session.commit()
 
     @provide_session
     def _change_state_for_tis_without_dagrun(self,
@@ -1022,28 +1337,48 @@ class SchedulerJob(BaseJob):
             )
 
     @provide_session
-    def __get_task_concurrency_map(self, states, session=None):
+    def __get_concurrency_maps(self, states, session=None):
         """
-        Returns a map from tasks to number in the states list given.
+        Returns the number of task instances in the states list given per pool,
+        per DAG and per task, computed with a single grouped query.
 
         :param states: List of states to query for
         :type states: list[airflow.utils.state.State]
-        :return: A map from (dag_id, task_id) to count of tasks in states
-        :rtype: dict[tuple[str, str], int]
-
+        :return: A map from pool to count, a map from dag_id to a map from task_id
+            to count and a map from (dag_id, task_id) to count of tasks in states
+        :rtype: tuple[dict[str, int], dict[str, dict[str, int]],
+            dict[tuple[str, str], int]]
         """
         TI = models.TaskInstance
         ti_concurrency_query = (
             session
-            .query(TI.task_id, TI.dag_id, func.count('*'))
+            .query(TI.pool, TI.dag_id, TI.task_id, func.count('*'))
             .filter(TI.state.in_(states))
-            .group_by(TI.task_id, TI.dag_id)
+            .group_by(TI.pool, TI.dag_id, TI.task_id)
         ).all()
+        pool_map = defaultdict(int)
+        dag_map = defaultdict(lambda: defaultdict(int))
         task_map = defaultdict(int)
         for result in ti_concurrency_query:
-            task_id, dag_id, count = result
-            task_map[(dag_id, task_id)] = count
-        return task_map
+            pool, dag_id, task_id, count = result
+            pool_map[pool] += count
+            dag_map[dag_id][task_id] += count
+            task_map[(dag_id, task_id)] += count
+        return pool_map, dag_map, task_map
+
+    def _log_task_instances(self, message, task_instances, limit=10):
+        """
+        Logs the number of task instances together with a bounded sample of them,
+        one per line. The full list is only logged at debug level.
+        """
+        if self.log.isEnabledFor(logging.DEBUG):
+            limit = len(task_instances)
+        sample = task_instances[:limit]
+        task_instance_str = "\n\t".join(["{}".format(x) for x in sample])
+        if len(task_instances) > len(sample):
+            task_instance_str += "\n\t... and {} more".format(
+                len(task_instances) - len(sample))
+        self.log.info("%s %s:\n\t%s", len(task_instances), message, task_instance_str)
 
     @provide_session
     def _find_executable_task_instances(self, simple_dag_bag, states, session=None):
@@ -1095,12 +1430,7 @@ class SchedulerJob(BaseJob):
             self.log.debug("No tasks to consider for execution.")
             return executable_tis
 
-        # Put one task instance on each line
-        task_instance_str = "\n\t".join(
-            ["{}".format(x) for x in task_instances_to_examine])
-        self.log.info("{} tasks up for execution:\n\t{}"
-                      .format(len(task_instances_to_examine),
-                              task_instance_str))
+        self._log_task_instances("tasks up for execution", task_instances_to_examine)
 
         # Get the pool settings
         pools = {p.pool: p for p in session.query(models.Pool).all()}
@@ -1109,9 +1439,11 @@ class SchedulerJob(BaseJob):
         for task_instance in task_instances_to_examine:
             pool_to_task_instances[task_instance.pool].append(task_instance)
 
+        # Running and queued task instances per pool, DAG and task in one go
         states_to_count_as_running = [State.RUNNING, State.QUEUED]
-        task_concurrency_map = self.__get_task_concurrency_map(
-            states=states_to_count_as_running, session=session)
+        pool_slots_map, dag_concurrency_map, task_concurrency_map = \
+            self.__get_concurrency_maps(
+                states=states_to_count_as_running, session=session)
 
         # Go through each pool, and queue up a task for execution if there are
         # any open slots in the pool.
@@ -1129,7 +1461,7 @@ class SchedulerJob(BaseJob):
                     )
                     open_slots = 0
                 else:
-                    open_slots = pools[pool].open_slots(session=session)
+                    open_slots = pools[pool].slots - pool_slots_map[pool]
 
             num_queued = len(task_instances)
             self.log.info(
@@ -1160,16 +1492,15 @@ class SchedulerJob(BaseJob):
                 simple_dag = simple_dag_bag.get_dag(dag_id)
 
                 if dag_id not in dag_id_to_possibly_running_task_count:
-                    dag_id_to_possibly_running_task_count[dag_id] = \
-                        DAG.get_num_task_instances(
-                            dag_id,
-                            simple_dag_bag.get_dag(dag_id).task_ids,
-                            states=states_to_count_as_running,
-                            session=session)
+                    # only count the tasks that are still part of the DAG
+                    running_per_task = dag_concurrency_map[dag_id]
+                    dag_id_to_possibly_running_task_count[dag_id] = sum(
+                        running_per_task[task_id] for task_id in simple_dag.task_ids
+                        if task_id in running_per_task)
 
                 current_task_concurrency = dag_id_to_possibly_running_task_count[dag_id]
-                task_concurrency_limit = simple_dag_bag.get_dag(dag_id).concurrency
-                self.log.info(
+                task_concurrency_limit = simple_dag.concurrency
+                self.log.debug(
                     "DAG %s has %s/%s running and queued tasks",
                     dag_id, current_task_concurrency, task_concurrency_limit
                 )
@@ -1206,10 +1537,7 @@ class SchedulerJob(BaseJob):
                 open_slots -= 1
                 dag_id_to_possibly_running_task_count[dag_id] += 1
 
-        task_instance_str = "\n\t".join(
-            ["{}".format(x) for x in executable_tis])
-        self.log.info(
-            "Setting the following tasks to queued state:\n\t%s", task_instance_str)
+        self._log_task_instances("tasks to set to queued state", executable_tis)
         # so these dont expire on commit
         for ti in executable_tis:
             copy_dag_id = ti.dag_id
@@ -1449,8 +1777,8 @@ class SchedulerJob(BaseJob):
         # TODO: this shares quite a lot of code with _manage_executor_state
 
         TI = models.TaskInstance
-        for key, state in list(self.executor.get_event_buffer(simple_dag_bag.dag_ids)
-                                   .items()):
+        finished_events = []
+        for key, state, info in self.executor.get_events(simple_dag_bag.dag_ids):
             dag_id, task_id, execution_date, try_number = key
             self.log.info(
                 "Executor reports execution of %s.%s execution_date=%s "
@@ -1458,33 +1786,52 @@ class SchedulerJob(BaseJob):
                 dag_id, task_id, execution_date, state, try_number
             )
             if state == State.FAILED or state == State.SUCCESS:
-                qry = session.query(TI).filter(TI.dag_id == dag_id,
-                                               TI.task_id == task_id,
-                                               TI.execution_date == execution_date)
-                ti = qry.first()
-                if not ti:
-                    self.log.warning("TaskInstance %s went missing from the database", ti)
-                    continue
+                finished_events.append((key, state, info))
 
-                # TODO: should we fail RUNNING as well, as we do in Backfills?
-                if ti.try_number == try_number and ti.state == State.QUEUED:
-                    msg = ("Executor reports task instance {} finished ({}) "
-                           "although the task says its {}. Was the task "
-                           "killed externally?".format(ti, state, ti.state))
-                    self.log.error(msg)
-                    try:
-                        simple_dag = simple_dag_bag.get_dag(dag_id)
-                        dagbag = models.DagBag(simple_dag.full_filepath)
-                        dag = dagbag.get_dag(dag_id)
-                        ti.task = dag.get_task(task_id)
-                        ti.handle_failure(msg)
-                    except Exception:
-                        self.log.error("Cannot load the dag bag to handle failure for %s"
-                                       ". Setting task to FAILED without callbacks or "
-                                       "retries. Do you have enough resources?", ti)
-                        ti.state = State.FAILED
-                        session.merge(ti)
-                        session.commit()
+        if not finished_events:
+            return
+
+        # Load the task instances of all the finished tasks at once
+        def query(result, ti_keys):
+            filter_for_tis = [and_(TI.dag_id == dag_id,
+                                   TI.task_id == task_id,
+                                   TI.execution_date == execution_date)
+                              for dag_id, task_id, execution_date in ti_keys]
+            return result + session.query(TI).filter(or_(*filter_for_tis)).all()
+
+        ti_keys = list({key[:3] for key, _, _ in finished_events})
+        tis = helpers.reduce_in_chunks(query, ti_keys, [], self.max_tis_per_query)
+        tis_by_key = {(ti.dag_id, ti.task_id, ti.execution_date): ti for ti in tis}
+
+        for key, state, info in finished_events:
+            dag_id, task_id, execution_date, try_number = key
+            ti = tis_by_key.get(key[:3])
+            if not ti:
+                self.log.warning("TaskInstance %s.%s execution_date=%s went missing "
+                                 "from the database", dag_id, task_id, execution_date)
+                continue
+
+            # TODO: should we fail RUNNING as well, as we do in Backfills?
+            if ti.try_number == try_number and ti.state == State.QUEUED:
+                msg = ("Executor reports task instance {} finished ({}) "
+                       "although the task says its {}. Was the task "
+                       "killed externally?".format(ti, state, ti.state))
+                if info:
+                    msg += " Executor info: {}".format(info)
+                self.log.error(msg)
+                try:
+                    simple_dag = simple_dag_bag.get_dag(dag_id)
+                    dagbag = models.DagBag(simple_dag.full_filepath)
+                    dag = dagbag.get_dag(dag_id)
+                    ti.task = dag.get_task(task_id)
+                    ti.handle_failure(msg)
+                except Exception:
+                    self.log.error("Cannot load the dag bag to handle failure for %s"
+                                   ". Setting task to FAILED without callbacks or "
+                                   "retries. Do you have enough resources?", ti)
+                    ti.state = State.FAILED
+                    session.merge(ti)
+                    session.commit()
 
     def _execute(self):
         self.log.info("Starting the scheduler")
@@ -1556,100 +1903,125 @@ class SchedulerJob(BaseJob):
         # Last time that self.heartbeat() was called.
         last_self_heartbeat_time = timezone.utcnow()
 
-        # For the execute duration, parse and schedule DAGs
-        while True:
-            self.log.debug("Starting Loop...")
-            loop_start_time = time.time()
+        profiler = self.loop_profiler
+        profiler.start()
 
-            if self.using_sqlite:
-                self.processor_agent.heartbeat()
-                # For the sqlite case w/ 1 thread, wait until the processor
-                # is finished to avoid concurrent access to the DB.
-                self.log.debug(
-                    "Waiting for processors to finish since we're using sqlite")
-                self.processor_agent.wait_until_finished()
-
-            self.log.debug("Harvesting DAG parsing results")
-            simple_dags = self.processor_agent.harvest_simple_dags()
-            self.log.debug("Harvested {} SimpleDAGs".format(len(simple_dags)))
-
-            # Send tasks for execution if available
-            simple_dag_bag = SimpleDagBag(simple_dags)
-            if len(simple_dags) > 0:
-                try:
-                    simple_dag_bag = SimpleDagBag(simple_dags)
-
-                    # Handle cases where a DAG run state is set (perhaps manually) to
-                    # a non-running state. Handle task instances that belong to
-                    # DAG runs in those states
-
-                    # If a task instance is up for retry but the corresponding DAG run
-                    # isn't running, mark the task instance as FAILED so we don't try
-                    # to re-run it.
-                    self._change_state_for_tis_without_dagrun(simple_dag_bag,
-                                                              [State.UP_FOR_RETRY],
-                                                              State.FAILED)
-                    # If a task instance is scheduled or queued or up for reschedule,
-                    # but the corresponding DAG run isn't running, set the state to
-                    # NONE so we don't try to re-run it.
-                    self._change_state_for_tis_without_dagrun(simple_dag_bag,
-                                                              [State.QUEUED,
-                                                               State.SCHEDULED,
-                                                               State.UP_FOR_RESCHEDULE],
-                                                              State.NONE)
-
-                    self._execute_task_instances(simple_dag_bag,
-                                                 (State.SCHEDULED,))
-                except Exception as e:
-                    self.log.error("Error queuing tasks")
-                    self.log.exception(e)
-                    continue
-
-            # Call heartbeats
-            self.log.debug("Heartbeating the executor")
-            self.executor.heartbeat()
-
-            self._change_state_for_tasks_failed_to_execute()
+        try:
+            # For the execute duration, parse and schedule DAGs
+            while True:
+                self.log.debug("Starting Loop...")
+                loop_start_time = time.time()
+                profiler.start_loop()
+
+                if self.using_sqlite:
+                    with profiler.phase('wait_for_processors'):
+                        self.processor_agent.heartbeat()
+                        # For the sqlite case w/ 1 thread, wait until the processor
+                        # is finished to avoid concurrent access to the DB.
+                        self.log.debug(
+                            "Waiting for processors to finish since we're using sqlite")
+                        self.processor_agent.wait_until_finished()
 
-            # Process events from the executor
-            self._process_executor_events(simple_dag_bag)
+                self.log.debug("Harvesting DAG parsing results")
+                with profiler.phase('harvest_simple_dags'):
+                    simple_dags = self.processor_agent.harvest_simple_dags()
+                self.log.debug("Harvested {} SimpleDAGs".format(len(simple_dags)))
 
-            # Heartbeat the scheduler periodically
-            time_since_last_heartbeat = (timezone.utcnow() -
-                                         last_self_heartbeat_time).total_seconds()
-            if time_since_last_heartbeat > self.heartrate:
-                self.log.debug("Heartbeating the scheduler")
-                self.heartbeat()
-                last_self_heartbeat_time = timezone.utcnow()
+                # Send tasks for execution if available
+                simple_dag_bag = SimpleDagBag(simple_dags)
+                if len(simple_dags) > 0:
+                    try:
+                        simple_dag_bag = SimpleDagBag(simple_dags)
+
+                        # Handle cases where a DAG run state is set (perhaps manually) to
+                        # a non-running state. Handle task instances that belong to
+                        # DAG runs in those states
+
+                        with profiler.phase('change_state_for_tis_without_dagrun'):
+                            # If a task instance is up for retry but the corresponding
+                            # DAG run isn't running, mark the task instance as FAILED
+                            # so we don't try to re-run it.
+                            self._change_state_for_tis_without_dagrun(simple_dag_bag,
+                                                                      [State.UP_FOR_RETRY],
+                                                                      State.FAILED)
+                            # If a task instance is scheduled or queued or up for
+                            # reschedule, but the corresponding DAG run isn't running,
+                            # set the state to NONE so we don't try to re-run it.
+                            self._change_state_for_tis_without_dagrun(simple_dag_bag,
+                                                                      [State.QUEUED,
+                                                                       State.SCHEDULED,
+                                                                       State.UP_FOR_RESCHEDULE],
+                                                                      State.NONE)
+
+                        with profiler.phase('execute_task_instances'):
+                            self._execute_task_instances(simple_dag_bag,
+                                                         (State.SCHEDULED,))
+                    except Exception as e:
+                        self.log.error("Error queuing tasks")
+                        self.log.exception(e)
+                        profiler.end_loop()
+                        continue
 
-            is_unit_test = conf.getboolean('core', 'unit_test_mode')
-            loop_end_time = time.time()
-            loop_duration = loop_end_time - loop_start_time
-            self.log.debug(
-                "Ran scheduling loop in %.2f seconds",
-                loop_duration)
+                # Call heartbeats
+                self.log.debug("Heartbeating the executor")
+                with profiler.phase('executor_heartbeat'):
+                    self.executor.heartbeat()
+
+                with profiler.phase('change_state_for_tasks_failed_to_execute'):
+                    self._change_state_for_tasks_failed_to_execute()
+
+                # Process events from the executor
+                with profiler.phase('process_executor_events'):
+                    self._process_executor_events(simple_dag_bag)
+
+                # Heartbeat the scheduler periodically
+                time_since_last_heartbeat = (timezone.utcnow() -
+                                             last_self_heartbeat_time).total_seconds()
+                if time_since_last_heartbeat > self.heartrate:
+                    self.log.debug("Heartbeating the scheduler")
+                    with profiler.phase('scheduler_heartbeat'):
+                        self.heartbeat()
+                    last_self_heartbeat_time = timezone.utcnow()
+
+                is_unit_test = conf.getboolean('core', 'unit_test_mode')
+                loop_end_time = time.time()
+                loop_duration = loop_end_time - loop_start_time
+                loop_stats = profiler.end_loop()
+                if self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug(
+                        "Ran scheduling loop in %.2f seconds: %s",
+                        loop_duration,
+                        ", ".join("{} {:.2f}s/{} queries".format(name, phase['duration'],
+                                                                 phase['queries'])
+                                  for name, phase in loop_stats['phases'].items()))
+
+                # Wait for the next loop, unless tasks finish in the meantime
+                has_executor_events = False
+                if not is_unit_test:
+                    self.log.debug("Waiting for %.2f seconds", self._processor_poll_interval)
+                    has_executor_events = self.executor.wait_for_events(
+                        self._processor_poll_interval)
+
+                # Exit early for a test mode, run one additional scheduler loop
+                # to reduce the possibility that parsed DAG was put into the queue
+                # by the DAG manager but not yet received by DAG agent.
+                if self.processor_agent.done:
+                    self._last_loop = True
+
+                if self._last_loop:
+                    self.log.info("Exiting scheduler loop as all files"
+                                  " have been processed {} times".format(self.num_runs))
+                    break
 
-            if not is_unit_test:
-                self.log.debug("Sleeping for %.2f seconds", self._processor_poll_interval)
-                time.sleep(self._processor_poll_interval)
-
-            # Exit early for a test mode, run one additional scheduler loop
-            # to reduce the possibility that parsed DAG was put into the queue
-            # by the DAG manager but not yet received by DAG agent.
-            if self.processor_agent.done:
-                self._last_loop = True
-
-            if self._last_loop:
-                self.log.info("Exiting scheduler loop as all files"
-                              " have been processed {} times".format(self.num_runs))
-                break
-
-            if loop_duration < 1 and not is_unit_test:
-                sleep_length = 1 - loop_duration
-                self.log.debug(
-                    "Sleeping for {0:.2f} seconds to prevent excessive logging"
-                    .format(sleep_length))
-                sleep(sleep_length)
+                if loop_duration < 1 and not is_unit_test and not has_executor_events:
+                    sleep_length = 1 - loop_duration
+                    self.log.debug(
+                        "Waiting for {0:.2f} seconds to prevent excessive logging"
+                        .format(sleep_length))
+                    self.executor.wait_for_events(sleep_length)
+        finally:
+            # The profile is dumped even if the loop failed
+            profiler.stop()
 
         # Stop any processors
         self.processor_agent.terminate()
@@ -1718,6 +2090,21 @@ class SchedulerJob(BaseJob):
         for dag in dagbag.dags.values():
             dag.sync_to_db()
 
+        # Store the DAGs for the webserver, which then does not import DAG files
+        if conf.getboolean('core', 'store_serialized_dags'):
+            for dag in dagbag.dags.values():
+                try:
+                    SerializedDagModel.write_dag(dag, session=session)
+                except Exception:
+                    self.log.exception("Failed to store the serialization of %s", dag)
+                    session.rollback()
+            try:
+                SerializedDagModel.remove_deleted_dags(
+                    file_path, list(dagbag.dags.keys()), session=session)
+            except Exception:
+                self.log.exception("Failed to remove the DAGs deleted from %s", file_path)
+                session.rollback()
+
         paused_dag_ids = [dag.dag_id for dag in dagbag.dags.values()
                           if dag.is_paused]
 
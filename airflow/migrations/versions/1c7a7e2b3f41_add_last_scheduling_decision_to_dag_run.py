@@ -0,0 +1,49 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Add last_scheduling_decision to dag_run
+
+Revision ID: 1c7a7e2b3f41
+Revises: cf5dc11e79ad
+Create Date: 2019-02-11 10:12:41.395113
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = '1c7a7e2b3f41'
+down_revision = 'cf5dc11e79ad'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'mysql':
+        op.add_column('dag_run', sa.Column('last_scheduling_decision',
+                                           mysql.TIMESTAMP(fsp=6), nullable=True))
+    else:
+        op.add_column('dag_run', sa.Column('last_scheduling_decision',
+                                           sa.TIMESTAMP(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('dag_run', 'last_scheduling_decision')
@@ -0,0 +1,42 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Add verified_dag_hash to dag_run
+
+Revision ID: b4c2e6f1a9d7
+Revises: 1c7a7e2b3f41
+Create Date: 2019-02-18 14:27:03.218611
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b4c2e6f1a9d7'
+down_revision = '1c7a7e2b3f41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('dag_run', sa.Column('verified_dag_hash', sa.String(length=40), nullable=True))
+
+
+def downgrade():
+    op.drop_column('dag_run', 'verified_dag_hash')
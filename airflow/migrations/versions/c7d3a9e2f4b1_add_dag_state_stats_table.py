@@ -0,0 +1,60 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Add dag_state_stats table
+
+Revision ID: c7d3a9e2f4b1
+Revises: e5f1a6c9d2b3
+Create Date: 2019-03-11 15:27:08.216543
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = 'c7d3a9e2f4b1'
+down_revision = 'e5f1a6c9d2b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # See 0e2a74e0fc9f_add_time_zone_awareness
+    conn = op.get_bind()
+    if conn.dialect.name == 'mysql':
+        timestamp = mysql.TIMESTAMP(fsp=6)
+    elif conn.dialect.name == 'mssql':
+        timestamp = sa.DateTime()
+    else:
+        timestamp = sa.TIMESTAMP(timezone=True)
+
+    op.create_table(
+        'dag_state_stats',
+        sa.Column('dag_id', sa.String(length=250), nullable=False),
+        sa.Column('dag_run_states', sa.Text(), nullable=False),
+        sa.Column('task_instance_states', sa.Text(), nullable=False),
+        # use explicit server_default=None otherwise mysql implies defaults for first timestamp column
+        sa.Column('last_updated', timestamp, nullable=False, server_default=None),
+        sa.PrimaryKeyConstraint('dag_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('dag_state_stats')
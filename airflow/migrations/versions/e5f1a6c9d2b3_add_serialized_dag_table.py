@@ -0,0 +1,61 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Add serialized_dag table
+
+Revision ID: e5f1a6c9d2b3
+Revises: b4c2e6f1a9d7
+Create Date: 2019-03-04 10:12:41.483311
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+# revision identifiers, used by Alembic.
+revision = 'e5f1a6c9d2b3'
+down_revision = 'b4c2e6f1a9d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # See 0e2a74e0fc9f_add_time_zone_awareness
+    conn = op.get_bind()
+    if conn.dialect.name == 'mysql':
+        timestamp = mysql.TIMESTAMP(fsp=6)
+    elif conn.dialect.name == 'mssql':
+        timestamp = sa.DateTime()
+    else:
+        timestamp = sa.TIMESTAMP(timezone=True)
+
+    op.create_table(
+        'serialized_dag',
+        sa.Column('dag_id', sa.String(length=250), nullable=False),
+        sa.Column('fileloc', sa.String(length=2000), nullable=False),
+        sa.Column('data', sa.Text().with_variant(mysql.MEDIUMTEXT(), 'mysql'), nullable=False),
+        sa.Column('dag_hash', sa.String(length=40), nullable=False),
+        # use explicit server_default=None otherwise mysql implies defaults for first timestamp column
+        sa.Column('last_updated', timestamp, nullable=False, server_default=None),
+        sa.PrimaryKeyConstraint('dag_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('serialized_dag')
@@ -54,6 +54,7 @@ import re
 import signal
 import sys
 import textwrap
+import time
 import traceback
 import warnings
 import hashlib
@@ -63,7 +64,7 @@ from urllib.parse import quote
 
 from sqlalchemy import (
     Boolean, Column, DateTime, Float, Index, Integer, PickleType, String,
-    Text, UniqueConstraint, and_, func, or_
+    Text, UniqueConstraint, and_, func, inspect, or_
 )
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import reconstructor, synonym
@@ -82,9 +83,11 @@ from airflow.exceptions import (
 )
 from airflow.dag.base_dag import BaseDag, BaseDagBag
 from airflow.lineage import apply_lineage, prepare_lineage
+from airflow.models.dag_state_stats import DagStateStats  # noqa: F401
 from airflow.models.dagpickle import DagPickle
 from airflow.models.kubernetes import KubeWorkerIdentifier, KubeResourceVersion  # noqa: F401
 from airflow.models.log import Log
+from airflow.models.serialized_dag import SerializedDagModel  # noqa: F401
 from airflow.models.taskfail import TaskFail
 from airflow.models.taskreschedule import TaskReschedule
 from airflow.models.xcom import XCom
@@ -94,6 +97,7 @@ from airflow.ti_deps.deps.trigger_rule_dep import TriggerRuleDep
 
 from airflow.ti_deps.dep_context import DepContext, QUEUE_DEPS, RUN_DEPS
 from airflow.utils import timezone
+from airflow.utils.dag_parse_cache import DagParseCache
 from airflow.utils.dag_processing import list_py_file_paths
 from airflow.utils.dates import cron_presets, date_range as utils_date_range
 from airflow.utils.db import provide_session
@@ -241,6 +245,7 @@ def clear_task_instances(tis,
         for dr in drs:
             dr.state = State.RUNNING
             dr.start_date = timezone.utcnow()
+            dr.last_scheduling_decision = None
 
 
 def get_last_dagrun(dag_id, session, include_externally_triggered=False):
@@ -304,6 +309,10 @@ class DagBag(BaseDagBag, LoggingMixin):
         self.executor = executor
         self.import_errors = {}
         self.has_logged = False
+        self.parse_cache = None
+        if configuration.conf.getboolean('core', 'dag_parse_cache'):
+            self.parse_cache = DagParseCache(
+                configuration.conf.get('core', 'dag_parse_cache_folder'))
 
         self.collect_dags(
             dag_folder=dag_folder,
@@ -374,6 +383,10 @@ class DagBag(BaseDagBag, LoggingMixin):
             return found_dags
 
         mods = []
+        cached_dags = None
+        mod_name = None
+        source = None
+        imported_at = None
         is_zipfile = zipfile.is_zipfile(filepath)
         if not is_zipfile:
             if safe_mode and os.path.isfile(filepath):
@@ -395,17 +408,26 @@ class DagBag(BaseDagBag, LoggingMixin):
                         hashlib.sha1(filepath.encode('utf-8')).hexdigest() +
                         '_' + org_mod_name)
 
-            if mod_name in sys.modules:
-                del sys.modules[mod_name]
+            if self.parse_cache:
+                # The contents are hashed before the file is imported, so the DAGs
+                # of a file edited in the meantime are not cached as up to date
+                with open(filepath, 'rb') as f:
+                    source = f.read()
+                cached_dags = self.parse_cache.get(filepath, source)
 
-            with timeout(configuration.conf.getint('core', "DAGBAG_IMPORT_TIMEOUT")):
-                try:
-                    m = imp.load_source(mod_name, filepath)
-                    mods.append(m)
-                except Exception as e:
-                    self.log.exception("Failed to import: %s", filepath)
-                    self.import_errors[filepath] = str(e)
-                    self.file_last_changed[filepath] = file_last_changed_on_disk
+            if cached_dags is None:
+                if mod_name in sys.modules:
+                    del sys.modules[mod_name]
+
+                with timeout(configuration.conf.getint('core', "DAGBAG_IMPORT_TIMEOUT")):
+                    try:
+                        imported_at = time.time()
+                        m = imp.load_source(mod_name, filepath)
+                        mods.append(m)
+                    except Exception as e:
+                        self.log.exception("Failed to import: %s", filepath)
+                        self.import_errors[filepath] = str(e)
+                        self.file_last_changed[filepath] = file_last_changed_on_disk
 
         else:
             zip_file = zipfile.ZipFile(filepath)
@@ -442,33 +464,44 @@ class DagBag(BaseDagBag, LoggingMixin):
                         self.import_errors[filepath] = str(e)
                         self.file_last_changed[filepath] = file_last_changed_on_disk
 
+        top_level_dags = list(cached_dags or [])
         for m in mods:
-            for dag in list(m.__dict__.values()):
-                if isinstance(dag, DAG):
-                    if not dag.full_filepath:
-                        dag.full_filepath = filepath
-                        if dag.fileloc != filepath and not is_zipfile:
-                            dag.fileloc = filepath
-                    try:
-                        dag.is_subdag = False
-                        self.bag_dag(dag, parent_dag=dag, root_dag=dag)
-                        if isinstance(dag._schedule_interval, six.string_types):
-                            croniter(dag._schedule_interval)
-                        found_dags.append(dag)
-                        found_dags += dag.subdags
-                    except (CroniterBadCronError,
-                            CroniterBadDateError,
-                            CroniterNotAlphaError) as cron_e:
-                        self.log.exception("Failed to bag_dag: %s", dag.full_filepath)
-                        self.import_errors[dag.full_filepath] = \
-                            "Invalid Cron expression: " + str(cron_e)
-                        self.file_last_changed[dag.full_filepath] = \
-                            file_last_changed_on_disk
-                    except AirflowDagCycleException as cycle_exception:
-                        self.log.exception("Failed to bag_dag: %s", dag.full_filepath)
-                        self.import_errors[dag.full_filepath] = str(cycle_exception)
-                        self.file_last_changed[dag.full_filepath] = \
-                            file_last_changed_on_disk
+            top_level_dags += [dag for dag in list(m.__dict__.values())
+                               if isinstance(dag, DAG)]
+
+        bagged_dags = []
+        for dag in top_level_dags:
+            if not dag.full_filepath:
+                dag.full_filepath = filepath
+                if dag.fileloc != filepath and not is_zipfile:
+                    dag.fileloc = filepath
+            try:
+                dag.is_subdag = False
+                self.bag_dag(dag, parent_dag=dag, root_dag=dag)
+                if isinstance(dag._schedule_interval, six.string_types):
+                    croniter(dag._schedule_interval)
+                found_dags.append(dag)
+                found_dags += dag.subdags
+                bagged_dags.append(dag)
+            except (CroniterBadCronError,
+                    CroniterBadDateError,
+                    CroniterNotAlphaError) as cron_e:
+                self.log.exception("Failed to bag_dag: %s", dag.full_filepath)
+                self.import_errors[dag.full_filepath] = \
+                    "Invalid Cron expression: " + str(cron_e)
+                self.file_last_changed[dag.full_filepath] = \
+                    file_last_changed_on_disk
+            except AirflowDagCycleException as cycle_exception:
+                self.log.exception("Failed to bag_dag: %s", dag.full_filepath)
+                self.import_errors[dag.full_filepath] = str(cycle_exception)
+                self.file_last_changed[dag.full_filepath] = \
+                    file_last_changed_on_disk
+
+        # Only cache files that were freshly imported without any error
+        if (self.parse_cache and mods and not is_zipfile and
+                len(bagged_dags) == len(top_level_dags) and
+                filepath not in self.import_errors):
+            self.parse_cache.set(filepath, mod_name, bagged_dags, source, imported_at)
 
         self.file_last_changed[filepath] = file_last_changed_on_disk
         return found_dags
@@ -4310,6 +4343,8 @@ class DagRun(Base, LoggingMixin):
     run_id = Column(String(ID_LEN))
     external_trigger = Column(Boolean, default=True)
     conf = Column(PickleType)
+    last_scheduling_decision = Column(UtcDateTime)
+    verified_dag_hash = Column(String(40))
 
     dag = None
 
@@ -4526,17 +4561,22 @@ class DagRun(Base, LoggingMixin):
                                     for t in unfinished_tasks)
         # small speed up
         if unfinished_tasks and none_depends_on_past and none_task_concurrency:
-            # todo: this can actually get pretty slow: one task costs between 0.01-015s
+            # the upstream states of every unfinished task are derived from the
+            # task instances loaded above instead of one query per task
+            finished_tasks = [t for t in tis
+                              if t.state in State.finished() + [State.UPSTREAM_FAILED]]
+            dep_context = DepContext(
+                flag_upstream_failed=True,
+                ignore_in_retry_period=True,
+                ignore_in_reschedule_period=True,
+                finished_tasks=finished_tasks)
             no_dependencies_met = True
             for ut in unfinished_tasks:
                 # We need to flag upstream and check for changes because upstream
                 # failures/re-schedules can result in deadlock false positives
                 old_state = ut.state
                 deps_met = ut.are_dependencies_met(
-                    dep_context=DepContext(
-                        flag_upstream_failed=True,
-                        ignore_in_retry_period=True,
-                        ignore_in_reschedule_period=True),
+                    dep_context=dep_context,
                     session=session)
                 if deps_met or old_state != ut.current_state(session=session):
                     no_dependencies_met = False
@@ -4588,51 +4628,86 @@ class DagRun(Base, LoggingMixin):
         """
         Verifies the DagRun by checking for removed tasks or tasks that are not in the
         database yet. It will set state to removed or add the task if required.
+
+        The check is skipped if neither the tasks of the DAG nor the state of the
+        run changed since the run was last verified.
         """
         dag = self.get_dag()
-        tis = self.get_task_instances(session=session)
+        dag_hash = self._get_verified_dag_hash(dag)
+        if dag_hash == self.verified_dag_hash:
+            return
+
+        TI = TaskInstance
+        ti_states = dict(
+            session.query(TI.task_id, TI.state)
+            .filter(TI.dag_id == self.dag_id,
+                    TI.execution_date == self.execution_date)
+            .all())
+
+        def set_ti_state(task_ids, state):
+            session.query(TI).filter(
+                TI.dag_id == self.dag_id,
+                TI.execution_date == self.execution_date,
+                TI.task_id.in_(task_ids),
+            ).update({TI.state: state}, synchronize_session='fetch')
 
         # check for removed or restored tasks
-        task_ids = []
-        for ti in tis:
-            task_ids.append(ti.task_id)
-            task = None
-            try:
-                task = dag.get_task(ti.task_id)
-            except AirflowException:
-                if ti.state == State.REMOVED:
-                    pass  # ti has already been removed, just ignore it
-                elif self.state is not State.RUNNING and not dag.partial:
-                    self.log.warning("Failed to get task '{}' for dag '{}'. "
-                                     "Marking it as removed.".format(ti, dag))
-                    Stats.incr(
-                        "task_removed_from_dag.{}".format(dag.dag_id), 1, 1)
-                    ti.state = State.REMOVED
-
-            is_task_in_dag = task is not None
-            should_restore_task = is_task_in_dag and ti.state == State.REMOVED
-            if should_restore_task:
-                self.log.info("Restoring task '{}' which was previously "
-                              "removed from DAG '{}'".format(ti, dag))
-                Stats.incr("task_restored_to_dag.{}".format(dag.dag_id), 1, 1)
-                ti.state = State.NONE
+        dag_task_ids = set(dag.task_ids)
+        removed_task_ids = [task_id for task_id, state in ti_states.items()
+                            if task_id not in dag_task_ids and state != State.REMOVED]
+        if removed_task_ids and self.state is not State.RUNNING and not dag.partial:
+            self.log.warning("Failed to get tasks %s for dag '%s'. "
+                             "Marking them as removed.", removed_task_ids, dag)
+            Stats.incr("task_removed_from_dag.{}".format(dag.dag_id),
+                       len(removed_task_ids), 1)
+            set_ti_state(removed_task_ids, State.REMOVED)
+
+        restored_task_ids = [task_id for task_id, state in ti_states.items()
+                             if task_id in dag_task_ids and state == State.REMOVED]
+        if restored_task_ids:
+            self.log.info("Restoring tasks %s which were previously "
+                          "removed from DAG '%s'", restored_task_ids, dag)
+            Stats.incr("task_restored_to_dag.{}".format(dag.dag_id),
+                       len(restored_task_ids), 1)
+            set_ti_state(restored_task_ids, State.NONE)
+            self.last_scheduling_decision = None
 
         # check for missing tasks
+        missing_tis = []
         for task in six.itervalues(dag.task_dict):
             if task.adhoc:
                 continue
             if task.start_date > self.execution_date and not self.is_backfill:
                 continue
 
-            if task.task_id not in task_ids:
+            if task.task_id not in ti_states:
                 Stats.incr(
                     "task_instance_created-{}".format(task.__class__.__name__),
                     1, 1)
-                ti = TaskInstance(task, self.execution_date)
-                session.add(ti)
-
+                missing_tis.append(TaskInstance(task, self.execution_date))
+        if missing_tis:
+            column_attrs = inspect(TaskInstance).column_attrs
+            session.bulk_insert_mappings(TaskInstance, [
+                {attr.key: getattr(ti, attr.key) for attr in column_attrs}
+                for ti in missing_tis])
+            # new task instances have not been evaluated by the scheduler yet
+            self.last_scheduling_decision = None
+
+        self.verified_dag_hash = dag_hash
         session.commit()
 
+    def _get_verified_dag_hash(self, dag):
+        """
+        Returns a hash of everything verify_integrity depends on: the tasks of
+        the DAG and the state of this run.
+        """
+        tasks = sorted(
+            (task.task_id, task.adhoc,
+             task.start_date.isoformat() if task.start_date else None)
+            for task in dag.tasks)
+        return hashlib.sha1(json.dumps(
+            [self.state, self.is_backfill, dag.partial, tasks]).encode('utf-8')).hexdigest()
+
     @staticmethod
     def get_run(session, dag_id, execution_date):
         """
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import Column, String, Text, and_, func, union_all
+
+from airflow import configuration as conf
+from airflow.models.base import Base, ID_LEN
+from airflow.utils import timezone
+from airflow.utils.db import provide_session
+from airflow.utils.sqlalchemy import UtcDateTime
+from airflow.utils.state import State
+
+
+class DagStateStats(Base):
+    """
+    Model that stores, for every DAG, the number of its DAG runs by state and
+    the number of task instances by state of its running DAG runs, or of its
+    last DAG run if none is running. Counting them over the whole dag_run and
+    task_instance tables is slow, so the scheduler refreshes them every
+    ``[scheduler] dag_state_stats_refresh_interval`` seconds and the home page
+    of the webserver reads them from here.
+    """
+    __tablename__ = 'dag_state_stats'
+
+    DAG_RUN_STATES = 'dag_run_states'
+    TASK_INSTANCE_STATES = 'task_instance_states'
+
+    dag_id = Column(String(ID_LEN), primary_key=True)
+    # The counts are JSON lists of [state, count] pairs
+    dag_run_states = Column(Text, nullable=False)
+    task_instance_states = Column(Text, nullable=False)
+    last_updated = Column(UtcDateTime, nullable=False)
+
+    def __repr__(self):
+        return '<DagStateStats: {}>'.format(self.dag_id)
+
+    @staticmethod
+    def count_dag_run_states(session, dag_ids=None):
+        """
+        Counts the DAG runs by state in the dag_run table.
+
+        :param dag_ids: only count the DAG runs of these DAGs, all if None
+        :type dag_ids: list[str]
+        :return: the counts by state by dag_id
+        :rtype: dict[str, dict[str, int]]
+        """
+        from airflow.models import DagRun
+
+        qry = (
+            session.query(DagRun.dag_id, DagRun.state, func.count(DagRun.state))
+            .group_by(DagRun.dag_id, DagRun.state)
+        )
+        if dag_ids is not None:
+            qry = qry.filter(DagRun.dag_id.in_(dag_ids))
+
+        counts = defaultdict(dict)
+        for dag_id, state, count in qry:
+            counts[dag_id][state] = count
+        return dict(counts)
+
+    @staticmethod
+    def count_task_instance_states(session, dag_ids=None):
+        """
+        Counts the task instances by state of the running DAG runs of active
+        DAGs, or of their last DAG run if none is running, in the
+        task_instance table.
+
+        :param dag_ids: only count the task instances of these DAGs, all if None
+        :type dag_ids: list[str]
+        :return: the counts by state by dag_id
+        :rtype: dict[str, dict[str, int]]
+        """
+        from airflow.models import DagModel, DagRun, TaskInstance as TI
+
+        LastDagRun = (
+            session.query(
+                DagRun.dag_id,
+                func.max(DagRun.execution_date).label('execution_date')
+            )
+            .join(DagModel, DagModel.dag_id == DagRun.dag_id)
+            .filter(DagRun.state != State.RUNNING, DagModel.is_active)
+        )
+        RunningDagRun = (
+            session.query(DagRun.dag_id, DagRun.execution_date)
+                   .join(DagModel, DagModel.dag_id == DagRun.dag_id)
+                   .filter(DagRun.state == State.RUNNING, DagModel.is_active)
+        )
+        if dag_ids is not None:
+            LastDagRun = LastDagRun.filter(DagRun.dag_id.in_(dag_ids))
+            RunningDagRun = RunningDagRun.filter(DagRun.dag_id.in_(dag_ids))
+        LastDagRun = LastDagRun.group_by(DagRun.dag_id).subquery('last_dag_run')
+        RunningDagRun = RunningDagRun.subquery('running_dag_run')
+
+        # Select all task_instances from active dag_runs.
+        # If no dag_run is active, return task instances from most recent dag_run.
+        LastTI = (
+            session.query(TI.dag_id.label('dag_id'), TI.state.label('state'))
+                   .join(LastDagRun,
+                         and_(LastDagRun.c.dag_id == TI.dag_id,
+                              LastDagRun.c.execution_date == TI.execution_date))
+        )
+        RunningTI = (
+            session.query(TI.dag_id.label('dag_id'), TI.state.label('state'))
+                   .join(RunningDagRun,
+                         and_(RunningDagRun.c.dag_id == TI.dag_id,
+                              RunningDagRun.c.execution_date == TI.execution_date))
+        )
+
+        UnionTI = union_all(LastTI, RunningTI).alias('union_ti')
+        qry = (
+            session.query(UnionTI.c.dag_id, UnionTI.c.state, func.count())
+                   .group_by(UnionTI.c.dag_id, UnionTI.c.state)
+        )
+
+        counts = defaultdict(dict)
+        for dag_id, state, count in qry:
+            counts[dag_id][state] = count
+        return dict(counts)
+
+    @classmethod
+    @provide_session
+    def refresh(cls, session=None):
+        """
+        Counts the states of the DAG runs and of the task instances of every
+        DAG again and stores them.
+        """
+        from airflow.models import DagModel
+
+        dag_run_counts = cls.count_dag_run_states(session)
+        task_instance_counts = cls.count_task_instance_states(session)
+        dag_ids = set(dag_id for dag_id, in session.query(DagModel.dag_id))
+        dag_ids.update(dag_run_counts, task_instance_counts)
+
+        now = timezone.utcnow()
+        stats = {stat.dag_id: stat for stat in session.query(cls)}
+        for dag_id, stat in stats.items():
+            if dag_id not in dag_ids:
+                session.delete(stat)
+        for dag_id in dag_ids:
+            stat = stats.get(dag_id)
+            if stat is None:
+                stat = cls(dag_id=dag_id)
+                session.add(stat)
+            stat.dag_run_states = json.dumps(list(dag_run_counts.get(dag_id, {}).items()))
+            stat.task_instance_states = json.dumps(list(task_instance_counts.get(dag_id, {}).items()))
+            stat.last_updated = now
+        session.commit()
+
+    @classmethod
+    @provide_session
+    def get_counts(cls, kind, dag_ids=None, session=None):
+        """
+        Returns the stored counts of the DAG runs or of the task instances by
+        state. They are counted in the dag_run or task_instance table instead
+        when the scheduler did not refresh them for twice the refresh interval.
+
+        :param kind: ``DAG_RUN_STATES`` or ``TASK_INSTANCE_STATES``
+        :type kind: str
+        :param dag_ids: only return the counts of these DAGs, all if None
+        :type dag_ids: list[str]
+        :return: the counts by state by dag_id
+        :rtype: dict[str, dict[str, int]]
+        """
+        count_states = {
+            cls.DAG_RUN_STATES: cls.count_dag_run_states,
+            cls.TASK_INSTANCE_STATES: cls.count_task_instance_states,
+        }[kind]
+        refresh_interval = conf.getint('scheduler', 'dag_state_stats_refresh_interval')
+        if refresh_interval <= 0:
+            return count_states(session, dag_ids)
+
+        qry = session.query(cls.dag_id, getattr(cls, kind), cls.last_updated)
+        if dag_ids is not None:
+            qry = qry.filter(cls.dag_id.in_(dag_ids))
+        rows = qry.all()
+        expiration = timezone.utcnow() - timedelta(seconds=2 * refresh_interval)
+        if not rows or max(last_updated for _, _, last_updated in rows) < expiration:
+            return count_states(session, dag_ids)
+        return {dag_id: dict(json.loads(counts)) for dag_id, counts, _ in rows}
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import hashlib
+import json
+
+from sqlalchemy import Column, String, Text
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
+
+from airflow.models.base import Base, ID_LEN
+from airflow.utils import timezone
+from airflow.utils.db import provide_session
+from airflow.utils.log.logging_mixin import LoggingMixin
+from airflow.utils.sqlalchemy import UtcDateTime
+
+
+class SerializedDagModel(Base):
+    """
+    Model that stores the JSON serialization of the DAGs found by the
+    scheduler, so that the webserver can display them without importing the
+    DAG files. See ``airflow.dag.serialization``.
+    """
+    __tablename__ = 'serialized_dag'
+
+    dag_id = Column(String(ID_LEN), primary_key=True)
+    # The DAG file or zip archive the DAG was found in, which is the file of
+    # the parent DAG for a sub-DAG
+    fileloc = Column(String(2000), nullable=False)
+    data = Column(Text().with_variant(MEDIUMTEXT(), 'mysql'), nullable=False)
+    dag_hash = Column(String(40), nullable=False)
+    last_updated = Column(UtcDateTime, nullable=False)
+
+    def __repr__(self):
+        return '<SerializedDag: {}>'.format(self.dag_id)
+
+    @classmethod
+    @provide_session
+    def write_dag(cls, dag, session=None):
+        """
+        Stores the serialization of a DAG, unless the stored one is identical.
+
+        :param dag: the DAG to store
+        :type dag: airflow.models.DAG
+        :return: whether the DAG was written
+        :rtype: bool
+        """
+        from airflow.dag.serialization import serialize_dag
+
+        data = json.dumps(serialize_dag(dag), sort_keys=True, separators=(',', ':'))
+        dag_hash = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        fileloc = dag.full_filepath or dag.fileloc
+        stored = session.query(cls.dag_hash, cls.fileloc).filter(cls.dag_id == dag.dag_id).first()
+        if stored == (dag_hash, fileloc):
+            return False
+
+        session.merge(cls(dag_id=dag.dag_id, fileloc=fileloc, data=data,
+                          dag_hash=dag_hash, last_updated=timezone.utcnow()))
+        session.commit()
+        return True
+
+    @classmethod
+    @provide_session
+    def remove_deleted_dags(cls, file_path, dag_ids, session=None):
+        """
+        Deletes the serialization of the DAGs that are no longer defined in a
+        DAG file.
+
+        :param file_path: the path of the DAG file, or of the zip archive
+        :type file_path: unicode
+        :param dag_ids: the DAGs defined in the file
+        :type dag_ids: list[unicode]
+        """
+        deleted_dag_ids = [
+            dag_id for dag_id, in session.query(cls.dag_id).filter(cls.fileloc == file_path)
+            if dag_id not in dag_ids
+        ]
+        cls._delete(deleted_dag_ids, session)
+
+    @classmethod
+    @provide_session
+    def remove_deleted_files(cls, file_paths, session=None):
+        """
+        Deletes the serialization of the DAGs whose file is not one of the
+        DAG files.
+
+        :param file_paths: the paths of the DAG files and zip archives
+        :type file_paths: list[unicode]
+        """
+        file_paths = set(file_paths)
+        deleted_dag_ids = [
+            dag_id for dag_id, fileloc in session.query(cls.dag_id, cls.fileloc)
+            if fileloc not in file_paths
+        ]
+        cls._delete(deleted_dag_ids, session)
+
+    @classmethod
+    def _delete(cls, dag_ids, session):
+        if not dag_ids:
+            return
+        LoggingMixin().log.info("Deleting the serialization of removed DAG(s) %s", dag_ids)
+        session.query(cls).filter(cls.dag_id.in_(dag_ids)).delete(synchronize_session=False)
+        session.commit()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import io
+import logging
+import os
+import signal
+import sys
+import threading
+
+import psutil
+
+from airflow import settings
+from airflow.task.task_runner.base_task_runner import BaseTaskRunner
+from airflow.utils.helpers import reap_process_group
+
+
+class ForkingTaskRunner(BaseTaskRunner):
+    """
+    Runs the raw Airflow task in a fork of the LocalTaskJob process, which has
+    already imported Airflow and loaded the DAG. Tasks that are run as another
+    user are run through the Bash shell like the StandardTaskRunner does.
+    """
+    def __init__(self, local_task_job):
+        super(ForkingTaskRunner, self).__init__(local_task_job)
+        self._rc = None
+
+    @property
+    def can_fork(self):
+        """
+        Whether the task can be run in a fork of this process.
+
+        :rtype: bool
+        """
+        return hasattr(os, 'fork') and not self.run_as_user
+
+    def start(self):
+        if self.can_fork:
+            self.process = self._start_by_fork()
+        else:
+            self.process = self.run_command()
+
+    def _start_by_fork(self):
+        from airflow.bin import cli
+
+        # Parse the command before forking so that a bad command fails here
+        args = cli.CLIFactory.get_parser().parse_args(self._command[1:])
+        dag = self._task_instance.task.dag
+
+        read_fd, write_fd = os.pipe()
+        self.log.info('Running in a fork: %s', self._command)
+        pid = os.fork()
+        if pid:
+            os.close(write_fd)
+            # Start daemon thread to read the output of the fork, like the
+            # output of the subprocess is read
+            log_reader = threading.Thread(
+                target=self._read_task_logs,
+                args=(io.open(read_fd, 'r', encoding='utf-8', errors='replace'),),
+            )
+            log_reader.daemon = True
+            log_reader.start()
+            return psutil.Process(pid)
+
+        return_code = 1
+        try:
+            # Start a new process group, to be reaped like the subprocess
+            os.setsid()
+            os.close(read_fd)
+            os.dup2(write_fd, 1)
+            os.dup2(write_fd, 2)
+            os.close(write_fd)
+            # The task sets its own handlers, LocalTaskJob's must not be run here
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            sys.argv = list(self._command)
+            # Drop the connections inherited from the LocalTaskJob before the
+            # task opens its own, they must not be shared between processes
+            settings.engine.pool.dispose()
+            settings.engine.dispose()
+            args.func(args, dag=dag)
+            return_code = 0
+        except Exception:
+            self.log.exception('Failed to run the task in a fork')
+        finally:
+            logging.shutdown()
+            # Skip the exit handlers and finalizers of the LocalTaskJob process
+            os._exit(return_code)
+
+    def return_code(self):
+        if self._rc is not None or self.process is None:
+            return self._rc
+        if isinstance(self.process, psutil.Process):
+            try:
+                pid, status = os.waitpid(self.process.pid, os.WNOHANG)
+            except OSError:
+                # The fork was already reaped when it was terminated
+                self._rc = -1
+                return self._rc
+            if pid:
+                self._rc = (os.WEXITSTATUS(status) if os.WIFEXITED(status)
+                            else -os.WTERMSIG(status))
+        else:
+            self._rc = self.process.poll()
+        return self._rc
+
+    def terminate(self):
+        # Collect the exit code of a fork that already exited, so that it is
+        # not reaped by reap_process_group instead
+        if self.process and self.return_code() is None and psutil.pid_exists(self.process.pid):
+            reap_process_group(self.process.pid, self.log)
@@ -65,6 +65,13 @@ class DepContext(object):
     :type ignore_task_deps: bool
     :param ignore_ti_state: Ignore the task instance's previous failure/success
     :type ignore_ti_state: bool
+    :param finished_tasks: The finished task instances of the dag run the evaluated
+        task instances belong to. When set, dependencies that need the states of
+        upstream task instances (e.g. the trigger rule) are computed from this list
+        instead of querying the database once per task instance. Only share a
+        context that carries finished tasks between task instances of the same
+        dag run.
+    :type finished_tasks: list[airflow.models.TaskInstance]
     """
     def __init__(
             self,
@@ -75,7 +82,8 @@ class DepContext(object):
             ignore_in_retry_period=False,
             ignore_in_reschedule_period=False,
             ignore_task_deps=False,
-            ignore_ti_state=False):
+            ignore_ti_state=False,
+            finished_tasks=None):
         self.deps = deps or set()
         self.flag_upstream_failed = flag_upstream_failed
         self.ignore_all_deps = ignore_all_deps
@@ -84,6 +92,40 @@ class DepContext(object):
         self.ignore_in_reschedule_period = ignore_in_reschedule_period
         self.ignore_task_deps = ignore_task_deps
         self.ignore_ti_state = ignore_ti_state
+        self.finished_tasks = finished_tasks
+        self._finished_task_states = None
+
+    def ensure_finished_tasks(self, dag_run, session):
+        """
+        Loads the finished task instances of the given dag run with a single query,
+        unless they have already been provided to this context.
+
+        :param dag_run: the dag run the evaluated task instances belong to
+        :type dag_run: airflow.models.DagRun
+        :param session: database session
+        :type session: sqlalchemy.orm.session.Session
+        :return: the finished task instances of the dag run
+        :rtype: list[airflow.models.TaskInstance]
+        """
+        if self.finished_tasks is None:
+            self.finished_tasks = dag_run.get_task_instances(
+                state=State.finished() + [State.UPSTREAM_FAILED],
+                session=session)
+            self._finished_task_states = None
+        return self.finished_tasks
+
+    @property
+    def finished_task_states(self):
+        """
+        Mapping of task_id to state for the finished tasks of this context, or None
+        if no finished tasks were provided.
+        """
+        if self.finished_tasks is None:
+            return None
+        if self._finished_task_states is None:
+            self._finished_task_states = {
+                ti.task_id: ti.state for ti in self.finished_tasks}
+        return self._finished_task_states
 
 
 # In order to be able to get queued a task must have one of these states
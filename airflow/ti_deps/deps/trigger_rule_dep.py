@@ -36,7 +36,6 @@ class TriggerRuleDep(BaseTIDep):
 
     @provide_session
     def _get_dep_statuses(self, ti, session, dep_context):
-        TI = airflow.models.TaskInstance
         TR = airflow.models.TriggerRule
 
         # Checking that all upstream dependencies have succeeded
@@ -49,9 +48,74 @@ class TriggerRuleDep(BaseTIDep):
             yield self._passing_status(reason="The task had a dummy trigger rule set.")
             return
 
-        # TODO(unknown): this query becomes quite expensive with dags that have many
-        # tasks. It should be refactored to let the task report to the dag run and get the
-        # aggregates from there.
+        finished_task_states = dep_context.finished_task_states
+        if finished_task_states is not None:
+            successes, skipped, failed, upstream_failed, done = \
+                self._get_states_count_upstream_ti(ti, finished_task_states)
+        else:
+            successes, skipped, failed, upstream_failed, done = \
+                self._get_states_count_upstream_ti_from_db(ti, session)
+
+        for dep_status in self._evaluate_trigger_rule(
+                ti=ti,
+                successes=successes,
+                skipped=skipped,
+                failed=failed,
+                upstream_failed=upstream_failed,
+                done=done,
+                flag_upstream_failed=dep_context.flag_upstream_failed,
+                session=session):
+            yield dep_status
+
+        # Record states flagged by the evaluation above so that downstream task
+        # instances evaluated later with the same context see them, as they would
+        # when querying the database.
+        if (finished_task_states is not None and
+                ti.state in (State.SKIPPED, State.UPSTREAM_FAILED)):
+            finished_task_states[ti.task_id] = ti.state
+
+    @staticmethod
+    def _get_states_count_upstream_ti(ti, finished_task_states):
+        """
+        Returns the number of successful, skipped, failed, upstream_failed and done
+        upstream task instances of the given task instance, computed in memory from the
+        states of the finished task instances of its dag run.
+
+        :param ti: the task instance to count the upstream states of
+        :type ti: airflow.models.TaskInstance
+        :param finished_task_states: mapping of task_id to state of the finished task
+            instances of the dag run
+        :type finished_task_states: dict[str, str]
+        """
+        successes = skipped = failed = upstream_failed = done = 0
+        for task_id in ti.task.upstream_task_ids:
+            state = finished_task_states.get(task_id)
+            if state is None:
+                continue
+            done += 1
+            if state == State.SUCCESS:
+                successes += 1
+            elif state == State.SKIPPED:
+                skipped += 1
+            elif state == State.FAILED:
+                failed += 1
+            elif state == State.UPSTREAM_FAILED:
+                upstream_failed += 1
+        return successes, skipped, failed, upstream_failed, done
+
+    @staticmethod
+    def _get_states_count_upstream_ti_from_db(ti, session):
+        """
+        Returns the number of successful, skipped, failed, upstream_failed and done
+        upstream task instances of the given task instance using an aggregate query.
+        Used when the finished task instances of the dag run are not known upfront.
+
+        :param ti: the task instance to count the upstream states of
+        :type ti: airflow.models.TaskInstance
+        :param session: database session
+        :type session: sqlalchemy.orm.session.Session
+        """
+        TI = airflow.models.TaskInstance
         qry = (
             session
             .query(
@@ -75,17 +139,7 @@ class TriggerRuleDep(BaseTIDep):
             )
         )
 
-        successes, skipped, failed, upstream_failed, done = qry.first()
-        for dep_status in self._evaluate_trigger_rule(
-                ti=ti,
-                successes=successes,
-                skipped=skipped,
-                failed=failed,
-                upstream_failed=upstream_failed,
-                done=done,
-                flag_upstream_failed=dep_context.flag_upstream_failed,
-                session=session):
-            yield dep_status
+        return qry.first()
 
     @provide_session
     def _evaluate_trigger_rule(
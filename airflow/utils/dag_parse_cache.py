@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import ast
+import hashlib
+import os
+import sys
+
+import dill
+
+from airflow import settings
+from airflow.utils import timezone
+from airflow.utils.file import mkdirs
+from airflow.utils.log.logging_mixin import LoggingMixin
+from airflow.version import version
+
+
+def file_hash(path):
+    """
+    Returns the sha1 hex digest of the contents of a file, or None if the file
+    cannot be read.
+
+    :param path: path of the file to hash
+    :type path: unicode
+    :rtype: unicode
+    """
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def imported_module_names(source):
+    """
+    Returns the names of the modules imported by a Python source, including
+    the ones imported within functions.
+
+    :param source: the Python source code
+    :type source: bytes
+    :rtype: set[unicode]
+    """
+    names = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            # "from package import module" imports a module as well
+            names.update(node.module + '.' + alias.name for alias in node.names)
+    return names
+
+
+class DagParseCache(LoggingMixin):
+    """
+    An on-disk cache of the DAGs found in a DAG file, so that unchanged files
+    don't need to be executed again by short lived processes.
+
+    An entry is keyed by the path of the DAG file and is only valid as long as
+    the hash of the file contents and the hashes of the modules it imports from
+    the DAGs folder, directly or through each other, are unchanged. Imports
+    found only at runtime, e.g. with ``importlib``, are not tracked. Entries
+    are serialized with dill, the same way DAGs are pickled to the database.
+
+    :param cache_folder: the folder the cache entries are written to
+    :type cache_folder: unicode
+    :param dag_folder: modules imported from this folder are considered part of
+        the DAG file and invalidate the entry when they change
+    :type dag_folder: unicode
+    """
+
+    def __init__(self, cache_folder, dag_folder=None):
+        self.cache_folder = cache_folder
+        self.dag_folder = os.path.realpath(dag_folder or settings.DAGS_FOLDER)
+
+    def _entry_path(self, filepath):
+        key = hashlib.sha1(filepath.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_folder, key + '.pkl')
+
+    def _local_module_path(self, name):
+        """
+        Returns the path of the source of an imported module when it was loaded
+        from the DAGs folder, or None otherwise.
+        """
+        module_path = getattr(sys.modules.get(name), '__file__', None)
+        if not module_path:
+            return None
+        module_path = os.path.realpath(module_path)
+        if module_path.endswith('.pyc'):
+            module_path = module_path[:-1]
+        if module_path.startswith(self.dag_folder + os.sep):
+            return module_path
+        return None
+
+    def _local_dependencies(self, filepath, source):
+        """
+        Returns the paths of the modules loaded from the DAGs folder that the
+        given DAG file imports, directly or through other modules of the DAGs
+        folder.
+        """
+        dependencies = set()
+        visited = {os.path.realpath(filepath)}
+        pending = [source]
+        while pending:
+            try:
+                names = imported_module_names(pending.pop())
+            except SyntaxError:
+                continue
+            for name in names:
+                module_path = self._local_module_path(name)
+                if module_path is None or module_path in visited:
+                    continue
+                visited.add(module_path)
+                dependencies.add(module_path)
+                try:
+                    with open(module_path, 'rb') as f:
+                        pending.append(f.read())
+                except (IOError, OSError):
+                    continue
+        return sorted(dependencies)
+
+    def get(self, filepath, source=None):
+        """
+        Returns the DAGs cached for the given file, or None if there is no valid
+        entry for the current contents of the file and of its local imports.
+
+        :param filepath: path of the DAG file
+        :type filepath: unicode
+        :param source: the contents of the file, read from the file if None
+        :type source: bytes
+        :rtype: list[airflow.models.DAG]
+        """
+        entry_path = self._entry_path(filepath)
+        if not os.path.isfile(entry_path):
+            return None
+
+        try:
+            with open(entry_path, 'rb') as f:
+                entry = dill.load(f)
+        except Exception:
+            self.log.debug("Ignoring unreadable parse cache entry for %s",
+                           filepath, exc_info=True)
+            return None
+
+        if source is None:
+            current_hash = file_hash(filepath)
+        else:
+            current_hash = hashlib.sha1(source).hexdigest()
+        if (entry.get('version') != version or
+                entry.get('filepath') != filepath or
+                entry.get('file_hash') != current_hash):
+            return None
+        for dependency, dependency_hash in entry['dependencies'].items():
+            if file_hash(dependency) != dependency_hash:
+                return None
+
+        # The DAGs are loaded now, not when they were cached, otherwise a DAG
+        # expired in the meantime would be considered stale forever
+        loaded = timezone.utcnow()
+        for dag in entry['dags']:
+            for loaded_dag in [dag] + dag.subdags:
+                loaded_dag.last_loaded = loaded
+
+        self.log.debug("Loaded %s DAG(s) of %s from the parse cache",
+                       len(entry['dags']), filepath)
+        return entry['dags']
+
+    def set(self, filepath, module_name, dags, source, imported_at):
+        """
+        Stores the DAGs found in a DAG file. Files whose DAGs can't be serialized
+        are not cached and will be parsed again next time.
+
+        The entry is keyed by the hash of the contents the file had before it
+        was imported: if the file is edited while it is imported, the entry does
+        not match the new contents. Entries are not written when one of the
+        local modules imported by the file was modified after ``imported_at``,
+        as the DAGs may have been created from its previous contents.
+
+        :param filepath: path of the DAG file
+        :type filepath: unicode
+        :param module_name: the name the DAG file was imported under
+        :type module_name: unicode
+        :param dags: the top level DAGs found in the file
+        :type dags: list[airflow.models.DAG]
+        :param source: the contents of the file, read before it was imported
+        :type source: bytes
+        :param imported_at: the time the file started to be imported, as
+            returned by ``time.time()``
+        :type imported_at: float
+        """
+        try:
+            dependencies = self._local_dependencies(filepath, source)
+            if any(os.path.getmtime(dependency) >= imported_at
+                   for dependency in dependencies):
+                self.log.debug("Not caching the DAGs of %s, a module it imports "
+                               "was modified while it was imported", filepath)
+                return
+            entry = {
+                'version': version,
+                'filepath': filepath,
+                'file_hash': hashlib.sha1(source).hexdigest(),
+                'dependencies': {
+                    dependency: file_hash(dependency) for dependency in dependencies},
+                'dags': dags,
+            }
+
+            # The module of the DAG file is imported under a name that can't be
+            # imported again by another process. Hiding it makes dill serialize
+            # the callables defined in the file by value instead of by reference.
+            module = sys.modules.pop(module_name, None)
+            try:
+                payload = dill.dumps(entry, recurse=True)
+            finally:
+                if module is not None:
+                    sys.modules[module_name] = module
+
+            mkdirs(self.cache_folder, 0o755)
+            entry_path = self._entry_path(filepath)
+            tmp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.rename(tmp_path, entry_path)
+        except Exception:
+            self.log.debug("Could not cache the DAGs of %s", filepath, exc_info=True)
@@ -27,6 +27,7 @@ import multiprocessing
 import os
 import re
 import signal
+import stat
 import sys
 import time
 import zipfile
@@ -47,12 +48,19 @@ from airflow import configuration as conf
 from airflow.dag.base_dag import BaseDag, BaseDagBag
 from airflow.exceptions import AirflowException
 from airflow.models import errors
+from airflow.models.dag_state_stats import DagStateStats
+from airflow.models.serialized_dag import SerializedDagModel
 from airflow.settings import logging_class_path, Stats
 from airflow.utils import timezone
 from airflow.utils.db import provide_session
 from airflow.utils.log.logging_mixin import LoggingMixin
 from airflow.utils.state import State
 
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
 
 class SimpleDag(BaseDag):
     """
@@ -73,6 +81,7 @@ class SimpleDag(BaseDag):
         self._is_paused = dag.is_paused
         self._concurrency = dag.concurrency
         self._pickle_id = pickle_id
+        self._next_schedule = self._get_next_schedule(dag)
         self._task_special_args = {}
         for task in dag.tasks:
             special_args = {}
@@ -129,6 +138,33 @@ class SimpleDag(BaseDag):
         """
         return self._pickle_id
 
+    @property
+    def next_schedule(self):
+        """
+        :return: the next schedule of this DAG after it was processed, or None
+            if it is not scheduled periodically
+        :rtype: datetime.datetime
+        """
+        return self._next_schedule
+
+    @staticmethod
+    def _get_next_schedule(dag):
+        schedule_interval = dag._schedule_interval
+        if schedule_interval is None:
+            return None
+        now = timezone.utcnow()
+        try:
+            if isinstance(schedule_interval, timedelta) and dag.start_date:
+                # Intervals are relative to the start date of the DAG
+                if now < dag.start_date:
+                    return dag.start_date
+                periods = ((now - dag.start_date).total_seconds() //
+                           schedule_interval.total_seconds())
+                return dag.start_date + schedule_interval * (int(periods) + 1)
+            return dag.following_schedule(now)
+        except Exception:
+            return None
+
     @property
     def task_special_args(self):
         return self._task_special_args
@@ -276,6 +312,43 @@ class SimpleDagBag(BaseDagBag):
         return self.dag_id_to_simple_dag[dag_id]
 
 
+def might_contain_dag(file_path, safe_mode):
+    """
+    Heuristic that guesses whether a file contains Airflow DAG definitions:
+    zip files and Python files are considered, and in safe mode Python files
+    must mention both ``DAG`` and ``airflow``.
+
+    :param file_path: the path of the file to examine
+    :type file_path: unicode
+    :param safe_mode: whether to look at the contents of Python files
+    :type safe_mode: bool
+    :rtype: bool
+    """
+    mod_name, file_ext = os.path.splitext(os.path.split(file_path)[-1])
+    if file_ext != '.py' and not zipfile.is_zipfile(file_path):
+        return False
+    if safe_mode and not zipfile.is_zipfile(file_path):
+        with open(file_path, 'rb') as fp:
+            content = fp.read()
+            return all([s in content for s in (b'DAG', b'airflow')])
+    return True
+
+
+def read_ignore_patterns(directory):
+    """
+    Returns the patterns listed in the ``.airflowignore`` file of a directory.
+
+    :param directory: the directory to look into
+    :type directory: unicode
+    :rtype: list[unicode]
+    """
+    ignore_file = os.path.join(directory, '.airflowignore')
+    if not os.path.isfile(ignore_file):
+        return []
+    with open(ignore_file, 'r') as f:
+        return [p for p in f.read().split('\n') if p]
+
+
 def list_py_file_paths(directory, safe_mode=True,
                        include_examples=None):
     """
@@ -298,13 +371,9 @@ def list_py_file_paths(directory, safe_mode=True,
     elif os.path.isdir(directory):
         patterns_by_dir = {}
         for root, dirs, files in os.walk(directory, followlinks=True):
-            patterns = patterns_by_dir.get(root, [])
-            ignore_file = os.path.join(root, '.airflowignore')
-            if os.path.isfile(ignore_file):
-                with open(ignore_file, 'r') as f:
-                    # If we have new patterns create a copy so we don't change
-                    # the previous list (which would affect other subdirs)
-                    patterns = patterns + [p for p in f.read().split('\n') if p]
+            # If we have new patterns create a copy so we don't change
+            # the previous list (which would affect other subdirs)
+            patterns = patterns_by_dir.get(root, []) + read_ignore_patterns(root)
 
             # If we can ignore any subdirs entirely we should - fewer paths
             # to walk is better. We have to modify the ``dirs`` array in
@@ -325,23 +394,9 @@ def list_py_file_paths(directory, safe_mode=True,
                     file_path = os.path.join(root, f)
                     if not os.path.isfile(file_path):
                         continue
-                    mod_name, file_ext = os.path.splitext(
-                        os.path.split(file_path)[-1])
-                    if file_ext != '.py' and not zipfile.is_zipfile(file_path):
-                        continue
                     if any([re.findall(p, file_path) for p in patterns]):
                         continue
-
-                    # Heuristic that guesses whether a Python file contains an
-                    # Airflow DAG definition.
-                    might_contain_dag = True
-                    if safe_mode and not zipfile.is_zipfile(file_path):
-                        with open(file_path, 'rb') as fp:
-                            content = fp.read()
-                            might_contain_dag = all(
-                                [s in content for s in (b'DAG', b'airflow')])
-
-                    if not might_contain_dag:
+                    if not might_contain_dag(file_path, safe_mode):
                         continue
 
                     file_paths.append(file_path)
@@ -355,6 +410,233 @@ def list_py_file_paths(directory, safe_mode=True,
     return file_paths
 
 
+class DagFileIndex(LoggingMixin):
+    """
+    Keeps track of the files of a DAG directory that might contain DAG
+    definitions, the same way as ``list_py_file_paths``, without examining
+    unchanged files again.
+
+    Files are only read again when their size or modification time changes,
+    and ``.airflowignore`` files are only read again when they change. When
+    inotify is available (Linux with the ``inotify_simple`` package installed),
+    the files changed between two scans can be picked up from the events
+    reported for the directories of the index.
+
+    :param directory: the directory (or file) to index
+    :type directory: unicode
+    :param safe_mode: whether to use a heuristic to determine whether a file
+        contains Airflow DAG definitions
+    :type safe_mode: bool
+    :param include_examples: whether to index the example DAGs too
+    :type include_examples: bool
+    :param use_inotify: whether to watch the indexed directories with inotify
+    :type use_inotify: bool
+    """
+
+    def __init__(self, directory, safe_mode=True, include_examples=None,
+                 use_inotify=False):
+        if include_examples is None:
+            include_examples = conf.getboolean('core', 'LOAD_EXAMPLES')
+        self._roots = [directory] if directory is not None else []
+        if include_examples and not (directory and os.path.isfile(directory)):
+            import airflow.example_dags
+            self._roots.append(airflow.example_dags.__path__[0])
+        self._safe_mode = safe_mode
+        # Map from file path to (modification time, size, might contain DAGs)
+        self._files = {}
+        # Map from .airflowignore file path to (modification time, patterns)
+        self._ignore_files = {}
+        # Map from indexed directory to the ignore patterns applying to it
+        self._patterns_by_dir = {}
+
+        self._inotify = None
+        # Map from inotify watch descriptor to the watched directory
+        self._watched_dirs = {}
+        if use_inotify:
+            if INotify is None:
+                self.log.info("inotify is not available, changes to DAG files "
+                              "will only be picked up by the periodic scans")
+            else:
+                self._inotify = INotify()
+
+    @property
+    def file_paths(self):
+        """
+        :return: the paths of the files that might contain DAG definitions
+        :rtype: list[unicode]
+        """
+        return sorted(file_path for file_path, (_, _, might_contain_dags)
+                      in self._files.items() if might_contain_dags)
+
+    def get_modification_time(self, file_path):
+        """
+        :param file_path: the path of an indexed file
+        :type file_path: unicode
+        :return: when the file was last modified, or None if it is unknown
+        :rtype: datetime.datetime
+        """
+        entry = self._files.get(file_path)
+        if entry is None or entry[0] is None:
+            return None
+        return timezone.utc_epoch() + timedelta(seconds=entry[0])
+
+    def refresh(self):
+        """
+        Scans the indexed directories again.
+
+        :return: the paths of the files that might contain DAG definitions and
+            were added or modified since the previous scan
+        :rtype: list[unicode]
+        """
+        # This scan covers whatever happened until now
+        self._read_events()
+
+        files = {}
+        changed_file_paths = []
+        self._patterns_by_dir = {}
+        for root in self._roots:
+            if os.path.isfile(root):
+                # A single file is always processed, like in list_py_file_paths
+                files[root] = (None, None, True)
+            elif os.path.isdir(root):
+                self._scan(root, files, changed_file_paths)
+        self._files = files
+        self._ignore_files = {
+            ignore_file: entry for ignore_file, entry in self._ignore_files.items()
+            if os.path.dirname(ignore_file) in self._patterns_by_dir}
+        return changed_file_paths
+
+    def refresh_from_events(self):
+        """
+        Applies the changes reported by inotify since the previous refresh. A
+        full scan is done when directories or ``.airflowignore`` files change.
+
+        :return: the paths of the files that might contain DAG definitions and
+            were added or modified, or None if no change was reported
+        :rtype: list[unicode]
+        """
+        events = self._read_events()
+        if not events:
+            return None
+
+        file_paths = set()
+        for event in events:
+            directory = self._watched_dirs.get(event.wd)
+            if event.mask & inotify_flags.IGNORED:
+                self._watched_dirs.pop(event.wd, None)
+            if (event.mask & (inotify_flags.Q_OVERFLOW | inotify_flags.ISDIR |
+                              inotify_flags.DELETE_SELF | inotify_flags.MOVE_SELF) or
+                    event.name == '.airflowignore'):
+                self.log.debug("DAG directory structure changed, scanning it again")
+                return self.refresh()
+            if directory is not None and event.name:
+                file_paths.add(os.path.join(directory, event.name))
+
+        changed_file_paths = []
+        for file_path in file_paths:
+            patterns = self._patterns_by_dir.get(os.path.dirname(file_path))
+            if patterns is None:
+                continue
+            files = {}
+            self._examine(file_path, patterns, files, changed_file_paths)
+            if file_path in files:
+                self._files[file_path] = files[file_path]
+            else:
+                self._files.pop(file_path, None)
+        return changed_file_paths
+
+    def _scan(self, root, files, changed_file_paths):
+        patterns_by_dir = {}
+        for directory, dirs, filenames in os.walk(root, followlinks=True):
+            patterns = (patterns_by_dir.get(directory, []) +
+                        self._read_ignore_patterns(directory))
+            self._patterns_by_dir[directory] = patterns
+            self._watch(directory)
+
+            # Subdirs are skipped entirely if they are ignored, and the
+            # patterns of this directory apply to the ones that are not
+            dirs[:] = [
+                d
+                for d in dirs
+                if not any(re.search(p, os.path.join(directory, d)) for p in patterns)
+            ]
+            for d in dirs:
+                patterns_by_dir[os.path.join(directory, d)] = patterns
+
+            for filename in filenames:
+                self._examine(os.path.join(directory, filename), patterns,
+                              files, changed_file_paths)
+
+    def _examine(self, file_path, patterns, files, changed_file_paths):
+        """
+        Adds a file to ``files`` unless it is ignored or missing, and to
+        ``changed_file_paths`` if it might contain DAGs and changed since it
+        was last examined.
+        """
+        try:
+            if any([re.findall(p, file_path) for p in patterns]):
+                return
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                return
+            if not stat.S_ISREG(file_stat.st_mode):
+                return
+
+            key = (file_stat.st_mtime, file_stat.st_size)
+            previous = self._files.get(file_path)
+            if previous is not None and previous[:2] == key:
+                files[file_path] = previous
+                return
+
+            contains_dags = might_contain_dag(file_path, self._safe_mode)
+            files[file_path] = key + (contains_dags,)
+            if contains_dags:
+                changed_file_paths.append(file_path)
+        except Exception:
+            self.log.exception("Error while examining %s", file_path)
+
+    def _read_ignore_patterns(self, directory):
+        ignore_file = os.path.join(directory, '.airflowignore')
+        try:
+            mtime = os.stat(ignore_file).st_mtime
+        except OSError:
+            self._ignore_files.pop(ignore_file, None)
+            return []
+        entry = self._ignore_files.get(ignore_file)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, read_ignore_patterns(directory))
+            self._ignore_files[ignore_file] = entry
+        return entry[1]
+
+    def _watch(self, directory):
+        if self._inotify is None:
+            return
+        mask = (inotify_flags.CREATE | inotify_flags.DELETE | inotify_flags.MODIFY |
+                inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_FROM |
+                inotify_flags.MOVED_TO | inotify_flags.DELETE_SELF |
+                inotify_flags.MOVE_SELF)
+        try:
+            self._watched_dirs[self._inotify.add_watch(directory, mask)] = directory
+        except OSError:
+            self.log.warning("Could not watch %s, changes to its files will only be "
+                             "picked up by the periodic scans", directory, exc_info=True)
+
+    def _read_events(self):
+        if self._inotify is None:
+            return []
+        return self._inotify.read(timeout=0)
+
+    def close(self):
+        """
+        Stops watching the indexed directories.
+        """
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+            self._watched_dirs = {}
+
+
 class AbstractDagFileProcessor(object):
     """
     Processes a DAG file. See SchedulerJob.process_file() for more details.
@@ -678,12 +960,23 @@ class DagFileProcessorManager(LoggingMixin):
     processors finish, more are launched. The files are processed over and
     over again, but no more often than the specified interval.
 
+    Files that were modified since they were last processed are queued first,
+    then files ordered by the next schedule of their DAGs. Files that take much
+    longer than the others to process are spread out in the queue so that they
+    don't use all the processor slots at the same time.
+
     :type _file_path_queue: list[unicode]
     :type _processors: dict[unicode, AbstractDagFileProcessor]
     :type _last_runtime: dict[unicode, float]
     :type _last_finish_time: dict[unicode, datetime.datetime]
+    :type _next_schedule: dict[unicode, datetime.datetime]
+    :type _queued_time: dict[unicode, datetime.datetime]
     """
 
+    # Files taking more than this many times the median runtime to process are
+    # considered expensive
+    EXPENSIVE_RUNTIME_FACTOR = 4
+
     def __init__(self,
                  dag_directory,
                  file_paths,
@@ -746,6 +1039,10 @@ class DagFileProcessorManager(LoggingMixin):
         self._last_runtime = {}
         # Map from file path to the last finish time
         self._last_finish_time = {}
+        # Map from file path to the earliest next schedule of its DAGs
+        self._next_schedule = {}
+        # Map from file path to the time it was queued for processing
+        self._queued_time = {}
         self._last_zombie_query_time = timezone.utcnow()
         # Last time that the DAG dir was traversed to look for files
         self.last_dag_dir_refresh_time = timezone.utcnow()
@@ -761,12 +1058,44 @@ class DagFileProcessorManager(LoggingMixin):
         # How often to scan the DAGs directory for new files. Default to 5 minutes.
         self.dag_dir_list_interval = conf.getint('scheduler',
                                                  'dag_dir_list_interval')
+        # Whether to pick up changed files between scans using inotify.
+        self._dag_dir_use_inotify = conf.getboolean('scheduler', 'dag_dir_use_inotify')
+        # Index of the files in the DAGs directory, built on the first refresh
+        self._dag_file_index = None
+
+        # How often to count the states shown on the home page of the webserver
+        self._dag_state_stats_refresh_interval = conf.getint(
+            'scheduler', 'dag_state_stats_refresh_interval')
+        # Last time the state counts were refreshed
+        self._last_dag_state_stats_refresh_time = None
+        # The process counting the states, see _refresh_dag_state_stats
+        self._dag_state_stats_process = None
 
         self._log = logging.getLogger('airflow.processor_manager')
 
         signal.signal(signal.SIGINT, self._exit_gracefully)
         signal.signal(signal.SIGTERM, self._exit_gracefully)
 
+    def _preload_modules(self):
+        """
+        Imports the modules commonly used by DAG files in the manager process.
+        DAG file processors are forked from this process, so they inherit these
+        modules instead of importing them for every file. Unless
+        ``dag_processor_reuse_processes`` is set, each processor is still a new
+        process that sets up its logging and ORM engine.
+        """
+        module_names = [name.strip() for name in
+                        conf.get('scheduler', 'dag_processor_preload_modules').split(',')
+                        if name.strip()]
+        for module_name in module_names:
+            try:
+                import_module(module_name)
+            except Exception:
+                self.log.warning("Could not preload module %s for the DAG file "
+                                 "processors", module_name, exc_info=True)
+        self.log.info("Preloaded %s module(s) for the DAG file processors",
+                      len(module_names))
+
     def _exit_gracefully(self, signum, frame):
         """
         Helper method to clean up DAG file processors to avoid leaving orphan processes.
@@ -792,6 +1121,8 @@ class DagFileProcessorManager(LoggingMixin):
         self.log.info("Checking for new files in {} every {} seconds"
                       .format(self._dag_directory, self.dag_dir_list_interval))
 
+        self._preload_modules()
+
         if self._async_mode:
             self.log.debug("Starting DagFileProcessorManager in async mode")
             self.start_in_async()
@@ -816,6 +1147,7 @@ class DagFileProcessorManager(LoggingMixin):
                     sys.exit(os.EX_OK)
 
             self._refresh_dag_dir()
+            self._refresh_dag_state_stats()
 
             simple_dags = self.heartbeat()
             for simple_dag in simple_dags:
@@ -863,6 +1195,7 @@ class DagFileProcessorManager(LoggingMixin):
             elif agent_signal == DagParsingSignal.AGENT_HEARTBEAT:
 
                 self._refresh_dag_dir()
+                self._refresh_dag_state_stats()
 
                 simple_dags = self.heartbeat()
                 for simple_dag in simple_dags:
@@ -892,20 +1225,29 @@ class DagFileProcessorManager(LoggingMixin):
 
     def _refresh_dag_dir(self):
         """
-        Refresh file paths from dag dir if we haven't done it for too long.
+        Refresh file paths from dag dir if we haven't done it for too long, and
+        queue the files reported as changed in between first.
         """
         elapsed_time_since_refresh = (timezone.utcnow() -
                                       self.last_dag_dir_refresh_time).total_seconds()
-        if elapsed_time_since_refresh > self.dag_dir_list_interval:
+        if (self._dag_file_index is None or
+                elapsed_time_since_refresh > self.dag_dir_list_interval):
+            initial_refresh = self._dag_file_index is None
+            if initial_refresh:
+                self._dag_file_index = DagFileIndex(
+                    self._dag_directory, use_inotify=self._dag_dir_use_inotify)
+
             # Build up a list of Python files that could contain DAGs
             self.log.info(
                 "Searching for files in {}".format(self._dag_directory))
-            self._file_paths = list_py_file_paths(self._dag_directory)
+            changed_file_paths = self._dag_file_index.refresh()
             self.last_dag_dir_refresh_time = timezone.utcnow()
             self.log.info("There are {} files in {}"
-                          .format(len(self._file_paths),
+                          .format(len(self._dag_file_index.file_paths),
                                   self._dag_directory))
-            self.set_file_paths(self._file_paths)
+            self.set_file_paths(self._dag_file_index.file_paths)
+            if not initial_refresh:
+                self._prioritize_file_paths(changed_file_paths)
 
             try:
                 self.log.debug("Removing old import errors")
@@ -913,6 +1255,162 @@ class DagFileProcessorManager(LoggingMixin):
             except Exception:
                 self.log.exception("Error removing old import errors")
 
+            if conf.getboolean('core', 'store_serialized_dags'):
+                try:
+                    self.log.debug("Removing the serialization of deleted DAG files")
+                    SerializedDagModel.remove_deleted_files(self._file_paths)
+                except Exception:
+                    self.log.exception("Error removing the serialization of deleted DAG files")
+        else:
+            changed_file_paths = self._dag_file_index.refresh_from_events()
+            if changed_file_paths is not None:
+                self.set_file_paths(self._dag_file_index.file_paths)
+                self._prioritize_file_paths(changed_file_paths)
+
+    def _refresh_dag_state_stats(self):
+        """
+        Starts counting the DAG runs and task instances of every DAG by state
+        again for the home page of the webserver, if they were not refreshed for
+        ``dag_state_stats_refresh_interval`` seconds and the previous count is
+        finished. See ``DagStateStats``. The counts run in their own process, so
+        neither the DAG file processing nor the scheduler loop waits for them.
+        """
+        if self._dag_state_stats_refresh_interval <= 0:
+            return
+        if (self._dag_state_stats_process is not None and
+                self._dag_state_stats_process.is_alive()):
+            return
+        now = timezone.utcnow()
+        if (self._last_dag_state_stats_refresh_time is not None and
+                (now - self._last_dag_state_stats_refresh_time).total_seconds() <
+                self._dag_state_stats_refresh_interval):
+            return
+        self._last_dag_state_stats_refresh_time = now
+        self._dag_state_stats_process = self._launch_dag_state_stats_refresh()
+
+    @staticmethod
+    def _launch_dag_state_stats_refresh():
+        """
+        Launches a process to refresh the DAG state counts.
+
+        :return: the process that was launched
+        :rtype: multiprocessing.Process
+        """
+        def helper():
+            # This helper runs in the newly created process
+            log = logging.getLogger('airflow.processor_manager')
+            # Re-configure the ORM engine as there are issues with multiple processes
+            airflow.settings.configure_orm()
+            start_time = time.time()
+            try:
+                DagStateStats.refresh()
+            except Exception:
+                log.exception("Error refreshing the DAG state stats")
+            finally:
+                airflow.settings.dispose_orm()
+            Stats.timing('dag_processing.dag_state_stats_refresh',
+                         (time.time() - start_time) * 1000)
+
+        p = multiprocessing.Process(target=helper,
+                                    args=(),
+                                    name="DagStateStatsRefresh")
+        p.start()
+        return p
+
+    def _prioritize_file_paths(self, file_paths):
+        """
+        Moves files to the front of the queue, so that changes to them are
+        picked up without waiting for the rest of the queue to be processed.
+
+        :param file_paths: the paths of the files to process first
+        :type file_paths: list[unicode]
+        """
+        file_paths = [file_path for file_path in file_paths
+                      if self._run_count[file_path] != self._max_runs]
+        if not file_paths:
+            return
+        self.log.info("Queuing %s changed file(s) for processing first", len(file_paths))
+        self.log.debug("Changed files:\n\t%s", "\n\t".join(file_paths))
+        prioritized = set(file_paths)
+        self._file_path_queue = file_paths + [x for x in self._file_path_queue
+                                              if x not in prioritized]
+        self._record_queued_time(file_paths)
+
+    def _record_queued_time(self, file_paths):
+        now = timezone.utcnow()
+        for file_path in file_paths:
+            self._queued_time.setdefault(file_path, now)
+
+    def _order_file_paths(self, file_paths):
+        """
+        Orders the files to queue for processing: the files modified since they
+        were last processed (or never processed) first, most recently modified
+        first, then the others by the next schedule of their DAGs with the
+        expensive files spread out.
+
+        :param file_paths: the paths of the files to queue
+        :type file_paths: list[unicode]
+        :return: the ordered file paths
+        :rtype: list[unicode]
+        """
+        never = timezone.utc_epoch()
+        modified = []
+        others = []
+        for file_path in file_paths:
+            last_finish_time = self.get_last_finish_time(file_path)
+            mtime = (self._dag_file_index.get_modification_time(file_path)
+                     if self._dag_file_index is not None else None)
+            if last_finish_time is None:
+                modified.append((mtime or never, file_path))
+                continue
+            last_start_time = last_finish_time - timedelta(
+                seconds=self.get_last_runtime(file_path) or 0)
+            if mtime is not None and mtime >= last_start_time:
+                modified.append((mtime, file_path))
+            else:
+                others.append(file_path)
+
+        modified.sort(key=lambda x: x[0], reverse=True)
+        # Files without schedule or not processed successfully go last, least
+        # recently processed first
+        far_future = timezone.datetime(9999, 12, 31)
+        others.sort(key=lambda x: (self._next_schedule.get(x) or far_future,
+                                   self._last_finish_time[x]))
+        return ([file_path for _, file_path in modified] +
+                self._spread_expensive_file_paths(others))
+
+    def _spread_expensive_file_paths(self, file_paths):
+        """
+        Spreads the files whose last runtime is much higher than the median
+        evenly over the list, keeping the relative order of the files.
+
+        :param file_paths: the ordered file paths
+        :type file_paths: list[unicode]
+        :rtype: list[unicode]
+        """
+        runtimes = sorted(self._last_runtime[file_path] for file_path in file_paths
+                          if file_path in self._last_runtime)
+        if not runtimes:
+            return file_paths
+        threshold = self.EXPENSIVE_RUNTIME_FACTOR * runtimes[len(runtimes) // 2]
+        expensive = [file_path for file_path in file_paths
+                     if self._last_runtime.get(file_path, 0) > threshold]
+        if not expensive:
+            return file_paths
+
+        expensive_set = set(expensive)
+        cheap = [file_path for file_path in file_paths if file_path not in expensive_set]
+        step = float(len(cheap)) / len(expensive)
+        spread = []
+        position = 0
+        for i, file_path in enumerate(expensive):
+            next_position = int(round(i * step))
+            spread.extend(cheap[position:next_position])
+            spread.append(file_path)
+            position = next_position
+        spread.extend(cheap[position:])
+        return spread
+
     def _print_stat(self):
         """
         Occasionally print out stats about how fast the files are getting processed
@@ -1092,8 +1590,11 @@ class DagFileProcessorManager(LoggingMixin):
         :return: None
         """
         self._file_paths = new_file_paths
+        new_file_paths = set(new_file_paths)
         self._file_path_queue = [x for x in self._file_path_queue
                                  if x in new_file_paths]
+        self._queued_time = {x: queued_time for x, queued_time in self._queued_time.items()
+                             if x in new_file_paths}
         # Stop processors that are working on deleted files
         filtered_processors = {}
         for file_path, processor in self._processors.items():
@@ -1162,8 +1663,12 @@ class DagFileProcessorManager(LoggingMixin):
                     processor.file_path, processor.exit_code
                 )
             else:
+                next_schedules = []
                 for simple_dag in processor.result:
                     simple_dags.append(simple_dag)
+                    if simple_dag.next_schedule is not None and not simple_dag.is_paused:
+                        next_schedules.append(simple_dag.next_schedule)
+                self._next_schedule[file_path] = min(next_schedules) if next_schedules else None
 
         # Generate more file paths to process if we processed all the files
         # already.
@@ -1184,10 +1689,11 @@ class DagFileProcessorManager(LoggingMixin):
                                         for file_path, num_runs in self._run_count.items()
                                         if num_runs == self._max_runs]
 
-            files_paths_to_queue = list(set(self._file_paths) -
-                                        set(file_paths_in_progress) -
-                                        set(file_paths_recently_processed) -
-                                        set(files_paths_at_run_limit))
+            files_paths_to_queue = self._order_file_paths(
+                list(set(self._file_paths) -
+                     set(file_paths_in_progress) -
+                     set(file_paths_recently_processed) -
+                     set(files_paths_at_run_limit)))
 
             for file_path, processor in self._processors.items():
                 self.log.debug(
@@ -1201,13 +1707,24 @@ class DagFileProcessorManager(LoggingMixin):
             )
 
             self._file_path_queue.extend(files_paths_to_queue)
+            self._record_queued_time(files_paths_to_queue)
 
         zombies = self._find_zombies()
 
-        # Start more processors if we have enough slots and files to process
+        # Start more processors if we have enough slots and files to process.
+        # Changed files may be queued while an older version of them is still
+        # being processed, they wait for that processor to finish.
+        file_paths_in_progress = []
         while (self._parallelism - len(self._processors) > 0 and
                len(self._file_path_queue) > 0):
             file_path = self._file_path_queue.pop(0)
+            if file_path in self._processors:
+                file_paths_in_progress.append(file_path)
+                continue
+            queued_time = self._queued_time.pop(file_path, None)
+            if queued_time is not None:
+                Stats.timing('dag_processing.queue_wait_time',
+                             (timezone.utcnow() - queued_time).total_seconds() * 1000)
             processor = self._processor_factory(file_path, zombies)
 
             processor.start()
@@ -1216,6 +1733,7 @@ class DagFileProcessorManager(LoggingMixin):
                 processor.pid, file_path
             )
             self._processors[file_path] = processor
+        self._file_path_queue = file_paths_in_progress + self._file_path_queue
 
         # Update heartbeat count.
         self._run_count[self._heart_beat_key] += 1
@@ -1284,6 +1802,13 @@ class DagFileProcessorManager(LoggingMixin):
         Kill all child processes on exit since we don't want to leave
         them as orphaned.
         """
+        if self._dag_file_index is not None:
+            self._dag_file_index.close()
+
+        if (self._dag_state_stats_process is not None and
+                self._dag_state_stats_process.is_alive()):
+            self._dag_state_stats_process.terminate()
+
         pids_to_kill = self.get_all_pids()
         if len(pids_to_kill) > 0:
             # First try SIGTERM
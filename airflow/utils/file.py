@@ -22,11 +22,15 @@ from __future__ import unicode_literals
 
 import errno
 import os
+import re
 import shutil
+import zipfile
 from tempfile import mkdtemp
 
 from contextlib import contextmanager
 
+ZIP_REGEX = re.compile(r'((.*\.zip){})?(.*)'.format(re.escape(os.sep)))
+
 
 @contextmanager
 def TemporaryDirectory(suffix='', prefix=None, dir=None):
@@ -60,3 +64,19 @@ def mkdirs(path, mode):
             raise
     finally:
         os.umask(o_umask)
+
+
+def correct_maybe_zipped(fileloc):
+    """
+    Returns the path of the zip archive a module was loaded from, e.g.
+    ``/dags/x.zip`` for ``/dags/x.zip/mod.py``, or the path itself if it is
+    not in a zip archive.
+
+    :param fileloc: the path of the module
+    :type fileloc: str
+    :rtype: str
+    """
+    _, archive, _ = ZIP_REGEX.search(fileloc).groups()
+    if archive and zipfile.is_zipfile(archive):
+        return archive
+    return fileloc
@@ -25,6 +25,7 @@ from airflow import configuration as conf
 from airflow.configuration import AirflowConfigException
 from airflow.utils.file import mkdirs
 from airflow.utils.helpers import parse_template_string
+from airflow.utils.state import State
 
 
 class FileTaskHandler(logging.Handler):
@@ -83,6 +84,14 @@ class FileTaskHandler(logging.Handler):
         """
         Template method that contains custom logic of reading
         logs given the try_number.
+
+        The log is read by chunks of at most ``[webserver] log_chunk_size``
+        bytes, from the byte offset in the metadata up to the end of the last
+        complete line. The metadata returned holds the offset of the next
+        chunk, ``header_shown`` once the lines telling where the log is read
+        from were returned, and ``end_of_log`` once the end of the file is
+        reached and the try is over, i.e. the task instance finished or ran
+        again since, or ``download_logs`` is set.
         :param ti: task instance record
         :param try_number: current try_number to read log from
         :param metadata: log metadata,
@@ -94,17 +103,26 @@ class FileTaskHandler(logging.Handler):
         # is needed to get correct log path.
         log_relative_path = self._render_filename(ti, try_number)
         location = os.path.join(self.local_base, log_relative_path)
+        metadata = metadata or {}
+        offset = metadata.get('offset', 0)
+        # The offset stays 0 until a complete line is written to the log of a
+        # running task, the header is only shown with the first chunk read
+        show_header = not offset and not metadata.get('header_shown')
+        chunk_size = conf.getint('webserver', 'log_chunk_size')
 
         log = ""
 
         if os.path.exists(location):
             try:
-                with open(location) as f:
+                with open(location, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(chunk_size)
+                if show_header:
                     log += "*** Reading local file: {}\n".format(location)
-                    log += "".join(f.readlines())
             except Exception as e:
                 log = "*** Failed to load local log file: {}\n".format(location)
                 log += "*** {}\n".format(str(e))
+                return log, {'end_of_log': True}
         else:
             url = os.path.join(
                 "http://{ti.hostname}:{worker_log_server_port}/log", log_relative_path
@@ -112,8 +130,9 @@ class FileTaskHandler(logging.Handler):
                 ti=ti,
                 worker_log_server_port=conf.get('celery', 'WORKER_LOG_SERVER_PORT')
             )
-            log += "*** Log file does not exist: {}\n".format(location)
-            log += "*** Fetching from: {}\n".format(url)
+            if show_header:
+                log += "*** Log file does not exist: {}\n".format(location)
+                log += "*** Fetching from: {}\n".format(url)
             try:
                 timeout = None  # No timeout
                 try:
@@ -121,16 +140,42 @@ class FileTaskHandler(logging.Handler):
                 except (AirflowConfigException, ValueError):
                     pass
 
-                response = requests.get(url, timeout=timeout)
-
-                # Check if the resource was properly fetched
-                response.raise_for_status()
-
-                log += '\n' + response.text
+                response = requests.get(
+                    url, timeout=timeout,
+                    headers={'Range': 'bytes={}-{}'.format(offset, offset + chunk_size - 1)})
+
+                # Nothing was written after the offset yet
+                if response.status_code == 416:
+                    chunk = b''
+                else:
+                    # Check if the resource was properly fetched
+                    response.raise_for_status()
+                    chunk = response.content
+                    # The worker ignored the range and sent the whole file
+                    if response.status_code != 206:
+                        chunk = chunk[offset:offset + chunk_size]
+                if show_header:
+                    log += '\n'
             except Exception as e:
                 log += "*** Failed to fetch log file from worker. {}\n".format(str(e))
-
-        return log, {'end_of_log': True}
+                return log, {'end_of_log': True}
+
+        # The logs of the previous tries are complete
+        end_of_log = len(chunk) < chunk_size and (
+            metadata.get('download_logs') or ti.state not in State.unfinished() or
+            try_number < ti.try_number)
+        if not end_of_log:
+            # Only return complete lines, unless a single line fills the chunk,
+            # the rest is read with the next chunk
+            end_of_line = chunk.rfind(b'\n')
+            if end_of_line != -1:
+                chunk = chunk[:end_of_line + 1]
+            elif len(chunk) < chunk_size:
+                chunk = b''
+        log += chunk.decode('utf-8', errors='replace')
+
+        return log, {'end_of_log': end_of_log, 'offset': offset + len(chunk),
+                     'header_shown': True}
 
     def read(self, task_instance, try_number=None, metadata=None):
         """
@@ -161,9 +206,9 @@ class FileTaskHandler(logging.Handler):
         logs = [''] * len(try_numbers)
         metadatas = [{}] * len(try_numbers)
         for i, try_number in enumerate(try_numbers):
-            log, metadata = self._read(task_instance, try_number, metadata)
+            # Every try gets its own copy of the metadata
+            log, metadatas[i] = self._read(task_instance, try_number, dict(metadata or {}))
             logs[i] += log
-            metadatas[i] = metadata
 
         return logs, metadatas
 
@@ -118,7 +118,7 @@ class GCSTaskHandler(FileTaskHandler, LoggingMixin):
             log = '*** Unable to read remote log from {}\n*** {}\n\n'.format(
                 remote_loc, str(e))
             self.log.error(log)
-            local_log, metadata = super(GCSTaskHandler, self)._read(ti, try_number)
+            local_log, metadata = super(GCSTaskHandler, self)._read(ti, try_number, metadata)
             log += local_log
             return log, metadata
 
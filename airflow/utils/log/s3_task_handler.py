@@ -113,7 +113,7 @@ class S3TaskHandler(FileTaskHandler, LoggingMixin):
                 remote_loc, remote_log)
             return log, {'end_of_log': True}
         else:
-            return super(S3TaskHandler, self)._read(ti, try_number)
+            return super(S3TaskHandler, self)._read(ti, try_number, metadata)
 
     def s3_log_exists(self, remote_log_location):
         """
@@ -121,7 +121,7 @@ class WasbTaskHandler(FileTaskHandler, LoggingMixin):
                 remote_loc, remote_log)
             return log, {'end_of_log': True}
         else:
-            return super(WasbTaskHandler, self)._read(ti, try_number)
+            return super(WasbTaskHandler, self)._read(ti, try_number, metadata)
 
     def wasb_log_exists(self, remote_log_location):
         """
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import cProfile
+import json
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from airflow.settings import Stats
+from airflow.utils import timezone
+from airflow.utils.file import mkdirs
+from airflow.utils.log.logging_mixin import LoggingMixin
+
+
+class LoopProfiler(LoggingMixin):
+    """
+    Times the phases of a loop, like the scheduler loop, and counts the SQL
+    statements each phase executes.
+
+    Every phase is sent to the ``<prefix>.<phase>`` timer and its number of
+    SQL statements to the ``<prefix>.<phase>.queries`` gauge. The durations of
+    the last loops can also be written to a JSON report, and the first loops
+    can be captured with cProfile.
+
+    :param prefix: the prefix of the metrics
+    :type prefix: unicode
+    :param report_path: if set, the JSON file the last loops are written to
+        after every loop
+    :type report_path: unicode
+    :param report_size: the number of loops kept in the JSON report
+    :type report_size: int
+    :param profile_loops: the number of loops to capture with cProfile
+    :type profile_loops: int
+    :param profile_path: the file the cProfile stats are dumped to
+    :type profile_path: unicode
+    """
+
+    def __init__(self, prefix, report_path=None, report_size=100,
+                 profile_loops=0, profile_path=None):
+        self.prefix = prefix
+        self.report_path = report_path
+        self.loops = deque(maxlen=report_size)
+        self.profile_loops = profile_loops
+        self.profile_path = profile_path
+        self._profile = cProfile.Profile() if profile_loops > 0 else None
+        self._profiled_loops = 0
+        self._query_count = 0
+        self._current_loop = None
+
+    def _count_query(self, *args, **kwargs):
+        self._query_count += 1
+
+    def start(self):
+        """
+        Starts counting the SQL statements executed by this process.
+        """
+        event.listen(Engine, 'before_cursor_execute', self._count_query)
+
+    def stop(self):
+        """
+        Stops counting the SQL statements, ends the current loop if it was not
+        ended, e.g. because it failed, and dumps the cProfile stats if fewer
+        loops than requested ran.
+        """
+        self.end_loop()
+        if event.contains(Engine, 'before_cursor_execute', self._count_query):
+            event.remove(Engine, 'before_cursor_execute', self._count_query)
+        if self._profile is not None and self._profiled_loops > 0:
+            self._dump_profile()
+
+    def start_loop(self):
+        """
+        Marks the beginning of a loop. A loop that was not ended is discarded.
+        """
+        self._current_loop = {
+            'start_date': timezone.utcnow().isoformat(),
+            'start_time': time.time(),
+            'phases': OrderedDict(),
+        }
+        if self._profile is not None:
+            self._profile.enable()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times a phase of the current loop, to be used in a ``with`` block.
+
+        :param name: the name of the phase
+        :type name: unicode
+        """
+        start_time = time.time()
+        start_query_count = self._query_count
+        try:
+            yield
+        finally:
+            duration = time.time() - start_time
+            query_count = self._query_count - start_query_count
+            Stats.timing('{}.{}'.format(self.prefix, name), duration * 1000)
+            Stats.gauge('{}.{}.queries'.format(self.prefix, name), query_count)
+            if self._current_loop is not None:
+                phases = self._current_loop['phases']
+                phase = phases.setdefault(name, {'duration': 0.0, 'queries': 0})
+                phase['duration'] += duration
+                phase['queries'] += query_count
+
+    @contextmanager
+    def paused(self):
+        """
+        Does not count the SQL statements executed in a ``with`` block, e.g. by
+        a benchmark harness called from the loop.
+        """
+        start_query_count = self._query_count
+        try:
+            yield
+        finally:
+            self._query_count = start_query_count
+
+    def end_loop(self):
+        """
+        Marks the end of the current loop.
+
+        :return: the duration of the loop and of its phases
+        :rtype: dict
+        """
+        loop = self._current_loop
+        if loop is None:
+            return None
+        self._current_loop = None
+
+        if self._profile is not None:
+            self._profile.disable()
+            self._profiled_loops += 1
+            if self._profiled_loops == self.profile_loops:
+                self._dump_profile()
+
+        loop['duration'] = time.time() - loop.pop('start_time')
+        loop['queries'] = sum(phase['queries'] for phase in loop['phases'].values())
+        Stats.timing('{}.duration'.format(self.prefix), loop['duration'] * 1000)
+        self.loops.append(loop)
+        if self.report_path:
+            self._write_report()
+        return loop
+
+    def _write_report(self):
+        try:
+            mkdirs(os.path.dirname(os.path.abspath(self.report_path)), 0o755)
+            tmp_path = '{}.tmp'.format(self.report_path)
+            with open(tmp_path, 'w') as f:
+                json.dump({'loops': list(self.loops)}, f, indent=2)
+            os.rename(tmp_path, self.report_path)
+        except (IOError, OSError):
+            self.log.warning("Could not write the loop report to %s",
+                             self.report_path, exc_info=True)
+
+    def _dump_profile(self):
+        self._profile.dump_stats(self.profile_path)
+        self.log.info("Dumped the profile of %s loop(s) to %s",
+                      self._profiled_loops, self.profile_path)
+        self._profile = None
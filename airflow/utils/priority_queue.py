@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+from collections import OrderedDict
+
+try:
+    # Fix Python > 3.7 deprecation
+    from collections.abc import MutableMapping
+except ImportError:
+    # Preserve Python < 3.3 compatibility
+    from collections import MutableMapping
+
+
+class IndexedPriorityQueue(MutableMapping):
+    """
+    An ordered dict that also keeps its keys in a binary max-heap by the
+    priority of their values, so that the key with the highest priority can be
+    found and removed in O(log n), and so can any other key.
+
+    Iterating over the queue follows the insertion order like an OrderedDict.
+    Keys with the same priority come out of the heap in insertion order too.
+
+    :param priority: returns the priority of a value
+    :type priority: callable
+    """
+
+    def __init__(self, priority):
+        self._priority = priority
+        self._values = OrderedDict()
+        # The heap holds [priority, -insertion number, key] entries with the
+        # highest entry first, and the index maps every key to the position
+        # of its entry in the heap. Priorities are compared, never negated,
+        # so any orderable value can be used.
+        self._heap = []
+        self._index = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        priority = self._priority(value)
+        if key in self._index:
+            position = self._index[key]
+            entry = self._heap[position]
+            old_priority, entry[0] = entry[0], priority
+            if priority > old_priority:
+                self._sift_up(position)
+            else:
+                self._sift_down(position)
+        else:
+            self._heap.append([priority, -next(self._counter), key])
+            self._index[key] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        del self._values[key]
+        position = self._index.pop(key)
+        last = self._heap.pop()
+        if position < len(self._heap):
+            self._heap[position] = last
+            self._index[last[2]] = position
+            self._sift_up(position)
+            self._sift_down(self._index[last[2]])
+
+    def __repr__(self):
+        return '{}({!r})'.format(self.__class__.__name__, list(self._values.items()))
+
+    def clear(self):
+        self._values.clear()
+        self._heap = []
+        self._index = {}
+
+    def pop_highest(self):
+        """
+        Removes the key with the highest priority.
+
+        :return: the key and its value
+        :rtype: tuple
+        """
+        if not self._heap:
+            raise KeyError('pop_highest(): queue is empty')
+        key = self._heap[0][2]
+        return key, self.pop(key)
+
+    def highest(self, n):
+        """
+        Returns the n keys with the highest priority, in priority order, without
+        removing them. Only the O(n) top entries of the heap are visited.
+
+        :param n: the number of keys to return
+        :type n: int
+        :return: the keys and their values
+        :rtype: list[tuple]
+        """
+        result = []
+        candidates = [_Candidate(self._heap, 0)] if self._heap and n > 0 else []
+        while candidates and len(result) < n:
+            position = heapq.heappop(candidates).position
+            key = self._heap[position][2]
+            result.append((key, self._values[key]))
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self._heap):
+                    heapq.heappush(candidates, _Candidate(self._heap, child))
+        return result
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._index[heap[i][2]] = i
+        self._index[heap[j][2]] = j
+
+    def _sift_up(self, position):
+        heap = self._heap
+        while position > 0:
+            parent = (position - 1) // 2
+            if heap[position][:2] <= heap[parent][:2]:
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            highest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and heap[child][:2] > heap[highest][:2]:
+                    highest = child
+            if highest == position:
+                break
+            self._swap(position, highest)
+            position = highest
+
+
+class _Candidate(object):
+    """
+    A position of the heap of an IndexedPriorityQueue, ordered so that heapq
+    pops the highest entry first.
+    """
+    __slots__ = ('heap', 'position')
+
+    def __init__(self, heap, position):
+        self.heap = heap
+        self.position = position
+
+    def __lt__(self, other):
+        return self.heap[self.position][:2] > other.heap[other.position][:2]
@@ -89,6 +89,8 @@ VIEWER_PERMS = {
     'can_tries',
     'can_graph',
     'can_tree',
+    'can_tree_structure',
+    'can_tree_states',
     'can_task',
     'can_task_instances',
     'can_xcom',
@@ -19,6 +19,7 @@
 #
 
 import copy
+import hashlib
 import itertools
 import json
 import logging
@@ -26,7 +27,7 @@ import math
 import os
 import socket
 import traceback
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import timedelta
 
 
@@ -44,7 +45,7 @@ from flask_babel import lazy_gettext
 from past.builtins import unicode
 from pygments import highlight, lexers
 from pygments.formatters import HtmlFormatter
-from sqlalchemy import func, or_, desc, and_, union_all
+from sqlalchemy import func, or_, desc
 from wtforms import SelectField, validators
 
 import airflow
@@ -53,8 +54,10 @@ from airflow import models, jobs
 from airflow import settings
 from airflow.api.common.experimental.mark_tasks import (set_dag_run_state_to_success,
                                                         set_dag_run_state_to_failed)
+from airflow.dag.serialization import SerializedDagBag
 from airflow.models import DagRun, errors
 from airflow.models.connection import Connection
+from airflow.models.dag_state_stats import DagStateStats
 from airflow.models.log import Log
 from airflow.models.slamiss import SlaMiss
 from airflow.models.taskfail import TaskFail
@@ -81,10 +84,12 @@ else:
 
 
 PAGE_SIZE = conf.getint('webserver', 'page_size')
-if os.environ.get('SKIP_DAGS_PARSING') != 'True':
-    dagbag = models.DagBag(settings.DAGS_FOLDER)
-else:
+if os.environ.get('SKIP_DAGS_PARSING') == 'True':
     dagbag = models.DagBag
+elif conf.getboolean('core', 'store_serialized_dags'):
+    dagbag = SerializedDagBag()
+else:
+    dagbag = models.DagBag(settings.DAGS_FOLDER)
 
 
 def get_date_time_num_runs_dag_runs_form_data(request, session, dag):
@@ -139,6 +144,147 @@ def get_date_time_num_runs_dag_runs_form_data(request, session, dag):
     }
 
 
+# The tree view structures by (dag_id, root), in least recently used order
+TREE_STRUCTURE_CACHE_SIZE = 100
+_tree_structures = OrderedDict()
+
+
+def get_tree_structure(dag, root=None):
+    """
+    Returns the tasks of the tree view of a DAG as JSON: every task is listed
+    once with the indexes of its upstream tasks, the paths of the tree are
+    only traced by the browser. The structure is cached until the DAG is
+    loaded again.
+
+    :param dag: the DAG
+    :type dag: airflow.models.DAG
+    :param root: a regex of the tasks to show with their upstream tasks
+    :type root: str
+    :return: the JSON structure, its hash and the ids of its tasks
+    :rtype: tuple
+    """
+    key = (dag.dag_id, root)
+    version = (id(dag), dag.last_loaded)
+    cached = _tree_structures.pop(key, None)
+    if cached is None or cached[0] != version:
+        if root:
+            dag = dag.sub_dag(
+                task_regex=root,
+                include_downstream=False,
+                include_upstream=True)
+        tasks = dag.tasks
+        indexes = {task.task_id: i for i, task in enumerate(tasks)}
+        structure = {
+            'tasks': [{
+                'task_id': task.task_id,
+                'upstream': [indexes[t.task_id] for t in task.upstream_list],
+                'operator': task.task_type,
+                'retries': task.retries,
+                'owner': task.owner,
+                'start_date': task.start_date,
+                'end_date': task.end_date,
+                'depends_on_past': task.depends_on_past,
+                'ui_color': task.ui_color,
+            } for task in tasks],
+            'roots': [indexes[t.task_id] for t in dag.roots],
+        }
+        data = json.dumps(structure, default=json_ser, separators=(',', ':'))
+        etag = hashlib.sha1(data.encode('utf-8')).hexdigest()
+        cached = (version, data, etag, [task.task_id for task in tasks])
+    _tree_structures[key] = cached
+    while len(_tree_structures) > TREE_STRUCTURE_CACHE_SIZE:
+        _tree_structures.popitem(last=False)
+    return cached[1:]
+
+
+def get_tree_states(dag_id, task_ids, base_date, num_runs, session, filter_tasks=False):
+    """
+    Returns the states of the task instances of the last runs of a DAG up to
+    a date, as columns of a matrix with a row per task and a column per run.
+    The states are coded by their index in ``state_names``, missing task
+    instances are null.
+
+    :param dag_id: the id of the DAG
+    :type dag_id: str
+    :param task_ids: the ids of the tasks, one per row
+    :type task_ids: list[str]
+    :param base_date: the date of the last run
+    :type base_date: datetime.datetime
+    :param num_runs: the number of runs
+    :type num_runs: int
+    :param filter_tasks: only query the task instances of ``task_ids``
+    :type filter_tasks: bool
+    :rtype: dict
+    """
+    DR = models.DagRun
+    TI = models.TaskInstance
+    dag_runs = (
+        session.query(DR)
+        .filter(
+            DR.dag_id == dag_id,
+            DR.execution_date <= base_date)
+        .order_by(DR.execution_date.desc())
+        .limit(num_runs)
+        .all()
+    )
+    dag_runs.reverse()
+    dates = [dr.execution_date for dr in dag_runs]
+    columns = {date: i for i, date in enumerate(dates)}
+    rows = {task_id: i for i, task_id in enumerate(task_ids)}
+
+    states = [[None] * len(dates) for _ in task_ids]
+    try_numbers = [[None] * len(dates) for _ in task_ids]
+    start_dates = [[None] * len(dates) for _ in task_ids]
+    end_dates = [[None] * len(dates) for _ in task_ids]
+    durations = [[None] * len(dates) for _ in task_ids]
+    state_names = []
+    state_codes = {}
+    if dates:
+        query = session.query(
+            TI.task_id, TI.execution_date, TI.state, TI._try_number,
+            TI.start_date, TI.end_date, TI.duration,
+        ).filter(
+            TI.dag_id == dag_id,
+            TI.execution_date >= dates[0],
+            TI.execution_date <= dates[-1])
+        if filter_tasks:
+            query = query.filter(TI.task_id.in_(task_ids))
+        now = timezone.utcnow()
+        for task_id, execution_date, state, try_number, start_date, end_date, duration in query:
+            row = rows.get(task_id)
+            column = columns.get(execution_date)
+            if row is None or column is None:
+                continue
+            if state not in state_codes:
+                state_codes[state] = len(state_names)
+                state_names.append(state)
+            if state == State.RUNNING and start_date is not None:
+                duration = (now - start_date).total_seconds()
+            states[row][column] = state_codes[state]
+            try_numbers[row][column] = try_number
+            start_dates[row][column] = start_date
+            end_dates[row][column] = end_date
+            durations[row][column] = duration
+
+    return {
+        'dates': dates,
+        'dag_runs': [{
+            'run_id': dr.run_id,
+            'state': dr.state,
+            'external_trigger': dr.external_trigger,
+            'start_date': dr.start_date,
+            'end_date': dr.end_date,
+        } for dr in dag_runs],
+        'task_ids': task_ids,
+        'state_names': state_names,
+        'states': states,
+        'try_numbers': try_numbers,
+        'start_dates': start_dates,
+        'end_dates': end_dates,
+        'durations': durations,
+    }
+
+
 ######################################################################################
 #                                    BaseViews
 ######################################################################################
@@ -292,22 +438,14 @@ class Airflow(AirflowBaseView):
     @has_access
     @provide_session
     def dag_stats(self, session=None):
-        dr = models.DagRun
-
         filter_dag_ids = appbuilder.sm.get_accessible_dag_ids()
 
-        dag_state_stats = session.query(dr.dag_id, dr.state, sqla.func.count(dr.state))\
-            .group_by(dr.dag_id, dr.state)
-
         payload = {}
         if filter_dag_ids:
-            if 'all_dags' not in filter_dag_ids:
-                dag_state_stats = dag_state_stats.filter(dr.dag_id.in_(filter_dag_ids))
-            data = {}
-            for dag_id, state, count in dag_state_stats:
-                if dag_id not in data:
-                    data[dag_id] = {}
-                data[dag_id][state] = count
+            data = DagStateStats.get_counts(
+                DagStateStats.DAG_RUN_STATES,
+                dag_ids=None if 'all_dags' in filter_dag_ids else filter_dag_ids,
+                session=session)
 
             if 'all_dags' in filter_dag_ids:
                 filter_dag_ids = [dag_id for dag_id, in session.query(models.DagModel.dag_id)]
@@ -328,60 +466,16 @@ class Airflow(AirflowBaseView):
     @has_access
     @provide_session
     def task_stats(self, session=None):
-        TI = models.TaskInstance
-        DagRun = models.DagRun
-        Dag = models.DagModel
-
         filter_dag_ids = appbuilder.sm.get_accessible_dag_ids()
 
         payload = {}
         if not filter_dag_ids:
             return
 
-        LastDagRun = (
-            session.query(
-                DagRun.dag_id,
-                sqla.func.max(DagRun.execution_date).label('execution_date')
-            )
-            .join(Dag, Dag.dag_id == DagRun.dag_id)
-            .filter(DagRun.state != State.RUNNING, Dag.is_active)
-            .group_by(DagRun.dag_id)
-            .subquery('last_dag_run')
-        )
-        RunningDagRun = (
-            session.query(DagRun.dag_id, DagRun.execution_date)
-                   .join(Dag, Dag.dag_id == DagRun.dag_id)
-                   .filter(DagRun.state == State.RUNNING, Dag.is_active)
-                   .subquery('running_dag_run')
-        )
-
-        # Select all task_instances from active dag_runs.
-        # If no dag_run is active, return task instances from most recent dag_run.
-        LastTI = (
-            session.query(TI.dag_id.label('dag_id'), TI.state.label('state'))
-                   .join(LastDagRun,
-                         and_(LastDagRun.c.dag_id == TI.dag_id,
-                              LastDagRun.c.execution_date == TI.execution_date))
-        )
-        RunningTI = (
-            session.query(TI.dag_id.label('dag_id'), TI.state.label('state'))
-                   .join(RunningDagRun,
-                         and_(RunningDagRun.c.dag_id == TI.dag_id,
-                              RunningDagRun.c.execution_date == TI.execution_date))
-        )
-
-        UnionTI = union_all(LastTI, RunningTI).alias('union_ti')
-        qry = (
-            session.query(UnionTI.c.dag_id, UnionTI.c.state, sqla.func.count())
-                   .group_by(UnionTI.c.dag_id, UnionTI.c.state)
-        )
-
-        data = {}
-        for dag_id, state, count in qry:
-            if 'all_dags' in filter_dag_ids or dag_id in filter_dag_ids:
-                if dag_id not in data:
-                    data[dag_id] = {}
-                data[dag_id][state] = count
+        data = DagStateStats.get_counts(
+            DagStateStats.TASK_INSTANCE_STATES,
+            dag_ids=None if 'all_dags' in filter_dag_ids else filter_dag_ids,
+            session=session)
         session.commit()
 
         if 'all_dags' in filter_dag_ids:
@@ -567,6 +661,14 @@ class Airflow(AirflowBaseView):
             else:
                 dag = dagbag.get_dag(dag_id)
                 ti.task = dag.get_task(ti.task_id)
+                if response_format != 'json':
+                    filename_template = conf.get('core', 'LOG_FILENAME_TEMPLATE')
+                    attachment_filename = render_log_filename(ti, try_number, filename_template)
+                    return Response(
+                        self._stream_logs(handler, ti, try_number),
+                        mimetype='text/plain',
+                        headers={'Content-Disposition':
+                                 'attachment; filename={}'.format(attachment_filename)})
                 logs, metadatas = handler.read(ti, try_number, metadata=metadata)
                 metadata = metadatas[0]
             for i, log in enumerate(logs):
@@ -588,6 +690,35 @@ class Airflow(AirflowBaseView):
             metadata['end_of_log'] = True
             return jsonify(message=error_message, error=True, metadata=metadata)
 
+    @staticmethod
+    def _stream_logs(handler, ti, try_number):
+        """
+        Reads the logs of the given try, or of all the tries, chunk by chunk
+        so that they are downloaded without being loaded in memory at once.
+        """
+        if try_number is None:
+            try_numbers = list(range(1, ti.next_try_number))
+        else:
+            try_numbers = [try_number]
+
+        def stream():
+            for i, number in enumerate(try_numbers):
+                if i:
+                    yield '\n'
+                metadata = {'download_logs': True}
+                while not metadata.get('end_of_log'):
+                    logs, metadatas = handler.read(ti, number, metadata=metadata)
+                    # Stop once nothing more can be read, some handlers only end
+                    # the log at a mark written when the task finishes
+                    if not logs[0]:
+                        break
+                    if PY2 and not isinstance(logs[0], unicode):
+                        yield logs[0].decode('utf-8')
+                    else:
+                        yield logs[0]
+                    metadata = dict(metadatas[0], download_logs=True)
+        return stream()
+
     @expose('/log')
     @has_dag_access(can_dag_read=True)
     @has_access
@@ -1160,7 +1291,6 @@ class Airflow(AirflowBaseView):
     @action_logging
     @provide_session
     def tree(self, session=None):
-        default_dag_run = conf.getint('webserver', 'default_dag_run_display_number')
         dag_id = request.args.get('dag_id')
         blur = conf.getboolean('webserver', 'demo_mode')
         dag = dagbag.get_dag(dag_id)
@@ -1169,107 +1299,16 @@ class Airflow(AirflowBaseView):
             return redirect('/')
 
         root = request.args.get('root')
-        if root:
-            dag = dag.sub_dag(
-                task_regex=root,
-                include_downstream=False,
-                include_upstream=True)
-
-        base_date = request.args.get('base_date')
-        num_runs = request.args.get('num_runs')
-        num_runs = int(num_runs) if num_runs else default_dag_run
-
-        if base_date:
-            base_date = timezone.parse(base_date)
-        else:
-            base_date = dag.latest_execution_date or timezone.utcnow()
-
-        DR = models.DagRun
-        dag_runs = (
-            session.query(DR)
-            .filter(
-                DR.dag_id == dag.dag_id,
-                DR.execution_date <= base_date)
-            .order_by(DR.execution_date.desc())
-            .limit(num_runs)
-            .all()
-        )
-        dag_runs = {
-            dr.execution_date: alchemy_to_dict(dr) for dr in dag_runs}
-
-        dates = sorted(list(dag_runs.keys()))
-        max_date = max(dates) if dates else None
-        min_date = min(dates) if dates else None
-
-        tis = dag.get_task_instances(
-            session, start_date=min_date, end_date=base_date)
-        task_instances = {}
-        for ti in tis:
-            tid = alchemy_to_dict(ti)
-            dr = dag_runs.get(ti.execution_date)
-            tid['external_trigger'] = dr['external_trigger'] if dr else False
-            task_instances[(ti.task_id, ti.execution_date)] = tid
-
-        expanded = []
-        # The default recursion traces every path so that tree view has full
-        # expand/collapse functionality. After 5,000 nodes we stop and fall
-        # back on a quick DFS search for performance. See PR #320.
-        node_count = [0]
-        node_limit = 5000 / max(1, len(dag.roots))
-
-        def recurse_nodes(task, visited):
-            visited.add(task)
-            node_count[0] += 1
-
-            children = [
-                recurse_nodes(t, visited) for t in task.upstream_list
-                if node_count[0] < node_limit or t not in visited]
-
-            # D3 tree uses children vs _children to define what is
-            # expanded or not. The following block makes it such that
-            # repeated nodes are collapsed by default.
-            children_key = 'children'
-            if task.task_id not in expanded:
-                expanded.append(task.task_id)
-            elif children:
-                children_key = "_children"
-
-            def set_duration(tid):
-                if (isinstance(tid, dict) and tid.get("state") == State.RUNNING and
-                        tid["start_date"] is not None):
-                    d = timezone.utcnow() - pendulum.parse(tid["start_date"])
-                    tid["duration"] = d.total_seconds()
-                return tid
-
-            return {
-                'name': task.task_id,
-                'instances': [
-                    set_duration(task_instances.get((task.task_id, d))) or {
-                        'execution_date': d.isoformat(),
-                        'task_id': task.task_id
-                    }
-                    for d in dates],
-                children_key: children,
-                'num_dep': len(task.upstream_list),
-                'operator': task.task_type,
-                'retries': task.retries,
-                'owner': task.owner,
-                'start_date': task.start_date,
-                'end_date': task.end_date,
-                'depends_on_past': task.depends_on_past,
-                'ui_color': task.ui_color,
-            }
-
-        data = {
-            'name': '[DAG]',
-            'children': [recurse_nodes(t, set()) for t in dag.roots],
-            'instances': [
-                dag_runs.get(d) or {'execution_date': d.isoformat()}
-                for d in dates],
-        }
+        # The structure itself is fetched by the page from tree_structure,
+        # which the browser keeps until the DAG changes
+        _, _, task_ids = get_tree_structure(dag, root)
+        base_date, num_runs = self._get_tree_base_date_and_num_runs(dag)
+        states = get_tree_states(dag.dag_id, task_ids, base_date, num_runs, session,
+                                 filter_tasks=bool(root))
+        max_date = states['dates'][-1] if states['dates'] else None
 
         # minimize whitespace as this can be huge for bigger dags
-        data = json.dumps(data, default=json_ser, separators=(',', ':'))
+        states = json.dumps(states, default=json_ser, separators=(',', ':'))
         session.commit()
 
         form = DateTimeWithNumRunsForm(data={'base_date': max_date,
@@ -1277,12 +1316,70 @@ class Airflow(AirflowBaseView):
         return self.render(
             'airflow/tree.html',
             operators=sorted(
-                list(set([op.__class__ for op in dag.tasks])),
+                list(set([dag.task_dict[task_id].__class__ for task_id in task_ids])),
                 key=lambda x: x.__name__
             ),
             root=root,
             form=form,
-            dag=dag, data=data, blur=blur, num_runs=num_runs)
+            dag=dag, states=states, blur=blur, num_runs=num_runs)
+
+    @staticmethod
+    def _get_tree_base_date_and_num_runs(dag):
+        default_dag_run = conf.getint('webserver', 'default_dag_run_display_number')
+        base_date = request.args.get('base_date')
+        num_runs = request.args.get('num_runs')
+        num_runs = int(num_runs) if num_runs else default_dag_run
+
+        if base_date:
+            base_date = timezone.parse(base_date)
+        else:
+            base_date = dag.latest_execution_date or timezone.utcnow()
+        return base_date, num_runs
+
+    @expose('/object/tree_structure')
+    @has_dag_access(can_dag_read=True)
+    @has_access
+    @gzipped
+    def tree_structure(self):
+        """
+        The tasks of the tree view, see ``get_tree_structure``. The response
+        is tagged with the hash of the structure so that browsers only fetch
+        it again once the DAG changed.
+        """
+        dag_id = request.args.get('dag_id')
+        dag = dagbag.get_dag(dag_id)
+        if not dag:
+            return wwwutils.json_response({'error': 'DAG {} not found'.format(dag_id)}), 404
+
+        structure, etag, _ = get_tree_structure(dag, request.args.get('root'))
+        response = Response(structure, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+    @expose('/object/tree_states')
+    @has_dag_access(can_dag_read=True)
+    @has_access
+    @gzipped
+    @provide_session
+    def tree_states(self, session=None):
+        """
+        The states of the task instances of the tree view for ``num_runs``
+        runs up to ``base_date``, see ``get_tree_states``. Older runs are
+        fetched by passing the date of the oldest run shown as ``base_date``.
+        """
+        dag_id = request.args.get('dag_id')
+        dag = dagbag.get_dag(dag_id)
+        if not dag:
+            return wwwutils.json_response({'error': 'DAG {} not found'.format(dag_id)}), 404
+
+        root = request.args.get('root')
+        _, _, task_ids = get_tree_structure(dag, root)
+        base_date, num_runs = self._get_tree_base_date_and_num_runs(dag)
+        states = get_tree_states(dag.dag_id, task_ids, base_date, num_runs, session,
+                                 filter_tasks=bool(root))
+        return Response(json.dumps(states, default=json_ser, separators=(',', ':')),
+                        mimetype='application/json')
 
     @expose('/graph')
     @has_dag_access(can_dag_read=True)
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+"""
+Scheduler throughput benchmark.
+
+Generates a set of synthetic DAGs, runs the SchedulerJob against an executor
+that marks the task instances as successful without running them, and reports
+as JSON:
+
+- the number of task instances scheduled per second,
+- the percentiles of the scheduler loop duration, with the mean duration and
+  number of SQL statements of every loop phase,
+- the number of SQL statements per task instance, for all the scheduler
+  processes (main loop and DAG file processors) and for the main loop only.
+
+The statements executed by the benchmark executor itself to mark the task
+instances as successful are not counted.
+
+To Run:
+    $ python scripts/perf/scheduler_benchmark.py --dags 10 --tasks 50 --shape linear
+
+The benchmark uses a temporary SQLite database by default. To run it against
+another database, e.g. a local Postgres, pass its URL with
+``--sql-alchemy-conn``; the tables are created if needed and the previous
+benchmark DAGs are removed from it, so use a dedicated database.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SHAPES = ('no_structure', 'linear', 'fan_out', 'fan_in')
+
+DAG_ID_PREFIX = 'perf_benchmark_'
+
+POOL_PREFIX = 'perf_benchmark_pool_'
+
+DAG_FILE_TEMPLATE = """
+from airflow.models import DAG
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils.dates import days_ago
+
+dag = DAG(
+    dag_id={dag_id!r},
+    start_date=days_ago({dag_runs}),
+    schedule_interval='@daily',
+    max_active_runs={dag_runs},
+    concurrency={concurrency},
+)
+
+tasks = [
+    DummyOperator(task_id='task_{{}}'.format(i),
+                  pool={pool_prefix!r} + str(i % {pools}) if {pools} else None,
+                  dag=dag)
+    for i in range({tasks})
+]
+
+if {shape!r} == 'linear':
+    for upstream, downstream in zip(tasks, tasks[1:]):
+        upstream >> downstream
+elif {shape!r} == 'fan_out':
+    tasks[0] >> tasks[1:]
+elif {shape!r} == 'fan_in':
+    tasks[:-1] >> tasks[-1]
+"""
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the throughput of the scheduler on synthetic DAGs")
+    parser.add_argument('--dags', type=int, default=10,
+                        help="Number of DAGs, one file per DAG")
+    parser.add_argument('--tasks', type=int, default=10,
+                        help="Number of tasks per DAG")
+    parser.add_argument('--shape', choices=SHAPES, default='no_structure',
+                        help="Dependencies between the tasks of a DAG")
+    parser.add_argument('--dag-runs', type=int, default=1,
+                        help="Number of DAG runs scheduled per DAG")
+    parser.add_argument('--concurrency', type=int, default=1000,
+                        help="Concurrency of each DAG")
+    parser.add_argument('--pools', type=int, default=0,
+                        help="Number of pools the tasks are spread over, 0 for none")
+    parser.add_argument('--pool-slots', type=int, default=128,
+                        help="Number of slots of each pool")
+    parser.add_argument('--sql-alchemy-conn',
+                        help="Database to run the benchmark against, defaults to "
+                             "a temporary SQLite database")
+    parser.add_argument('--max-runtime', type=int, default=600,
+                        help="Seconds after which the benchmark is stopped")
+    parser.add_argument('--output',
+                        help="File to write the JSON results to, defaults to stdout")
+    return parser.parse_args(argv)
+
+
+ARGS = parse_args() if __name__ == '__main__' else None
+WORK_DIR = None
+if ARGS is not None:
+    WORK_DIR = tempfile.mkdtemp(prefix='airflow_scheduler_benchmark_')
+    # The configuration has to be in place before Airflow is imported
+    os.environ.update({
+        'AIRFLOW__CORE__SQL_ALCHEMY_CONN': (
+            ARGS.sql_alchemy_conn or
+            'sqlite:///' + os.path.join(WORK_DIR, 'airflow.db')),
+        'AIRFLOW__CORE__DAGS_FOLDER': os.path.join(WORK_DIR, 'dags'),
+        'AIRFLOW__CORE__LOAD_EXAMPLES': 'False',
+        'AIRFLOW__CORE__DAGS_ARE_PAUSED_AT_CREATION': 'False',
+        # Don't sleep between the scheduler loops
+        'AIRFLOW__CORE__UNIT_TEST_MODE': 'True',
+        'AIRFLOW__SCHEDULER__MIN_FILE_PROCESS_INTERVAL': '0',
+        'AIRFLOW__SCHEDULER__LOOP_REPORT_SIZE': '1000000',
+        'AIRFLOW__SCHEDULER__CATCHUP_BY_DEFAULT': 'True',
+    })
+
+from sqlalchemy import and_, event, or_  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from airflow import settings  # noqa: E402
+from airflow.executors.base_executor import BaseExecutor  # noqa: E402
+from airflow.jobs import SchedulerJob  # noqa: E402
+from airflow.models import DagModel, DagRun, Pool, TaskInstance  # noqa: E402
+from airflow.utils import timezone  # noqa: E402
+from airflow.utils.db import create_session, upgradedb  # noqa: E402
+from airflow.utils.state import State  # noqa: E402
+from airflow.version import version  # noqa: E402
+
+# Number of SQL statements executed by this process and its children
+QUERY_COUNT = multiprocessing.Value('l', 0)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(*args, **kwargs):
+    with QUERY_COUNT.get_lock():
+        QUERY_COUNT.value += 1
+
+
+class BenchmarkExecutor(BaseExecutor):
+    """
+    Marks the task instances sent to it as successful, in one statement per
+    heartbeat, without running them. The scheduler job is stopped once the
+    expected number of task instances succeeded or the time is up.
+    """
+
+    def __init__(self, expected_task_instances, max_runtime):
+        super(BenchmarkExecutor, self).__init__(parallelism=0)
+        self.expected_task_instances = expected_task_instances
+        self.max_runtime = max_runtime
+        self.job = None
+        self.start_time = None
+        self.first_task_time = None
+        self.completed = 0
+        self.own_query_count = 0
+
+    def start(self):
+        self.start_time = time.time()
+
+    def execute_async(self, key, command, queue=None, executor_config=None):
+        if self.first_task_time is None:
+            self.first_task_time = time.time()
+
+    def sync(self):
+        keys = list(self.running)
+        if keys:
+            query_count = QUERY_COUNT.value
+            TI = TaskInstance
+            now = timezone.utcnow()
+            # Keep these statements out of the executor_heartbeat phase
+            with self.job.loop_profiler.paused(), create_session() as session:
+                session.query(TI).filter(or_(*[
+                    and_(TI.dag_id == dag_id,
+                         TI.task_id == task_id,
+                         TI.execution_date == execution_date)
+                    for dag_id, task_id, execution_date, _ in keys
+                ])).update({
+                    TI.state: State.SUCCESS,
+                    TI.start_date: now,
+                    TI.end_date: now,
+                    TI.duration: 0,
+                    TI._try_number: TI._try_number + 1,
+                }, synchronize_session=False)
+            self.own_query_count += QUERY_COUNT.value - query_count
+            for key in keys:
+                self.success(key)
+            self.completed += len(keys)
+
+        if (self.completed >= self.expected_task_instances or
+                time.time() - self.start_time > self.max_runtime):
+            self.job._last_loop = True
+
+    def end(self):
+        self.sync()
+
+
+def generate_dags(dag_folder, args):
+    os.makedirs(dag_folder)
+    for i in range(args.dags):
+        dag_id = '{}{}'.format(DAG_ID_PREFIX, i)
+        with open(os.path.join(dag_folder, dag_id + '.py'), 'w') as f:
+            f.write(DAG_FILE_TEMPLATE.format(
+                dag_id=dag_id, dag_runs=args.dag_runs, concurrency=args.concurrency,
+                pool_prefix=POOL_PREFIX, pools=args.pools, tasks=args.tasks,
+                shape=args.shape))
+
+
+def prepare_database(args):
+    upgradedb()
+    with create_session() as session:
+        for model in (TaskInstance, DagRun, DagModel):
+            session.query(model).filter(
+                model.dag_id.like(DAG_ID_PREFIX + '%')).delete(synchronize_session=False)
+        session.query(Pool).filter(
+            Pool.pool.like(POOL_PREFIX + '%')).delete(synchronize_session=False)
+        for i in range(args.pools):
+            session.add(Pool(pool=POOL_PREFIX + str(i), slots=args.pool_slots))
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args):
+    generate_dags(settings.DAGS_FOLDER, args)
+    prepare_database(args)
+
+    expected_task_instances = args.dags * args.tasks * args.dag_runs
+    executor = BenchmarkExecutor(expected_task_instances, args.max_runtime)
+    job = SchedulerJob(subdir=settings.DAGS_FOLDER, executor=executor,
+                       processor_poll_interval=0)
+    job.heartrate = 0
+    executor.job = job
+
+    query_count = QUERY_COUNT.value
+    job.run()
+    end_time = time.time()
+    query_count = QUERY_COUNT.value - query_count - executor.own_query_count
+
+    elapsed = end_time - executor.start_time
+    loops = list(job.loop_profiler.loops)
+    loop_durations = [loop['duration'] for loop in loops]
+    main_loop_query_count = sum(loop['queries'] for loop in loops)
+    phases = {}
+    for loop in loops:
+        for name, phase in loop['phases'].items():
+            totals = phases.setdefault(name, {'duration': 0.0, 'queries': 0, 'loops': 0})
+            totals['duration'] += phase['duration']
+            totals['queries'] += phase['queries']
+            totals['loops'] += 1
+    completed = executor.completed
+
+    return {
+        'parameters': {
+            'dags': args.dags,
+            'tasks': args.tasks,
+            'shape': args.shape,
+            'dag_runs': args.dag_runs,
+            'concurrency': args.concurrency,
+            'pools': args.pools,
+            'pool_slots': args.pool_slots,
+            'max_runtime': args.max_runtime,
+        },
+        'environment': {
+            'airflow_version': version,
+            'git_revision': git_revision(),
+            'database': settings.engine.dialect.name,
+            'python_version': platform.python_version(),
+            'date': timezone.utcnow().isoformat(),
+        },
+        'results': {
+            'completed': completed >= expected_task_instances,
+            'task_instances': completed,
+            'expected_task_instances': expected_task_instances,
+            'elapsed_seconds': elapsed,
+            'seconds_to_first_task': (executor.first_task_time - executor.start_time
+                                      if executor.first_task_time else None),
+            'tasks_per_second': completed / elapsed if elapsed else None,
+            'loops': len(loops),
+            'loop_duration_seconds': {
+                'p50': percentile(loop_durations, 50),
+                'p90': percentile(loop_durations, 90),
+                'p99': percentile(loop_durations, 99),
+                'max': max(loop_durations) if loop_durations else None,
+            },
+            'phases': {
+                name: {
+                    'mean_seconds': totals['duration'] / totals['loops'],
+                    'queries_per_loop': totals['queries'] / totals['loops'],
+                }
+                for name, totals in phases.items()
+            },
+            'queries': query_count,
+            'queries_per_task_instance': (query_count / completed
+                                          if completed else None),
+            'main_loop_queries_per_task_instance': (main_loop_query_count / completed
+                                                    if completed else None),
+        },
+    }
+
+
+def main():
+    try:
+        results = run_benchmark(ARGS)
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if ARGS.output:
+        with open(ARGS.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if not results['results']['completed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -191,6 +191,7 @@ hive = [
     'hmsclient>=0.1.0',
     'pyhive>=0.6.0',
 ]
+inotify = ['inotify_simple>=1.1.8']
 jdbc = ['jaydebeapi>=1.1.1']
 jenkins = ['python-jenkins>=1.0.0']
 jira = ['JIRA>1.0.7']
@@ -355,6 +356,7 @@ def do_setup():
             'google_auth': google_auth,
             'hdfs': hdfs,
             'hive': hive,
+            'inotify': inotify,
             'jdbc': jdbc,
             'jira': jira,
             'kerberos': kerberos,
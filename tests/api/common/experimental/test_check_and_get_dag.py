@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import mock
+
+from airflow.api.common import experimental
+from airflow.api.common.experimental import check_and_get_dag
+from airflow.exceptions import DagNotFound, TaskNotFound
+from airflow.models import DagBag, DagModel
+from airflow.utils import timezone
+from airflow.utils.db import create_session
+
+DAG_ID = 'test_check_and_get_dag'
+DAG_FILE_CONTENT = """
+from airflow.models import DAG
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils.timezone import datetime
+
+dag = DAG('test_check_and_get_dag', start_date=datetime(2019, 1, 1))
+DummyOperator(task_id='task', dag=dag)
+"""
+
+
+class CheckAndGetDagTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dag_folder = tempfile.mkdtemp()
+        self.dag_file = os.path.join(self.dag_folder, 'test_check_and_get_dag.py')
+        with open(self.dag_file, 'w') as f:
+            f.write(DAG_FILE_CONTENT)
+        with create_session() as session:
+            session.query(DagModel).filter(DagModel.dag_id == DAG_ID).delete()
+            session.add(DagModel(dag_id=DAG_ID, fileloc=self.dag_file))
+        experimental._dag_cache.clear()
+
+    def tearDown(self):
+        with create_session() as session:
+            session.query(DagModel).filter(DagModel.dag_id == DAG_ID).delete()
+        experimental._dag_cache.clear()
+        shutil.rmtree(self.dag_folder)
+
+    def test_dag_is_parsed_once(self):
+        with mock.patch.object(DagBag, 'process_file',
+                               autospec=True, side_effect=DagBag.process_file) as process_file:
+            dag = check_and_get_dag(DAG_ID, 'task')
+            self.assertIs(dag, check_and_get_dag(DAG_ID))
+        self.assertEqual(DAG_ID, dag.dag_id)
+        self.assertEqual([self.dag_file],
+                         [call[0][1] for call in process_file.call_args_list])
+
+    def test_modified_file_is_parsed_again(self):
+        dag = check_and_get_dag(DAG_ID)
+        mtime = os.path.getmtime(self.dag_file)
+        os.utime(self.dag_file, (mtime + 10, mtime + 10))
+        self.assertIsNot(dag, check_and_get_dag(DAG_ID))
+
+    def test_expired_dag_is_parsed_again(self):
+        dag = check_and_get_dag(DAG_ID)
+        with create_session() as session:
+            session.query(DagModel).filter(DagModel.dag_id == DAG_ID).update(
+                {DagModel.last_expired: timezone.utcnow()})
+        self.assertIsNot(dag, check_and_get_dag(DAG_ID))
+
+    def test_zipped_dag_is_parsed_once(self):
+        zip_file = os.path.join(self.dag_folder, 'test_check_and_get_dag.zip')
+        with zipfile.ZipFile(zip_file, 'w') as zf:
+            zf.write(self.dag_file, 'test_check_and_get_dag.py')
+        os.remove(self.dag_file)
+        with create_session() as session:
+            session.query(DagModel).filter(DagModel.dag_id == DAG_ID).update(
+                {DagModel.fileloc: os.path.join(zip_file, 'test_check_and_get_dag.py')})
+
+        with mock.patch.object(DagBag, 'process_file',
+                               autospec=True, side_effect=DagBag.process_file) as process_file:
+            dag = check_and_get_dag(DAG_ID, 'task')
+            self.assertIs(dag, check_and_get_dag(DAG_ID))
+        self.assertEqual(DAG_ID, dag.dag_id)
+        self.assertEqual([zip_file],
+                         [call[0][1] for call in process_file.call_args_list])
+
+    def test_missing_dag_and_task(self):
+        self.assertRaises(DagNotFound, check_and_get_dag, 'test_check_and_get_dag_missing')
+        self.assertRaises(TaskNotFound, check_and_get_dag, DAG_ID, 'missing_task')
+
+        os.remove(self.dag_file)
+        self.assertRaises(DagNotFound, check_and_get_dag, DAG_ID)
+        self.assertNotIn(DAG_ID, experimental._dag_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,7 +19,9 @@
 #
 
 from six import StringIO
+import shutil
 import sys
+import tempfile
 import unittest
 
 from datetime import datetime, timedelta, time
@@ -173,6 +175,65 @@ class TestCLI(unittest.TestCase):
             state = ti.current_state()
             self.assertEqual(state, State.SUCCESS)
 
+    def _sync_dag_model(self, dag_id, fileloc):
+        session = Session()
+        session.query(models.DagModel).filter_by(dag_id=dag_id).delete()
+        session.add(models.DagModel(dag_id=dag_id, fileloc=fileloc))
+        session.commit()
+        session.close()
+
+    def test_get_dag_parses_only_the_dag_file(self):
+        fileloc = os.path.join(TEST_DAG_FOLDER, 'test_on_kill.py')
+        self._sync_dag_model('test_on_kill', fileloc)
+        args = Namespace(dag_id='test_on_kill', subdir=TEST_DAG_FOLDER)
+
+        with patch('airflow.bin.cli.DagBag', wraps=models.DagBag) as mock_dagbag:
+            dag = get_dag(args)
+
+        self.assertEqual('test_on_kill', dag.dag_id)
+        mock_dagbag.assert_called_once_with(fileloc, include_examples=False)
+
+    def test_serve_logs_range(self):
+        log_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_folder)
+        with open(os.path.join(log_folder, '1.log'), 'w') as f:
+            f.write('line 1\nline 2\n')
+
+        base_log_folder = cli.conf.get('core', 'base_log_folder')
+        self.addCleanup(cli.conf.set, 'core', 'base_log_folder', base_log_folder)
+        cli.conf.set('core', 'base_log_folder', log_folder)
+
+        client = cli.create_serve_logs_app().test_client()
+        response = client.get('/log/1.log', headers={'Range': 'bytes=7-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'line 2\n')
+
+        response = client.get('/log/1.log', headers={'Range': 'bytes=14-'})
+        self.assertEqual(response.status_code, 416)
+
+    def test_get_dag_parses_the_folder_when_the_dag_moved(self):
+        fileloc = os.path.join(TEST_DAG_FOLDER, 'test_on_kill.py')
+        self._sync_dag_model('test_mark_success', fileloc)
+        args = Namespace(dag_id='test_mark_success', subdir=TEST_DAG_FOLDER)
+
+        with patch('airflow.bin.cli.DagBag', wraps=models.DagBag) as mock_dagbag:
+            dag = get_dag(args)
+
+        self.assertEqual('test_mark_success', dag.dag_id)
+        self.assertEqual(2, mock_dagbag.call_count)
+        mock_dagbag.assert_called_with(TEST_DAG_FOLDER)
+
+    def test_get_dag_ignores_files_outside_of_the_subdir(self):
+        self._sync_dag_model('test_on_kill', os.path.join(TEST_DAG_FOLDER, 'test_on_kill.py'))
+        subdir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, subdir)
+
+        with patch('airflow.bin.cli.DagBag') as mock_dagbag:
+            mock_dagbag.return_value.dags = {'test_on_kill': 'dag'}
+            get_dag(Namespace(dag_id='test_on_kill', subdir=subdir))
+
+        mock_dagbag.assert_called_once_with(subdir)
+
     def test_test(self):
         """Test the `airflow test` command"""
         args = create_mock_args(
@@ -25,18 +25,31 @@ import mock
 import re
 import string
 import random
+import threading
+import time
 from urllib3 import HTTPResponse
 from datetime import datetime
+from queue import Queue
+
+from airflow import configuration
+from airflow.models import DAG, TaskInstance
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils import timezone
+from airflow.utils.db import create_session
+from airflow.utils.state import State
 
 try:
     from kubernetes.client.rest import ApiException
     from airflow.contrib.executors.kubernetes_executor import AirflowKubernetesScheduler
     from airflow.contrib.executors.kubernetes_executor import KubernetesExecutor
     from airflow.contrib.executors.kubernetes_executor import KubernetesExecutorConfig
+    from airflow.contrib.executors.kubernetes_executor import KubernetesJobWatcher
     from airflow.contrib.kubernetes.worker_configuration import WorkerConfiguration
 except ImportError:
     AirflowKubernetesScheduler = None
 
+DEFAULT_DATE = timezone.datetime(2016, 1, 1)
+
 
 class TestAirflowKubernetesScheduler(unittest.TestCase):
     @staticmethod
@@ -410,5 +423,264 @@ class TestKubernetesExecutor(unittest.TestCase):
         self.assertTrue(kubernetesExecutor.task_queue.empty())
 
 
+class TestKubernetesJobWatcher(unittest.TestCase):
+
+    def _make_event(self, event_type, pod_id, phase, resource_version):
+        pod = mock.MagicMock()
+        pod.metadata.name = pod_id
+        pod.metadata.labels = {'dag_id': 'dag'}
+        pod.metadata.resource_version = resource_version
+        pod.status.phase = phase
+        return {'type': event_type, 'object': pod}
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    @mock.patch('airflow.contrib.executors.kubernetes_executor.watch')
+    def test_finished_pods_are_reported_once(self, mock_watch):
+        watcher_queue = Queue()
+        watcher = KubernetesJobWatcher('default', watcher_queue, '0', 'uuid')
+        mock_watch.Watch.return_value.stream.return_value = [
+            self._make_event('ADDED', 'pod1', 'Pending', '1'),
+            self._make_event('MODIFIED', 'pod1', 'Running', '2'),
+            self._make_event('MODIFIED', 'pod1', 'Succeeded', '3'),
+            self._make_event('MODIFIED', 'pod2', 'Failed', '4'),
+            # Replayed when the watch restarts
+            self._make_event('ADDED', 'pod1', 'Succeeded', '3'),
+            self._make_event('DELETED', 'pod1', 'Succeeded', '5'),
+        ]
+
+        self.assertEqual('5', watcher._run(mock.MagicMock(), '0', 'uuid'))
+
+        self.assertEqual(('pod1', None, {'dag_id': 'dag'}, '3'), watcher_queue.get_nowait())
+        self.assertEqual(('pod2', State.FAILED, {'dag_id': 'dag'}, '4'),
+                         watcher_queue.get_nowait())
+        self.assertTrue(watcher_queue.empty())
+        self.assertEqual({'pod2': 'Failed'}, watcher._finished_pods)
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    def test_finished_pods_are_bounded(self):
+        watcher_queue = Queue()
+        watcher = KubernetesJobWatcher('default', watcher_queue, '0', 'uuid')
+        watcher.finished_pods_max_size = 2
+
+        for i in range(3):
+            watcher.process_status('pod{}'.format(i), 'Succeeded', {}, str(i))
+
+        self.assertEqual(['pod1', 'pod2'], list(watcher._finished_pods))
+
+
+class TestKubernetesExecutorSync(unittest.TestCase):
+
+    @staticmethod
+    def _labels(task_id):
+        return {
+            'dag_id': 'dag', 'task_id': task_id, 'try_number': '1',
+            'execution_date': AirflowKubernetesScheduler._datetime_to_label_safe_datestring(
+                DEFAULT_DATE),
+        }
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    def test_watcher_events_are_coalesced_by_pod(self):
+        scheduler = AirflowKubernetesScheduler.__new__(AirflowKubernetesScheduler)
+        scheduler.kube_watcher = mock.MagicMock()
+        scheduler.watcher_queue = Queue()
+        scheduler.result_queue = Queue()
+        for event in [('pod1', State.FAILED, self._labels('task1'), '1'),
+                      ('pod2', None, self._labels('task2'), '2'),
+                      ('pod1', None, self._labels('task1'), '3')]:
+            scheduler.watcher_queue.put(event)
+
+        scheduler.sync()
+
+        key1 = ('dag', 'task1', DEFAULT_DATE, 1)
+        key2 = ('dag', 'task2', DEFAULT_DATE, 1)
+        self.assertEqual((key2, None, 'pod2', '2'), scheduler.result_queue.get_nowait())
+        self.assertEqual((key1, None, 'pod1', '3'), scheduler.result_queue.get_nowait())
+        self.assertTrue(scheduler.result_queue.empty())
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    @mock.patch('airflow.contrib.executors.kubernetes_executor.KubeResourceVersion')
+    def test_sync_changes_states_in_batch(self, mock_resource_version):
+        dag = DAG('test_kubernetes_executor_sync', start_date=DEFAULT_DATE)
+        tis = [TaskInstance(DummyOperator(task_id='task{}'.format(i), dag=dag), DEFAULT_DATE)
+               for i in range(3)]
+        with create_session() as session:
+            session.query(TaskInstance).filter(TaskInstance.dag_id == dag.dag_id).delete()
+            for ti in tis:
+                ti.state = State.QUEUED
+                session.merge(ti)
+        self.addCleanup(self._delete_task_instances, dag.dag_id)
+
+        executor = KubernetesExecutor()
+        executor.kube_scheduler = mock.MagicMock()
+        executor.task_queue = Queue()
+        executor.result_queue = Queue()
+        for i, state in enumerate([State.FAILED, None, State.FAILED]):
+            key = tis[i].key[:3] + (1,)
+            executor.running[key] = 'command'
+            executor.result_queue.put((key, state, 'pod{}'.format(i), str(i)))
+
+        executor.sync()
+
+        mock_resource_version.checkpoint_resource_version.assert_called_once_with('2')
+        self.assertEqual(3, executor.kube_scheduler.delete_pod.call_count)
+        self.assertEqual({}, executor.running)
+        self.assertEqual([State.FAILED, None, State.FAILED],
+                         [executor.event_buffer[ti.key[:3] + (1,)] for ti in tis])
+        for ti, state in zip(tis, [State.FAILED, State.QUEUED, State.FAILED]):
+            ti.refresh_from_db()
+            self.assertEqual(state, ti.state)
+
+    @staticmethod
+    def _delete_task_instances(dag_id):
+        with create_session() as session:
+            session.query(TaskInstance).filter(TaskInstance.dag_id == dag_id).delete()
+
+
+class FakeKubeClient(object):
+    """
+    Creates pods slowly, keeping track of how many are being created at once,
+    and raises an ApiException for the first ``failures`` pods.
+    """
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.created = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def create_namespaced_pod(self, body, namespace):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.1)
+            with self._lock:
+                if self.failures:
+                    self.failures -= 1
+                    raise ApiException(status=403, reason='Forbidden')
+                self.created.append(body['metadata']['name'])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class TestKubernetesExecutorPodCreation(unittest.TestCase):
+
+    def setUp(self):
+        configuration.conf.set('kubernetes', 'worker_pods_creation_batch_size', '6')
+        configuration.conf.set('kubernetes', 'worker_pods_creation_concurrency', '2')
+        configuration.conf.set('kubernetes', 'worker_pods_creation_backoff', '10')
+
+    def tearDown(self):
+        configuration.conf.set('kubernetes', 'worker_pods_creation_batch_size', '1')
+        configuration.conf.set('kubernetes', 'worker_pods_creation_concurrency', '1')
+        configuration.conf.set('kubernetes', 'worker_pods_creation_backoff', '0')
+
+    def _start_executor(self, kube_client):
+        with mock.patch('airflow.contrib.executors.kubernetes_executor.get_kube_client',
+                        return_value=kube_client), \
+                mock.patch('airflow.contrib.executors.kubernetes_executor.KubernetesJobWatcher'):
+            executor = KubernetesExecutor()
+            executor.start()
+        self.addCleanup(executor.kube_scheduler.terminate)
+        return executor
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    @mock.patch('airflow.contrib.executors.kubernetes_executor.Stats')
+    def test_pods_are_created_concurrently(self, mock_stats):
+        kube_client = FakeKubeClient()
+        executor = self._start_executor(kube_client)
+        for i in range(6):
+            executor.execute_async(key=('dag', 'task{}'.format(i), DEFAULT_DATE, 1),
+                                   command='command', executor_config={})
+
+        executor.sync()
+
+        self.assertEqual(6, len(kube_client.created))
+        self.assertEqual(2, kube_client.max_in_flight)
+        self.assertTrue(executor.task_queue.empty())
+        self.assertEqual(6, mock_stats.timing.call_count)
+        for call in mock_stats.timing.call_args_list:
+            name, latency = call[0]
+            self.assertEqual('kubernetes_executor.pod_launch_latency', name)
+            self.assertGreater(latency, 0)
+        self.assertEqual({}, executor._queued_times)
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    @mock.patch('airflow.contrib.executors.kubernetes_executor.Stats')
+    def test_failed_pod_creation_is_retried_after_backoff(self, mock_stats):
+        kube_client = FakeKubeClient(failures=1)
+        executor = self._start_executor(kube_client)
+        key = ('dag', 'task', DEFAULT_DATE, 1)
+        executor.execute_async(key=key, command='command', executor_config={})
+
+        executor.sync()
+        self.assertEqual([], kube_client.created)
+        self.assertEqual(1, executor.task_queue.qsize())
+        attempts, not_before, queued_time = executor._pod_creation_retries[key]
+        self.assertEqual(1, attempts)
+        self.assertGreater(not_before, time.time() + 5)
+        mock_stats.incr.assert_called_once_with('kubernetes_executor.pod_creation_failures')
+
+        # Still backing off, the pod is not created
+        executor.sync()
+        self.assertEqual(1, executor.task_queue.qsize())
+        self.assertEqual([], kube_client.created)
+
+        self.assertEqual({}, executor._queued_times)
+        executor._pod_creation_retries[key] = (attempts, time.time() - 1, queued_time)
+        executor.sync()
+        self.assertEqual(1, len(kube_client.created))
+        self.assertTrue(executor.task_queue.empty())
+        self.assertEqual({}, executor._pod_creation_retries)
+        mock_stats.timing.assert_called_once_with(
+            'kubernetes_executor.pod_launch_latency', mock.ANY)
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    @mock.patch('airflow.contrib.executors.kubernetes_executor.Stats')
+    def test_end_does_not_wait_for_backoff(self, mock_stats):
+        kube_client = FakeKubeClient(failures=2)
+        executor = self._start_executor(kube_client)
+        backing_off = ('dag', 'backing_off', DEFAULT_DATE, 1)
+        failing = ('dag', 'failing', DEFAULT_DATE, 1)
+        ready = ('dag', 'ready', DEFAULT_DATE, 1)
+        executor.execute_async(key=backing_off, command='command', executor_config={})
+        executor.sync()
+        self.assertIn(backing_off, executor._pod_creation_retries)
+        executor.execute_async(key=failing, command='command', executor_config={})
+        executor.execute_async(key=ready, command='command', executor_config={})
+
+        start = time.time()
+        executor.end()
+
+        self.assertLess(time.time() - start, 5)
+        # One of the two new tasks fails and is dropped instead of retried
+        self.assertEqual(1, len(kube_client.created))
+        self.assertTrue(executor.task_queue.empty())
+        self.assertEqual({}, executor._queued_times)
+        self.assertEqual({}, executor._pod_creation_retries)
+
+    @unittest.skipIf(AirflowKubernetesScheduler is None,
+                     'kubernetes python package is not installed')
+    def test_backoff_doubles_up_to_the_maximum(self):
+        executor = KubernetesExecutor()
+        executor.task_queue = Queue()
+        task = (('dag', 'task', DEFAULT_DATE, 1), 'command', None)
+        backoffs = []
+        for _ in range(8):
+            before = time.time()
+            executor._retry_pod_creation(task, ApiException(status=403))
+            backoffs.append(round(executor._pod_creation_retries[task[0]][1] - before))
+        self.assertEqual([10, 20, 40, 80, 160, 300, 300, 300], backoffs)
+        self.assertEqual(8, executor.task_queue.qsize())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import unittest
+from datetime import datetime, timedelta
+
+import pendulum
+
+from airflow.dag.serialization import (
+    SerializedBaseOperator, SerializedDagBag, deserialize_dag, serialize_dag
+)
+from airflow.models import DAG, SerializedDagModel
+from airflow.operators.bash_operator import BashOperator
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.operators.python_operator import PythonOperator
+from airflow.operators.subdag_operator import SubDagOperator
+from airflow.utils.db import create_session
+
+DEFAULT_DATE = pendulum.timezone('Europe/Amsterdam').convert(datetime(2019, 1, 1))
+
+
+def make_dag(dag_id='test_serialization', bash_command='echo {{ ds }}'):
+    dag = DAG(dag_id, start_date=DEFAULT_DATE, schedule_interval='@daily',
+              default_args={'retries': 2, 'retry_delay': timedelta(minutes=1)},
+              access_control={'role': {'can_dag_read'}})
+    dag.doc_md = 'Documentation'
+    with dag:
+        bash = BashOperator(task_id='bash', bash_command=bash_command,
+                            env={'KEY': 'value'})
+        python = PythonOperator(task_id='python', python_callable=make_dag)
+        dummy = DummyOperator(task_id='dummy', trigger_rule='all_done')
+        bash >> [python, dummy]
+        python >> dummy
+    return dag
+
+
+def _clear_serialized_dags():
+    with create_session() as session:
+        session.query(SerializedDagModel).filter(
+            SerializedDagModel.dag_id.like('test_serialization%')).delete(
+            synchronize_session=False)
+
+
+class TestDagSerialization(unittest.TestCase):
+
+    def test_round_trip(self):
+        dag = make_dag()
+        data = json.loads(json.dumps(serialize_dag(dag)))
+        serialized_dag = deserialize_dag(data)
+
+        self.assertEqual(dag.dag_id, serialized_dag.dag_id)
+        self.assertEqual(dag.start_date, serialized_dag.start_date)
+        self.assertEqual(dag._schedule_interval, serialized_dag._schedule_interval)
+        self.assertEqual('Europe/Amsterdam', serialized_dag.timezone.name)
+        self.assertEqual(dag.fileloc, serialized_dag.fileloc)
+        self.assertEqual('Documentation', serialized_dag.doc_md)
+        self.assertEqual({'role': {'can_dag_read'}}, serialized_dag.access_control)
+        self.assertEqual(dag.following_schedule(DEFAULT_DATE),
+                         serialized_dag.following_schedule(DEFAULT_DATE))
+        self.assertEqual(set(dag.task_ids), set(serialized_dag.task_ids))
+        self.assertEqual([task.task_id for task in dag.roots],
+                         [task.task_id for task in serialized_dag.roots])
+
+        for task in dag.tasks:
+            serialized_task = serialized_dag.get_task(task.task_id)
+            self.assertIsInstance(serialized_task, SerializedBaseOperator)
+            self.assertEqual(task.task_type, serialized_task.task_type)
+            self.assertEqual(task.ui_color, serialized_task.ui_color)
+            self.assertEqual(task.ui_fgcolor, serialized_task.ui_fgcolor)
+            self.assertEqual(task.retries, serialized_task.retries)
+            self.assertEqual(task.retry_delay, serialized_task.retry_delay)
+            self.assertEqual(task.trigger_rule, serialized_task.trigger_rule)
+            self.assertEqual(task.start_date, serialized_task.start_date)
+            self.assertEqual(task.upstream_task_ids, serialized_task.upstream_task_ids)
+            self.assertEqual(task.downstream_task_ids, serialized_task.downstream_task_ids)
+
+        bash = serialized_dag.get_task('bash')
+        self.assertEqual(BashOperator.template_fields, bash.__class__.template_fields)
+        self.assertEqual('echo {{ ds }}', bash.bash_command)
+        self.assertEqual({'KEY': 'value'}, bash.env)
+        self.assertEqual('PythonOperator',
+                         serialized_dag.get_task('python').__class__.__name__)
+
+    def test_serialized_tasks_render_templates(self):
+        serialized_dag = deserialize_dag(serialize_dag(make_dag()))
+        bash = serialized_dag.get_task('bash')
+        self.assertEqual('echo 2019-01-01', bash.render_template(
+            'bash_command', bash.bash_command, {'ds': '2019-01-01'}))
+
+    def test_subdag(self):
+        dag = make_dag()
+        subdag = DAG('test_serialization.section', start_date=DEFAULT_DATE)
+        DummyOperator(task_id='inner', dag=subdag)
+        SubDagOperator(task_id='section', subdag=subdag, dag=dag)
+        subdag.parent_dag = dag
+        subdag.is_subdag = True
+
+        serialized_subdag = deserialize_dag(serialize_dag(subdag))
+        self.assertTrue(serialized_subdag.is_subdag)
+        self.assertEqual(dag.dag_id, serialized_subdag.parent_dag_id)
+        self.assertEqual('SubDagOperator',
+                         deserialize_dag(serialize_dag(dag)).get_task('section').task_type)
+
+
+class TestSerializedDagBag(unittest.TestCase):
+
+    def setUp(self):
+        _clear_serialized_dags()
+
+    def tearDown(self):
+        _clear_serialized_dags()
+
+    def test_write_dag_only_writes_changes(self):
+        self.assertTrue(SerializedDagModel.write_dag(make_dag()))
+        self.assertFalse(SerializedDagModel.write_dag(make_dag()))
+        self.assertTrue(SerializedDagModel.write_dag(make_dag(bash_command='echo')))
+
+    def test_get_dag(self):
+        SerializedDagModel.write_dag(make_dag())
+        dagbag = SerializedDagBag(cache_size=10)
+
+        dag = dagbag.get_dag('test_serialization')
+        self.assertEqual(['bash', 'dummy', 'python'], sorted(dag.task_ids))
+        self.assertIs(dag, dagbag.get_dag('test_serialization'))
+        self.assertIsNone(dagbag.get_dag('test_serialization_missing'))
+        self.assertIn('test_serialization', dagbag.dags)
+        self.assertNotIn('test_serialization_missing', dagbag.dags)
+
+        # A new version is loaded again
+        SerializedDagModel.write_dag(make_dag(bash_command='echo'))
+        new_dag = dagbag.get_dag('test_serialization')
+        self.assertIsNot(dag, new_dag)
+        self.assertEqual('echo', new_dag.get_task('bash').bash_command)
+
+    def test_remove_deleted_dags(self):
+        for i in range(3):
+            dag = make_dag('test_serialization_{}'.format(i))
+            dag.full_filepath = '/dags/{}.py'.format('a' if i < 2 else 'b')
+            SerializedDagModel.write_dag(dag)
+        dagbag = SerializedDagBag()
+
+        def stored_dag_ids():
+            return sorted(dag_id for dag_id in dagbag.dag_ids
+                          if dag_id.startswith('test_serialization'))
+
+        SerializedDagModel.remove_deleted_dags('/dags/a.py', ['test_serialization_0'])
+        self.assertEqual(['test_serialization_0', 'test_serialization_2'], stored_dag_ids())
+
+        with create_session() as session:
+            file_paths = [fileloc for fileloc, in session.query(SerializedDagModel.fileloc)
+                          if fileloc != '/dags/b.py']
+        SerializedDagModel.remove_deleted_files(file_paths)
+        self.assertEqual(['test_serialization_0'], stored_dag_ids())
+        self.assertIsNone(dagbag.get_dag('test_serialization_2'))
+
+    def test_least_recently_used_dags_are_evicted(self):
+        for i in range(3):
+            SerializedDagModel.write_dag(make_dag('test_serialization_{}'.format(i)))
+        dagbag = SerializedDagBag(cache_size=2)
+
+        dag_0 = dagbag.get_dag('test_serialization_0')
+        dagbag.get_dag('test_serialization_1')
+        self.assertIs(dag_0, dagbag.get_dag('test_serialization_0'))
+        dag_2 = dagbag.get_dag('test_serialization_2')
+
+        self.assertEqual(2, len(dagbag._cache))
+        self.assertIs(dag_0, dagbag.get_dag('test_serialization_0'))
+        self.assertIs(dag_2, dagbag.get_dag('test_serialization_2'))
+        self.assertNotIn('test_serialization_1',
+                         [dag.dag_id for dag in dagbag._cache.values()])
+
+    def test_get_subdag(self):
+        dag = make_dag()
+        subdag = DAG('test_serialization.section', start_date=DEFAULT_DATE)
+        DummyOperator(task_id='inner', dag=subdag)
+        SubDagOperator(task_id='section', subdag=subdag, dag=dag)
+        subdag.parent_dag = dag
+        SerializedDagModel.write_dag(dag)
+        SerializedDagModel.write_dag(subdag)
+
+        dagbag = SerializedDagBag()
+        serialized_subdag = dagbag.get_dag('test_serialization.section')
+        self.assertEqual('test_serialization', serialized_subdag.parent_dag.dag_id)
+
+        # The SubDagOperator refers to the stored sub-DAG
+        serialized_dag = dagbag.get_dag('test_serialization')
+        self.assertIs(serialized_subdag, serialized_dag.get_task('section').subdag)
+        self.assertEqual(['test_serialization.section'],
+                         [d.dag_id for d in serialized_dag.subdags])
+        self.assertEqual([], serialized_dag.clear(dry_run=True, start_date=DEFAULT_DATE))
+
+    def test_get_dag_with_missing_subdag(self):
+        dag = make_dag()
+        subdag = DAG('test_serialization.section', start_date=DEFAULT_DATE)
+        SubDagOperator(task_id='section', subdag=subdag, dag=dag)
+        SerializedDagModel.write_dag(dag)
+
+        serialized_dag = SerializedDagBag().get_dag('test_serialization')
+        serialized_subdag = serialized_dag.get_task('section').subdag
+        self.assertEqual('test_serialization.section', serialized_subdag.dag_id)
+        self.assertEqual([], serialized_subdag.tasks)
+        self.assertEqual([serialized_subdag], serialized_dag.subdags)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,6 +19,8 @@
 
 import unittest
 
+import mock
+
 from airflow.executors.base_executor import BaseExecutor
 from airflow.utils.state import State
 
@@ -42,3 +44,43 @@ class BaseExecutorTest(unittest.TestCase):
         self.assertEqual(len(executor.get_event_buffer(("my_dag1",))), 1)
         self.assertEqual(len(executor.get_event_buffer()), 2)
         self.assertEqual(len(executor.event_buffer), 0)
+
+    def test_get_events(self):
+        executor = BaseExecutor()
+
+        date = datetime.utcnow()
+        key1 = ("my_dag1", "my_task1", date, 1)
+        key2 = ("my_dag2", "my_task1", date, 1)
+        executor.success(key1, info={'external_id': 'job1'})
+        executor.fail(key2)
+
+        self.assertEqual([(key1, State.SUCCESS, {'external_id': 'job1'})],
+                         executor.get_events(("my_dag1",)))
+        self.assertEqual([(key2, State.FAILED, None)], executor.get_events())
+        self.assertEqual({}, executor.event_buffer)
+        self.assertEqual({}, executor.event_info)
+
+    def test_heartbeat_runs_tasks_with_highest_priority(self):
+        executor = BaseExecutor(parallelism=2)
+        executor.execute_async = mock.Mock()
+        executor.running['running'] = ['true']
+
+        for key, priority in [('low', 1), ('high', 3), ('medium', 2)]:
+            executor.queue_command(
+                mock.Mock(key=key), [key], priority=priority, queue='default')
+        self.assertTrue(executor.has_task(mock.Mock(key='low')))
+
+        executor.heartbeat()
+
+        executor.execute_async.assert_called_once_with(
+            key='high', command=['high'], queue='default',
+            executor_config=mock.ANY)
+        self.assertEqual(['low', 'medium'], list(executor.queued_tasks))
+        self.assertFalse(executor.has_task(mock.Mock(key='unknown')))
+
+    def test_wait_for_events(self):
+        executor = BaseExecutor()
+        self.assertFalse(executor.wait_for_events(0))
+
+        executor.event_buffer['key'] = State.SUCCESS
+        self.assertTrue(executor.wait_for_events(0))
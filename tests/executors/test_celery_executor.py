@@ -18,6 +18,7 @@
 # under the License.
 import os
 import sys
+import tempfile
 import unittest
 import contextlib
 from multiprocessing import Pool
@@ -162,6 +163,115 @@ class CeleryExecutorTest(unittest.TestCase):
         self.assertIn(celery_executor.CELERY_FETCH_ERR_MSG_HEADER, log)
         self.assertIn('AttributeError', log)
 
+    def test_heartbeat_sends_tasks_with_highest_priority_in_batches(self):
+        executor = celery_executor.CeleryExecutor()
+        executor.parallelism = 3
+        executor._sync_parallelism = 2
+        for i, priority in enumerate([1, 5, 3, 4]):
+            executor.queued_tasks['key{}'.format(i)] = (
+                ['true'], priority, 'queue', mock.MagicMock())
+
+        send_pool = mock.MagicMock()
+        send_pool.imap_unordered.side_effect = lambda send, batches: [
+            [(key, command, mock.MagicMock()) for key, _, command, _, _ in batch]
+            for batch in batches]
+        with mock.patch.object(executor, '_get_send_pool', return_value=send_pool), \
+                mock.patch.object(executor, 'sync'):
+            executor.heartbeat()
+
+        send, batches = send_pool.imap_unordered.call_args[0]
+        self.assertEqual(celery_executor.send_tasks_to_executor, send)
+        self.assertEqual([['key1', 'key3'], ['key2']],
+                         [[task_tuple[0] for task_tuple in batch] for batch in batches])
+        self.assertEqual(['key0'], list(executor.queued_tasks))
+        self.assertEqual({'key1', 'key2', 'key3'}, set(executor.running))
+        self.assertEqual({'key1', 'key2', 'key3'}, set(executor.tasks))
+
+    def test_send_tasks_to_executor_uses_one_producer(self):
+        task = mock.MagicMock()
+        producer = task.app.producer_or_acquire.return_value.__enter__.return_value
+        task_tuples = [('key1', None, ['true'], 'queue', task),
+                       ('key2', None, ['false'], 'queue', task)]
+
+        results = celery_executor.send_tasks_to_executor(task_tuples)
+
+        task.app.producer_or_acquire.assert_called_once_with()
+        task.apply_async.assert_has_calls([
+            mock.call(args=[['true']], queue='queue', producer=producer),
+            mock.call(args=[['false']], queue='queue', producer=producer)])
+        self.assertEqual(['key1', 'key2'], [key for key, _, _ in results])
+
+    def test_send_tasks_to_executor_reports_broker_errors(self):
+        task = mock.MagicMock()
+        task.app.producer_or_acquire.side_effect = IOError('broker is down')
+        task_tuples = [('key1', None, ['true'], 'queue', task),
+                       ('key2', None, ['false'], 'queue', task)]
+
+        results = celery_executor.send_tasks_to_executor(task_tuples)
+
+        self.assertEqual(['key1', 'key2'], [key for key, _, _ in results])
+        for _, _, result in results:
+            self.assertIsInstance(result, celery_executor.ExceptionWithTraceback)
+        task.apply_async.assert_not_called()
+
+
+class BulkStateFetcherTest(unittest.TestCase):
+
+    def _store_results(self, app, states):
+        for task_id, state in states.items():
+            app.backend.store_result(task_id, None, state)
+        return [(task_id, app.AsyncResult(task_id)) for task_id in sorted(states)]
+
+    def _get_many(self, app, celery_tasks):
+        with mock.patch('airflow.executors.celery_executor.app', app):
+            fetcher = celery_executor.BulkStateFetcher(sync_parallelism=1)
+            return fetcher.get_many(celery_tasks)
+
+    def test_should_query_database_backend_once(self):
+        with tempfile.NamedTemporaryFile(suffix='.db') as f:
+            app = Celery(broker='memory://',
+                         backend='db+sqlite:///{}'.format(f.name))
+            celery_tasks = self._store_results(app, {
+                'task-1': celery_states.SUCCESS,
+                'task-2': celery_states.FAILURE,
+            }) + [('task-3', app.AsyncResult('task-3'))]
+
+            with mock.patch('airflow.executors.celery_executor.fetch_celery_task_state') \
+                    as mock_fetch:
+                key_and_states = self._get_many(app, celery_tasks)
+            mock_fetch.assert_not_called()
+
+        self.assertEqual([('task-1', celery_states.SUCCESS),
+                          ('task-2', celery_states.FAILURE),
+                          ('task-3', celery_states.PENDING)], key_and_states)
+
+    def test_should_query_key_value_backend_once(self):
+        app = Celery(broker='memory://', backend='cache+memory://')
+        celery_tasks = self._store_results(app, {
+            'task-1': celery_states.SUCCESS,
+            'task-2': celery_states.STARTED,
+        }) + [('task-3', app.AsyncResult('task-3'))]
+
+        with mock.patch.object(app.backend, 'mget', wraps=app.backend.mget) as mock_mget:
+            key_and_states = self._get_many(app, celery_tasks)
+        mock_mget.assert_called_once()
+
+        self.assertEqual([('task-1', celery_states.SUCCESS),
+                          ('task-2', celery_states.STARTED),
+                          ('task-3', celery_states.PENDING)], key_and_states)
+
+    def test_should_fall_back_to_multiprocessing(self):
+        app = Celery(broker='memory://', backend='rpc://')
+        celery_tasks = [('task-1', app.AsyncResult('task-1'))]
+
+        with mock.patch('airflow.executors.celery_executor.Pool') as mock_pool:
+            mock_pool.return_value.map.return_value = [('task-1', celery_states.SUCCESS)]
+            key_and_states = self._get_many(app, celery_tasks)
+
+        mock_pool.return_value.map.assert_called_once_with(
+            celery_executor.fetch_celery_task_state, celery_tasks, chunksize=1)
+        self.assertEqual([('task-1', celery_states.SUCCESS)], key_and_states)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -17,9 +17,16 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import os
+import tempfile
+import time
 import unittest
+from argparse import Namespace
 
-from airflow.executors.local_executor import LocalExecutor
+import mock
+
+from airflow import configuration
+from airflow.executors.local_executor import LocalExecutor, LocalWorker
 from airflow.utils.state import State
 from airflow.utils.timeout import timeout
 
@@ -74,6 +81,99 @@ class LocalExecutorTest(unittest.TestCase):
         test_parallelism = 2
         self.execution_parallelism(parallelism=test_parallelism)
 
+    def test_wait_for_events_returns_when_task_finishes(self):
+        executor = LocalExecutor(parallelism=1)
+        executor.start()
+        self.assertFalse(executor.wait_for_events(0))
+
+        executor.running['success'] = True
+        executor.execute_async(key='success', command=['true'])
+        start = time.time()
+        with timeout(seconds=30):
+            self.assertTrue(executor.wait_for_events(30))
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(State.SUCCESS, executor.event_buffer['success'])
+        self.assertNotIn('success', executor.running)
+
+        executor.end()
+
+
+class LocalWorkerInProcessTest(unittest.TestCase):
+
+    RUN_COMMAND = ['airflow', 'run', 'example_bash_operator', 'runme_0',
+                   '2016-01-01T00:00:00+00:00', '--local']
+
+    def setUp(self):
+        self.result_queue = mock.MagicMock()
+        configuration.conf.set('core', 'local_executor_in_process', 'True')
+        self.worker = LocalWorker(self.result_queue)
+
+    def tearDown(self):
+        configuration.conf.set('core', 'local_executor_in_process', 'False')
+
+    def _execute_with(self, func):
+        args = Namespace(pickle=None, func=func)
+        with mock.patch('airflow.bin.cli.CLIFactory.get_parser') as mock_get_parser, \
+                mock.patch.object(self.worker, '_get_dag') as mock_get_dag:
+            mock_get_parser.return_value.parse_args.return_value = args
+            self.worker.execute_work('key', self.RUN_COMMAND)
+        mock_get_parser.return_value.parse_args.assert_called_once_with(
+            self.RUN_COMMAND[1:])
+        mock_get_dag.assert_called_once_with(args)
+
+    def test_run_command_is_executed_in_fork(self):
+        with tempfile.NamedTemporaryFile() as f:
+            def run(args, dag=None):
+                with open(f.name, 'w') as out:
+                    out.write(str(os.getpid()))
+
+            self._execute_with(run)
+            pid = int(f.read())
+
+        self.assertNotEqual(os.getpid(), pid)
+        self.result_queue.put.assert_called_once_with(('key', State.SUCCESS))
+
+    def test_failed_run_command(self):
+        def run(args, dag=None):
+            raise ValueError('task failed')
+
+        self._execute_with(run)
+
+        self.result_queue.put.assert_called_once_with(('key', State.FAILED))
+
+    def test_other_commands_are_executed_in_subprocess(self):
+        with mock.patch.object(self.worker, '_execute_in_fork') as mock_execute_in_fork:
+            self.worker.execute_work('key', ['true'])
+
+        mock_execute_in_fork.assert_not_called()
+        self.result_queue.put.assert_called_once_with(('key', State.SUCCESS))
+
+    def test_parsed_dags_are_kept(self):
+        args = Namespace(subdir='/dags', dag_id='dag')
+        with mock.patch('airflow.bin.cli._get_dag_fileloc') as mock_get_dag_fileloc, \
+                mock.patch('os.path.getmtime') as mock_getmtime, \
+                mock.patch('airflow.models.DagBag') as mock_dagbag:
+            mock_get_dag_fileloc.return_value = '/dags/dag.py'
+            mock_getmtime.return_value = 1
+            mock_dagbag.return_value.dags = {'dag': 'the dag'}
+            self.assertEqual('the dag', self.worker._get_dag(args))
+            self.assertEqual('the dag', self.worker._get_dag(args))
+            mock_dagbag.assert_called_once_with('/dags/dag.py', include_examples=False)
+
+            mock_getmtime.return_value = 2
+            self.assertEqual('the dag', self.worker._get_dag(args))
+            self.assertEqual(2, mock_dagbag.call_count)
+
+        mock_getmtime.assert_called_with('/dags/dag.py')
+
+    def test_unknown_dag_file_is_not_parsed(self):
+        args = Namespace(subdir='/dags', dag_id='dag')
+        with mock.patch('airflow.bin.cli._get_dag_fileloc', return_value=None), \
+                mock.patch('airflow.models.DagBag') as mock_dagbag:
+            self.assertIsNone(self.worker._get_dag(args))
+
+        mock_dagbag.assert_not_called()
+
 
 if __name__ == '__main__':
     unittest.main()
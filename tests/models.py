@@ -1412,6 +1412,28 @@ class DagRunTest(unittest.TestCase):
         self.assertFalse(dagrun2.is_backfill)
         self.assertFalse(dagrun3.is_backfill)
 
+    def test_verify_integrity_is_skipped_when_dag_unchanged(self):
+        dag = DAG('test_verify_integrity_skipped', start_date=DEFAULT_DATE)
+        DummyOperator(task_id='task_1', owner='test', dag=dag)
+
+        dagrun = self.create_dag_run(dag, execution_date=DEFAULT_DATE)
+        self.assertIsNotNone(dagrun.verified_dag_hash)
+
+        session = settings.Session()
+        session.query(TI).filter(TI.dag_id == dag.dag_id).delete()
+        session.commit()
+
+        dagrun.verify_integrity(session=session)
+        self.assertEqual([], dagrun.get_task_instances(session=session))
+
+        DummyOperator(task_id='task_2', owner='test', dag=dag)
+        dagrun.verify_integrity(session=session)
+        tis = dagrun.get_task_instances(session=session)
+        self.assertEqual(['task_1', 'task_2'], sorted(ti.task_id for ti in tis))
+        self.assertTrue(all(ti.state == State.NONE and ti.pool is None and
+                            ti.try_number == 1 for ti in tis))
+        session.close()
+
     def test_removed_task_instances_can_be_restored(self):
         def with_all_tasks_removed(dag):
             return DAG(dag_id=dag.dag_id, start_date=dag.start_date)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import unittest
+from datetime import timedelta
+
+from airflow import configuration as conf
+from airflow.models import DAG, DagModel, DagRun, TaskInstance
+from airflow.models.dag_state_stats import DagStateStats
+from airflow.operators.dummy_operator import DummyOperator
+from airflow.utils import timezone
+from airflow.utils.db import create_session
+from airflow.utils.state import State
+
+DAG_ID = 'test_dag_state_stats'
+DEFAULT_DATE = timezone.datetime(2019, 1, 1)
+
+
+class TestDagStateStats(unittest.TestCase):
+
+    def setUp(self):
+        self._clean_up()
+        self.addCleanup(self._clean_up)
+        refresh_interval = conf.get('scheduler', 'dag_state_stats_refresh_interval')
+        self.addCleanup(conf.set, 'scheduler', 'dag_state_stats_refresh_interval',
+                        refresh_interval)
+        conf.set('scheduler', 'dag_state_stats_refresh_interval', '30')
+
+        dag = DAG(DAG_ID, start_date=DEFAULT_DATE)
+        DummyOperator(task_id='a', dag=dag)
+        DummyOperator(task_id='b', dag=dag)
+        with create_session() as session:
+            session.add(DagModel(dag_id=DAG_ID, is_active=True))
+        # The task instances of the running DAG run and of the last finished
+        # DAG run are counted
+        finished_dag_run = dag.create_dagrun(run_id='finished', execution_date=DEFAULT_DATE,
+                                             state=State.SUCCESS)
+        for ti in finished_dag_run.get_task_instances():
+            ti.set_state(State.SUCCESS)
+        self.running_dag_run = dag.create_dagrun(
+            run_id='running', execution_date=DEFAULT_DATE + timedelta(days=1),
+            state=State.RUNNING)
+        self.running_dag_run.get_task_instance('a').set_state(State.SUCCESS)
+
+    @staticmethod
+    def _clean_up():
+        with create_session() as session:
+            for model in (DagStateStats, DagModel, DagRun, TaskInstance):
+                session.query(model).filter(model.dag_id == DAG_ID).delete()
+
+    def test_count_states(self):
+        with create_session() as session:
+            self.assertEqual(
+                DagStateStats.count_dag_run_states(session, dag_ids=[DAG_ID]),
+                {DAG_ID: {State.SUCCESS: 1, State.RUNNING: 1}})
+            self.assertEqual(
+                DagStateStats.count_task_instance_states(session, dag_ids=[DAG_ID]),
+                {DAG_ID: {State.SUCCESS: 3, State.NONE: 1}})
+
+    def test_get_counts_reads_refreshed_counts(self):
+        DagStateStats.refresh()
+        self.running_dag_run.get_task_instance('b').set_state(State.FAILED)
+
+        self.assertEqual(
+            DagStateStats.get_counts(DagStateStats.DAG_RUN_STATES, dag_ids=[DAG_ID]),
+            {DAG_ID: {State.SUCCESS: 1, State.RUNNING: 1}})
+        self.assertEqual(
+            DagStateStats.get_counts(DagStateStats.TASK_INSTANCE_STATES, dag_ids=[DAG_ID]),
+            {DAG_ID: {State.SUCCESS: 3, State.NONE: 1}})
+
+        DagStateStats.refresh()
+        self.assertEqual(
+            DagStateStats.get_counts(DagStateStats.TASK_INSTANCE_STATES, dag_ids=[DAG_ID]),
+            {DAG_ID: {State.SUCCESS: 3, State.FAILED: 1}})
+
+    def test_get_counts_counts_states_when_not_refreshed(self):
+        self.assertEqual(
+            DagStateStats.get_counts(DagStateStats.TASK_INSTANCE_STATES, dag_ids=[DAG_ID]),
+            {DAG_ID: {State.SUCCESS: 3, State.NONE: 1}})
+
+        DagStateStats.refresh()
+        with create_session() as session:
+            session.query(DagStateStats).update({
+                DagStateStats.last_updated: timezone.utcnow() - timedelta(minutes=5)})
+        self.running_dag_run.get_task_instance('b').set_state(State.FAILED)
+        self.assertEqual(
+            DagStateStats.get_counts(DagStateStats.TASK_INSTANCE_STATES, dag_ids=[DAG_ID]),
+            {DAG_ID: {State.SUCCESS: 3, State.FAILED: 1}})
+
+    def test_get_counts_without_refresh_interval(self):
+        DagStateStats.refresh()
+        self.running_dag_run.get_task_instance('b').set_state(State.FAILED)
+        conf.set('scheduler', 'dag_state_stats_refresh_interval', '0')
+        self.assertEqual(
+            DagStateStats.get_counts(DagStateStats.TASK_INSTANCE_STATES, dag_ids=[DAG_ID]),
+            {DAG_ID: {State.SUCCESS: 3, State.FAILED: 1}})
+
+    def test_refresh_removes_deleted_dags(self):
+        DagStateStats.refresh()
+        self._clean_up()
+        DagStateStats.refresh()
+        with create_session() as session:
+            self.assertIsNone(session.query(DagStateStats).filter(
+                DagStateStats.dag_id == DAG_ID).first())
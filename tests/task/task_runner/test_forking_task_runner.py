@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import getpass
+import os
+import subprocess
+import time
+import unittest
+
+import mock
+import psutil
+
+from airflow import models, settings
+from airflow.jobs import LocalTaskJob
+from airflow.models import TaskInstance as TI
+from airflow.task.task_runner.forking_task_runner import ForkingTaskRunner
+from airflow.utils import timezone
+from airflow.utils.state import State
+
+from tests.core import TEST_DAG_FOLDER
+
+DEFAULT_DATE = timezone.datetime(2016, 1, 1)
+
+
+class TestForkingTaskRunner(unittest.TestCase):
+
+    @staticmethod
+    def _clear_dag_runs(dag_id):
+        session = settings.Session()
+        session.query(models.DagRun).filter(models.DagRun.dag_id == dag_id).delete()
+        session.commit()
+        session.close()
+
+    def _get_task_instance(self, dag_id, task_id):
+        dagbag = models.DagBag(
+            dag_folder=TEST_DAG_FOLDER,
+            include_examples=False,
+        )
+        dag = dagbag.dags.get(dag_id)
+        task = dag.get_task(task_id)
+
+        dag.clear()
+        self._clear_dag_runs(dag_id)
+        self.addCleanup(self._clear_dag_runs, dag_id)
+        session = settings.Session()
+        dag.create_dagrun(run_id="test_forking_task_runner",
+                          state=State.RUNNING,
+                          execution_date=DEFAULT_DATE,
+                          start_date=DEFAULT_DATE,
+                          session=session)
+        session.close()
+        return TI(task=task, execution_date=DEFAULT_DATE)
+
+    def test_task_runs_in_fork(self):
+        ti = self._get_task_instance('test_example_bash_operator', 'runme_0')
+        job = LocalTaskJob(task_instance=ti, ignore_ti_state=True)
+
+        # The heartbeats do not sleep in unit test mode, the fork must not be
+        # killed once the task instance succeeded but before the fork exited
+        with mock.patch.object(LocalTaskJob, 'heartbeat_callback'), \
+                mock.patch('airflow.task.task_runner._TASK_RUNNER', 'ForkingTaskRunner'), \
+                mock.patch('airflow.task.task_runner.base_task_runner.subprocess.Popen') \
+                as mock_popen:
+            job.run()
+
+        self.assertIsInstance(job.task_runner, ForkingTaskRunner)
+        self.assertEqual(0, job.task_runner.return_code())
+        mock_popen.assert_not_called()
+        ti.refresh_from_db()
+        self.assertEqual(State.SUCCESS, ti.state)
+
+    def test_on_kill(self):
+        path = "/tmp/airflow_on_kill"
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+        ti = self._get_task_instance('test_on_kill', 'task1')
+        job = LocalTaskJob(task_instance=ti, ignore_ti_state=True)
+
+        runner = ForkingTaskRunner(job)
+        runner.start()
+        self.assertIsInstance(runner.process, psutil.Process)
+        self.assertEqual(runner.process.pid, os.getpgid(runner.process.pid))
+
+        # give the task some time to startup
+        time.sleep(3)
+
+        runner.terminate()
+        self.assertIsNotNone(runner.return_code())
+
+        with open(path, "r") as f:
+            self.assertEqual("ON_KILL_TEST", f.readline())
+
+    def test_run_as_user_uses_subprocess(self):
+        ti = self._get_task_instance('test_on_kill', 'task1')
+        ti.run_as_user = getpass.getuser()
+        job = LocalTaskJob(task_instance=ti, ignore_ti_state=True)
+
+        runner = ForkingTaskRunner(job)
+        self.assertFalse(runner.can_fork)
+        runner.start()
+        self.assertIsInstance(runner.process, subprocess.Popen)
+        self.assertIsNone(runner.return_code())
+
+        runner.terminate()
+        self.assertIsNotNone(runner.return_code())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -47,11 +47,13 @@ import airflow.example_dags
 from airflow.executors import BaseExecutor, SequentialExecutor
 from airflow.jobs import BaseJob, BackfillJob, SchedulerJob, LocalTaskJob
 from airflow.models import DAG, DagModel, DagBag, DagRun, Pool, TaskInstance as TI, \
-    errors
+    clear_task_instances, errors
+from airflow.models.serialized_dag import SerializedDagModel
 from airflow.models.slamiss import SlaMiss
 from airflow.operators.bash_operator import BashOperator
 from airflow.operators.dummy_operator import DummyOperator
 from airflow.task.task_runner.base_task_runner import BaseTaskRunner
+from airflow.ti_deps.dep_context import DepContext
 from airflow.utils import timezone
 from airflow.utils.dag_processing import SimpleDag, SimpleDagBag, list_py_file_paths
 from airflow.utils.dates import days_ago
@@ -59,6 +61,7 @@ from airflow.utils.db import provide_session
 from airflow.utils.net import get_hostname
 from airflow.utils.state import State
 from airflow.utils.timeout import timeout
+from airflow.utils.trigger_rule import TriggerRule
 from tests.core import TEST_DAG_FOLDER
 from tests.executors.test_executor import TestExecutor
 
@@ -1500,6 +1503,63 @@ class SchedulerJobTest(unittest.TestCase):
         ti1.refresh_from_db()
         self.assertEqual(ti1.state, State.SUCCESS)
 
+    def test_process_executor_events_in_one_query(self):
+        dag = DAG(dag_id='test_process_executor_events_in_one_query',
+                  start_date=DEFAULT_DATE)
+        tasks = [DummyOperator(dag=dag, task_id='dummy_task_{}'.format(i))
+                 for i in range(20)]
+        dagbag = self._make_simple_dag_bag([dag])
+
+        executor = TestExecutor()
+        with create_session() as session:
+            for task in tasks:
+                ti = TI(task, DEFAULT_DATE)
+                ti.state = State.SUCCESS
+                session.merge(ti)
+                executor.success(ti.key, info={'external_id': task.task_id})
+
+        scheduler = SchedulerJob()
+        scheduler.executor = executor
+        statements = []
+
+        def record_statement(conn, cursor, statement, *args):
+            if 'FROM task_instance' in statement:
+                statements.append(statement)
+
+        sqlalchemy.event.listen(sqlalchemy.engine.Engine, 'before_cursor_execute',
+                                record_statement)
+        try:
+            scheduler._process_executor_events(simple_dag_bag=dagbag)
+        finally:
+            sqlalchemy.event.remove(sqlalchemy.engine.Engine, 'before_cursor_execute',
+                                    record_statement)
+
+        self.assertEqual(1, len(statements))
+        self.assertEqual({}, executor.event_buffer)
+        self.assertEqual({}, executor.event_info)
+
+    def test_process_executor_events_reports_executor_info(self):
+        dag = DAG(dag_id='test_process_executor_events_reports_executor_info',
+                  start_date=DEFAULT_DATE)
+        task = DummyOperator(dag=dag, task_id='dummy_task')
+        dagbag = self._make_simple_dag_bag([dag])
+
+        ti = TI(task, DEFAULT_DATE)
+        ti.state = State.QUEUED
+        with create_session() as session:
+            session.merge(ti)
+
+        executor = TestExecutor()
+        executor.fail(ti.key, info={'pod_id': 'dummy-pod'})
+        scheduler = SchedulerJob()
+        scheduler.executor = executor
+        with patch.object(scheduler.log, 'error') as mock_error:
+            scheduler._process_executor_events(simple_dag_bag=dagbag)
+
+        self.assertIn("Executor info: {'pod_id': 'dummy-pod'}", mock_error.call_args_list[0][0][0])
+        ti.refresh_from_db()
+        self.assertEqual(State.FAILED, ti.state)
+
     def test_execute_task_instances_is_paused_wont_execute(self):
         dag_id = 'SchedulerJobTest.test_execute_task_instances_is_paused_wont_execute'
         task_id_1 = 'dummy_task'
@@ -1662,6 +1722,60 @@ class SchedulerJobTest(unittest.TestCase):
         self.assertIn(tis[1].key, res_keys)
         self.assertIn(tis[3].key, res_keys)
 
+    def test_find_executable_task_instances_running_counts(self):
+        """
+        Pool slots and DAG concurrency are computed from the running and queued
+        task instances without querying per pool or per DAG.
+        """
+        dag_id = 'SchedulerJobTest.test_find_executable_task_instances_running_counts'
+        dag = DAG(dag_id=dag_id, start_date=DEFAULT_DATE, concurrency=2)
+        task1 = DummyOperator(dag=dag, task_id='dummy1', pool='a')
+        task2 = DummyOperator(dag=dag, task_id='dummy2', pool='a')
+        task3 = DummyOperator(dag=dag, task_id='dummy3')
+        dagbag = self._make_simple_dag_bag([dag])
+
+        scheduler = SchedulerJob()
+        session = settings.Session()
+
+        dr1 = scheduler.create_dag_run(dag)
+        dr2 = scheduler.create_dag_run(dag)
+
+        ti1_1 = TI(task1, dr1.execution_date, state=State.RUNNING)
+        ti2_1 = TI(task2, dr1.execution_date, state=State.SCHEDULED)
+        ti3_1 = TI(task3, dr1.execution_date, state=State.QUEUED)
+        ti1_2 = TI(task1, dr2.execution_date, state=State.SCHEDULED)
+        ti3_2 = TI(task3, dr2.execution_date, state=State.SCHEDULED)
+        for ti in [ti1_1, ti2_1, ti3_1, ti1_2, ti3_2]:
+            session.merge(ti)
+        session.add(models.Pool(pool='a', slots=2, description='haha'))
+        session.commit()
+
+        with patch.object(models.Pool, 'open_slots') as mock_open_slots, \
+                patch.object(DAG, 'get_num_task_instances') as mock_num_tis:
+            res = scheduler._find_executable_task_instances(
+                dagbag,
+                states=[State.SCHEDULED],
+                session=session)
+            mock_open_slots.assert_not_called()
+            mock_num_tis.assert_not_called()
+        session.commit()
+
+        # the DAG already has two running or queued task instances
+        self.assertEqual(0, len(res))
+
+        dag.concurrency = 16
+        dagbag = self._make_simple_dag_bag([dag])
+        res = scheduler._find_executable_task_instances(
+            dagbag,
+            states=[State.SCHEDULED],
+            session=session)
+        session.commit()
+
+        # one slot left in pool 'a' plus the non pooled task instance
+        self.assertEqual(2, len(res))
+        res_keys = [ti.key for ti in res]
+        self.assertIn(ti3_2.key, res_keys)
+
     def test_nonexistent_pool(self):
         dag_id = 'SchedulerJobTest.test_nonexistent_pool'
         task_id = 'dummy_wrong_pool'
@@ -2609,6 +2723,133 @@ class SchedulerJobTest(unittest.TestCase):
             (dag.dag_id, dag_task1.task_id, DEFAULT_DATE, TRY_NUMBER)
         )
 
+    def test_scheduler_process_task_instances_incremental(self):
+        """
+        Test that in incremental mode _process_task_instances only re-evaluates
+        the task instances with a finished upstream task instance, whatever their
+        end_date, and evaluates the dag run in full periodically.
+        """
+        dag = DAG(
+            dag_id='test_scheduler_process_task_instances_incremental',
+            start_date=DEFAULT_DATE)
+        op1 = DummyOperator(task_id='op1', dag=dag, owner='airflow')
+        op2 = DummyOperator(task_id='op2', dag=dag, owner='airflow')
+        op3 = DummyOperator(task_id='op3', dag=dag, owner='airflow')
+        op1.set_downstream(op2)
+        op2.set_downstream(op3)
+
+        with create_session() as session:
+            orm_dag = DagModel(dag_id=dag.dag_id)
+            session.merge(orm_dag)
+
+        scheduler = SchedulerJob()
+        scheduler.incremental_scheduling = True
+        scheduler.incremental_scheduling_full_interval = 300
+        dag.clear()
+        dr = scheduler.create_dag_run(dag)
+        self.assertIsNotNone(dr)
+
+        # the first pass evaluates the dag run in full
+        queue = Mock()
+        scheduler._process_task_instances(dag, queue=queue)
+        queue.append.assert_called_once_with(
+            (dag.dag_id, op1.task_id, DEFAULT_DATE, TRY_NUMBER))
+        last_scheduling_decision = DagRun.find(
+            dag_id=dag.dag_id, execution_date=DEFAULT_DATE)[0].last_scheduling_decision
+        self.assertIsNotNone(last_scheduling_decision)
+
+        with create_session() as session:
+            ti = dr.get_task_instance(op1.task_id, session=session)
+            ti.set_state(State.SUCCESS, session=session)
+
+        # only the downstream of the finished task instance is evaluated
+        queue = Mock()
+        scheduler._process_task_instances(dag, queue=queue)
+        queue.append.assert_called_once_with(
+            (dag.dag_id, op2.task_id, DEFAULT_DATE, TRY_NUMBER))
+
+        with create_session() as session:
+            ti = dr.get_task_instance(op2.task_id, session=session)
+            ti.set_state(State.QUEUED, session=session)
+        queue = Mock()
+        scheduler._process_task_instances(dag, queue=queue)
+        queue.append.assert_not_called()
+
+        # a task instance that finished with an end_date before the last
+        # scheduling decision, e.g. from a worker with a late clock, is not missed
+        with create_session() as session:
+            ti = dr.get_task_instance(op2.task_id, session=session)
+            ti.state = State.FAILED
+            ti.end_date = last_scheduling_decision - datetime.timedelta(hours=1)
+            session.merge(ti)
+        queue = Mock()
+        scheduler._process_task_instances(dag, queue=queue)
+        queue.append.assert_not_called()
+        self.assertEqual(dr.get_task_instance(op3.task_id).state, State.UPSTREAM_FAILED)
+
+        # clearing makes the scheduler examine the dag run in full again
+        with create_session() as session:
+            ti = dr.get_task_instance(op2.task_id, session=session)
+            clear_task_instances([ti], session)
+        queue = Mock()
+        with patch.object(scheduler, '_get_task_instances_to_reevaluate') as reevaluate:
+            scheduler._process_task_instances(dag, queue=queue)
+        reevaluate.assert_not_called()
+        queue.append.assert_called_once_with(
+            (dag.dag_id, op2.task_id, DEFAULT_DATE, TRY_NUMBER))
+
+        # and so does the full evaluation interval
+        scheduler.incremental_scheduling_full_interval = 0
+        queue = Mock()
+        with patch.object(scheduler, '_get_task_instances_to_reevaluate') as reevaluate:
+            scheduler._process_task_instances(dag, queue=queue)
+        reevaluate.assert_not_called()
+        queue.append.assert_called_once_with(
+            (dag.dag_id, op2.task_id, DEFAULT_DATE, TRY_NUMBER))
+
+    def test_get_task_instances_to_reevaluate(self):
+        """
+        Test that the task instances re-evaluated in incremental mode include the
+        tasks without upstream tasks and with the dummy trigger rule, and that the
+        finished task instances are loaded into the dep context
+        """
+        dag = DAG(
+            dag_id='test_get_task_instances_to_reevaluate',
+            start_date=DEFAULT_DATE)
+        op1 = DummyOperator(task_id='op1', dag=dag, owner='airflow')
+        op2 = DummyOperator(task_id='op2', dag=dag, owner='airflow')
+        op3 = DummyOperator(task_id='op3', dag=dag, owner='airflow',
+                            trigger_rule=TriggerRule.DUMMY)
+        op1.set_downstream([op2, op3])
+
+        with create_session() as session:
+            orm_dag = DagModel(dag_id=dag.dag_id)
+            session.merge(orm_dag)
+
+        scheduler = SchedulerJob()
+        dag.clear()
+        dr = scheduler.create_dag_run(dag)
+
+        dep_context = DepContext(flag_upstream_failed=True)
+        tis = scheduler._get_task_instances_to_reevaluate(dag, dr, dep_context)
+        self.assertEqual({op1.task_id, op3.task_id}, {ti.task_id for ti in tis})
+        self.assertEqual([], dep_context.finished_tasks)
+
+        with create_session() as session:
+            ti = dr.get_task_instance(op1.task_id, session=session)
+            ti.set_state(State.RUNNING, session=session)
+        dep_context = DepContext(flag_upstream_failed=True)
+        tis = scheduler._get_task_instances_to_reevaluate(dag, dr, dep_context)
+        self.assertEqual([op3.task_id], [ti.task_id for ti in tis])
+
+        with create_session() as session:
+            ti = dr.get_task_instance(op1.task_id, session=session)
+            ti.set_state(State.SUCCESS, session=session)
+        dep_context = DepContext(flag_upstream_failed=True)
+        tis = scheduler._get_task_instances_to_reevaluate(dag, dr, dep_context)
+        self.assertEqual({op2.task_id, op3.task_id}, {ti.task_id for ti in tis})
+        self.assertEqual([op1.task_id], [ti.task_id for ti in dep_context.finished_tasks])
+
     def test_scheduler_do_not_schedule_removed_task(self):
         dag = DAG(
             dag_id='test_scheduler_do_not_schedule_removed_task',
@@ -2988,6 +3229,61 @@ class SchedulerJobTest(unittest.TestCase):
         self.assertIsNotNone(dr)
         self.assertEqual(dr.execution_date, timezone.datetime(2016, 1, 1, 10, 10))
 
+    def test_process_file_stores_serialized_dags(self):
+        dag_file = os.path.join(TEST_DAG_FOLDER, 'test_scheduler_dags.py')
+        dag_ids = ['test_start_date_scheduling', 'test_task_start_date_scheduling']
+        with create_session() as session:
+            session.query(SerializedDagModel).filter(
+                SerializedDagModel.dag_id.in_(dag_ids)).delete(synchronize_session=False)
+
+        configuration.conf.set('core', 'store_serialized_dags', 'True')
+        try:
+            SchedulerJob().process_file(dag_file, zombies=[])
+        finally:
+            configuration.conf.set('core', 'store_serialized_dags', 'False')
+
+        with create_session() as session:
+            stored = session.query(SerializedDagModel).filter(
+                SerializedDagModel.dag_id.in_(dag_ids)).all()
+            self.assertEqual(sorted(dag_ids), sorted(row.dag_id for row in stored))
+            self.assertTrue(all(row.fileloc == dag_file for row in stored))
+
+    def test_scheduler_loop_profiler(self):
+        profile_file = os.path.join(mkdtemp(), 'scheduler.prof')
+        scheduler = SchedulerJob(num_runs=1,
+                                 executor=TestExecutor(),
+                                 subdir=os.path.join(settings.DAGS_FOLDER, "no_dags.py"),
+                                 profile_loops=1,
+                                 profile_file=profile_file)
+        scheduler.heartrate = 0
+        scheduler.run()
+
+        self.assertTrue(len(scheduler.loop_profiler.loops) > 0)
+        phases = scheduler.loop_profiler.loops[0]['phases']
+        for phase in ('harvest_simple_dags', 'executor_heartbeat',
+                      'process_executor_events'):
+            self.assertIn(phase, phases)
+        self.assertTrue(os.path.exists(profile_file))
+        shutil.rmtree(os.path.dirname(profile_file))
+
+    def test_scheduler_loop_profiler_failed_loop(self):
+        profile_file = os.path.join(mkdtemp(), 'scheduler.prof')
+        self.addCleanup(shutil.rmtree, os.path.dirname(profile_file))
+        executor = TestExecutor()
+        scheduler = SchedulerJob(num_runs=1,
+                                 executor=executor,
+                                 subdir=os.path.join(settings.DAGS_FOLDER, "no_dags.py"),
+                                 profile_loops=5,
+                                 profile_file=profile_file)
+        scheduler.heartrate = 0
+        with patch.object(executor, 'heartbeat', side_effect=ValueError('failed')):
+            scheduler.run()
+
+        # The failed loop is recorded and its profile dumped
+        self.assertEqual(1, len(scheduler.loop_profiler.loops))
+        self.assertIn('executor_heartbeat', scheduler.loop_profiler.loops[0]['phases'])
+        self.assertTrue(os.path.exists(profile_file))
+
     def test_scheduler_reschedule(self):
         """
         Checks if tasks that are not taken up by the executor
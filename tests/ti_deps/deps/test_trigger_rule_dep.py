@@ -20,8 +20,9 @@
 import unittest
 from datetime import datetime
 
-from airflow.models import BaseOperator, TaskInstance
+from airflow.models import BaseOperator, DAG, TaskInstance
 from airflow.utils.trigger_rule import TriggerRule
+from airflow.ti_deps.dep_context import DepContext
 from airflow.ti_deps.deps.trigger_rule_dep import TriggerRuleDep
 from airflow.utils.state import State
 
@@ -293,3 +294,44 @@ class TriggerRuleDepTest(unittest.TestCase):
 
         self.assertEqual(len(dep_statuses), 1)
         self.assertFalse(dep_statuses[0].passed)
+
+    def test_get_states_count_upstream_ti(self):
+        """
+        Upstream states are counted from the finished task instances of the dag run
+        """
+        ti = self._get_task_instance(
+            upstream_task_ids=['runme_0', 'runme_1', 'runme_2', 'runme_3', 'runme_4'])
+        finished_task_states = {
+            'runme_0': State.SUCCESS,
+            'runme_1': State.SKIPPED,
+            'runme_2': State.FAILED,
+            'runme_3': State.UPSTREAM_FAILED,
+            'not_upstream': State.SUCCESS,
+        }
+        self.assertEqual(
+            TriggerRuleDep._get_states_count_upstream_ti(ti, finished_task_states),
+            (1, 1, 1, 1, 4))
+
+    def test_finished_tasks_from_dep_context(self):
+        """
+        The trigger rule is evaluated from the finished tasks of the context without
+        querying the database
+        """
+        dag = DAG('test_dag', start_date=datetime(2015, 1, 1))
+        task = BaseOperator(task_id='test_task', dag=dag)
+        upstream_tis = []
+        for task_id in ['runme_0', 'runme_1']:
+            upstream = BaseOperator(task_id=task_id, dag=dag)
+            upstream.set_downstream(task)
+            upstream_tis.append(TaskInstance(task=upstream, state=State.SUCCESS,
+                                             execution_date=None))
+        ti = TaskInstance(task=task, execution_date=None)
+
+        dep_context = DepContext(finished_tasks=upstream_tis)
+        self.assertTrue(TriggerRuleDep().is_met(
+            ti=ti, session="Fake Session", dep_context=dep_context))
+
+        upstream_tis[1].state = State.FAILED
+        dep_context = DepContext(finished_tasks=upstream_tis)
+        self.assertFalse(TriggerRuleDep().is_met(
+            ti=ti, session="Fake Session", dep_context=dep_context))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import imp
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import unittest
+
+from mock import patch
+
+from airflow import configuration as conf
+from airflow.models import DagBag, DagModel
+from airflow.utils import timezone
+from airflow.utils.dag_parse_cache import DagParseCache, imported_module_names
+from airflow.utils.db import create_session
+
+DAG_FILE = textwrap.dedent("""
+    from airflow.models import DAG
+    from airflow.operators.python_operator import PythonOperator
+    from airflow.utils.dates import days_ago
+
+    from {helper} import SUFFIX
+
+
+    def callable_in_file():
+        return 'called' + SUFFIX
+
+
+    dag = DAG('parse_cache_dag', start_date=days_ago(1))
+    PythonOperator(task_id='task', python_callable=callable_in_file, dag=dag)
+""")
+
+
+class TestDagParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dag_folder = tempfile.mkdtemp()
+        self.cache_folder = tempfile.mkdtemp()
+        self.helper = 'parse_cache_helper_{}'.format(os.getpid())
+        self.helper_path = os.path.join(self.dag_folder, self.helper + '.py')
+        self.dag_path = os.path.join(self.dag_folder, 'parse_cache_dag.py')
+        with open(self.helper_path, 'w') as f:
+            f.write("SUFFIX = '!'\n")
+        with open(self.dag_path, 'w') as f:
+            f.write(DAG_FILE.format(helper=self.helper))
+
+        conf.set('core', 'dag_parse_cache', 'True')
+        conf.set('core', 'dag_parse_cache_folder', self.cache_folder)
+        self.dags_folder_patch = patch('airflow.settings.DAGS_FOLDER', self.dag_folder)
+        self.dags_folder_patch.start()
+        sys.path.insert(0, self.dag_folder)
+
+    def tearDown(self):
+        sys.path.remove(self.dag_folder)
+        sys.modules.pop(self.helper, None)
+        self.dags_folder_patch.stop()
+        conf.set('core', 'dag_parse_cache', 'False')
+        shutil.rmtree(self.dag_folder)
+        shutil.rmtree(self.cache_folder)
+
+    def _make_dagbag(self):
+        return DagBag(dag_folder=self.dag_path, include_examples=False)
+
+    def test_imported_module_names(self):
+        source = b"import os.path\nfrom airflow import models\nfrom . import local\n"
+        self.assertEqual({'os.path', 'airflow', 'airflow.models'},
+                         imported_module_names(source))
+
+    def test_unchanged_file_is_not_imported_again(self):
+        dagbag = self._make_dagbag()
+        self.assertIn('parse_cache_dag', dagbag.dags)
+
+        with patch('airflow.models.imp.load_source') as mock_load_source:
+            dagbag = self._make_dagbag()
+            mock_load_source.assert_not_called()
+
+        dag = dagbag.get_dag('parse_cache_dag')
+        self.assertEqual(self.dag_path, dag.fileloc)
+        self.assertEqual('called!', dag.get_task('task').python_callable())
+
+    def test_expired_dag_is_loaded_once(self):
+        self._make_dagbag()
+        self.addCleanup(self._delete_dag_model)
+        with create_session() as session:
+            session.merge(DagModel(dag_id='parse_cache_dag', fileloc=self.dag_path,
+                                   last_expired=timezone.utcnow()))
+
+        # The cached DAG is loaded after it was expired, so it is up to date
+        loaded = timezone.utcnow()
+        cache = DagParseCache(self.cache_folder, self.dag_folder)
+        self.assertGreaterEqual(cache.get(self.dag_path)[0].last_loaded, loaded)
+
+        dagbag = self._make_dagbag()
+        with patch.object(DagBag, 'process_file', autospec=True,
+                          side_effect=DagBag.process_file) as process_file:
+            dag = dagbag.get_dag('parse_cache_dag')
+            self.assertIs(dag, dagbag.get_dag('parse_cache_dag'))
+        process_file.assert_not_called()
+
+    @staticmethod
+    def _delete_dag_model():
+        with create_session() as session:
+            session.query(DagModel).filter(DagModel.dag_id == 'parse_cache_dag').delete()
+
+    def test_changed_file_is_imported_again(self):
+        self._make_dagbag()
+        with open(self.dag_path, 'a') as f:
+            f.write("\n# changed\n")
+
+        cache = DagParseCache(self.cache_folder, self.dag_folder)
+        self.assertIsNone(cache.get(self.dag_path))
+
+    def test_changed_local_import_is_imported_again(self):
+        self._make_dagbag()
+        cache = DagParseCache(self.cache_folder, self.dag_folder)
+        self.assertIsNotNone(cache.get(self.dag_path))
+
+        with open(self.helper_path, 'w') as f:
+            f.write("SUFFIX = '?'\n")
+        self.assertIsNone(cache.get(self.dag_path))
+
+    def test_changed_transitive_local_import_is_imported_again(self):
+        nested = 'parse_cache_nested_{}'.format(os.getpid())
+        nested_path = os.path.join(self.dag_folder, nested + '.py')
+        self.addCleanup(sys.modules.pop, nested, None)
+        with open(nested_path, 'w') as f:
+            f.write("SUFFIX = '!'\n")
+        with open(self.helper_path, 'w') as f:
+            f.write("from {} import SUFFIX\n".format(nested))
+        self._make_dagbag()
+        cache = DagParseCache(self.cache_folder, self.dag_folder)
+        self.assertIsNotNone(cache.get(self.dag_path))
+
+        with open(nested_path, 'w') as f:
+            f.write("SUFFIX = '?'\n")
+        self.assertIsNone(cache.get(self.dag_path))
+
+    def test_file_changed_during_import_is_imported_again(self):
+        load_source = imp.load_source
+
+        def edit_and_load_source(name, path):
+            module = load_source(name, path)
+            with open(self.dag_path, 'a') as f:
+                f.write("\n# changed\n")
+            return module
+
+        with patch('airflow.models.imp.load_source', side_effect=edit_and_load_source):
+            self._make_dagbag()
+
+        cache = DagParseCache(self.cache_folder, self.dag_folder)
+        self.assertIsNone(cache.get(self.dag_path))
@@ -18,21 +18,25 @@
 # under the License.
 
 import os
+import shutil
 import sys
 import tempfile
+import time
 import unittest
 from datetime import timedelta
 
+import mock
 from mock import MagicMock
 
 from airflow import configuration as conf
 from airflow.configuration import mkdir_p
-from airflow.jobs import DagFileProcessor
+from airflow.jobs import DagFileProcessor, DagFileProcessorWorker
 from airflow.jobs import LocalTaskJob as LJ
 from airflow.models import DagBag, TaskInstance as TI
 from airflow.utils import timezone
-from airflow.utils.dag_processing import (DagFileProcessorAgent, DagFileProcessorManager,
-                                          SimpleTaskInstance)
+from airflow.utils.dag_processing import (DagFileIndex, DagFileProcessorAgent,
+                                          DagFileProcessorManager, SimpleTaskInstance,
+                                          INotify)
 from airflow.utils.db import create_session
 from airflow.utils.state import State
 
@@ -41,6 +45,8 @@ TEST_DAG_FOLDER = os.path.join(
 
 DEFAULT_DATE = timezone.datetime(2016, 1, 1)
 
+DAG_FILE_CONTENT = "from airflow import DAG\n"
+
 SETTINGS_FILE_VALID = """
 LOGGING_CONFIG = {
     'version': 1,
@@ -175,6 +181,148 @@ class TestDagFileProcessorManager(unittest.TestCase):
         manager.set_file_paths(['abc.txt'])
         self.assertDictEqual(manager._processors, {'abc.txt': mock_processor})
 
+    def test_preload_modules(self):
+        manager = DagFileProcessorManager(
+            dag_directory='directory',
+            file_paths=['abc.txt'],
+            max_runs=1,
+            processor_factory=MagicMock().return_value,
+            signal_conn=MagicMock(),
+            stat_queue=MagicMock(),
+            result_queue=MagicMock,
+            async_mode=True)
+
+        preload_modules = conf.get('scheduler', 'dag_processor_preload_modules')
+        conf.set('scheduler', 'dag_processor_preload_modules',
+                 'airflow.does_not_exist, airflow.operators.bash_operator')
+        try:
+            with mock.patch('airflow.utils.dag_processing.import_module',
+                            side_effect=[ImportError, None]) as mock_import_module:
+                manager._preload_modules()
+        finally:
+            conf.set('scheduler', 'dag_processor_preload_modules', preload_modules)
+
+        # a module that fails to import does not prevent the others from loading
+        mock_import_module.assert_has_calls([
+            mock.call('airflow.does_not_exist'),
+            mock.call('airflow.operators.bash_operator'),
+        ])
+
+    def test_refresh_dag_dir_queues_changed_files_first(self):
+        dag_directory = tempfile.mkdtemp()
+        try:
+            file_paths = [os.path.join(dag_directory, name) for name in ('a.py', 'b.py')]
+            for file_path in file_paths:
+                with open(file_path, 'w') as f:
+                    f.write(DAG_FILE_CONTENT)
+
+            manager = DagFileProcessorManager(
+                dag_directory=dag_directory,
+                file_paths=file_paths,
+                max_runs=-1,
+                processor_factory=MagicMock().return_value,
+                signal_conn=MagicMock(),
+                stat_queue=MagicMock(),
+                result_queue=MagicMock,
+                async_mode=True)
+            manager._refresh_dag_dir()
+            self.assertTrue(set(file_paths).issubset(manager.file_paths))
+
+            manager._file_path_queue = list(file_paths)
+            with open(file_paths[1], 'a') as f:
+                f.write("# changed\n")
+            manager.last_dag_dir_refresh_time = timezone.datetime(2000, 1, 1)
+            manager._refresh_dag_dir()
+
+            self.assertEqual(file_paths[::-1], manager._file_path_queue)
+        finally:
+            shutil.rmtree(dag_directory)
+
+    def _make_manager(self, file_paths, parallelism=None):
+        manager = DagFileProcessorManager(
+            dag_directory='directory',
+            file_paths=file_paths,
+            max_runs=-1,
+            processor_factory=MagicMock(),
+            signal_conn=MagicMock(),
+            stat_queue=MagicMock(),
+            result_queue=MagicMock,
+            async_mode=True)
+        if parallelism is not None:
+            manager._parallelism = parallelism
+        return manager
+
+    def test_order_file_paths(self):
+        manager = self._make_manager(['new.py', 'later.py', 'sooner.py', 'unscheduled.py'])
+        now = timezone.utcnow()
+        for file_path in ['later.py', 'sooner.py', 'unscheduled.py']:
+            manager._last_finish_time[file_path] = now
+            manager._last_runtime[file_path] = 1.0
+        manager._next_schedule['later.py'] = now + timedelta(hours=1)
+        manager._next_schedule['sooner.py'] = now + timedelta(minutes=1)
+
+        self.assertEqual(['new.py', 'sooner.py', 'later.py', 'unscheduled.py'],
+                         manager._order_file_paths(
+                             ['unscheduled.py', 'later.py', 'sooner.py', 'new.py']))
+
+    def test_spread_expensive_file_paths(self):
+        file_paths = ['{}.py'.format(i) for i in range(6)]
+        manager = self._make_manager(file_paths)
+        for i, file_path in enumerate(file_paths):
+            manager._last_runtime[file_path] = 30.0 if i < 2 else 1.0
+
+        self.assertEqual(['0.py', '2.py', '3.py', '1.py', '4.py', '5.py'],
+                         manager._spread_expensive_file_paths(file_paths))
+
+    @mock.patch('airflow.utils.dag_processing.Stats')
+    def test_queue_wait_time_metric(self, mock_stats):
+        manager = self._make_manager(['a.py', 'b.py'], parallelism=1)
+        manager._find_zombies = MagicMock(return_value=[])
+
+        manager.heartbeat()
+        self.assertEqual(1, len(manager._processors))
+        self.assertEqual(1, len(manager._file_path_queue))
+        mock_stats.timing.assert_called_once_with('dag_processing.queue_wait_time',
+                                                  mock.ANY)
+        self.assertEqual(list(manager._queued_time), manager._file_path_queue)
+
+    @mock.patch('airflow.utils.dag_processing.multiprocessing.Process')
+    def test_refresh_dag_state_stats(self, mock_process):
+        manager = self._make_manager(['a.py'])
+        manager._dag_state_stats_refresh_interval = 30
+
+        mock_process.return_value.is_alive.return_value = True
+        manager._refresh_dag_state_stats()
+        manager._last_dag_state_stats_refresh_time -= timedelta(seconds=30)
+        # The previous count is still running
+        manager._refresh_dag_state_stats()
+        mock_process.return_value.start.assert_called_once_with()
+
+        mock_process.return_value.is_alive.return_value = False
+        manager._refresh_dag_state_stats()
+        self.assertEqual(2, mock_process.return_value.start.call_count)
+        # Not refreshed again before the interval
+        manager._refresh_dag_state_stats()
+        self.assertEqual(2, mock_process.return_value.start.call_count)
+
+        manager._dag_state_stats_refresh_interval = 0
+        manager._last_dag_state_stats_refresh_time = None
+        manager._refresh_dag_state_stats()
+        self.assertEqual(2, mock_process.return_value.start.call_count)
+
+    @mock.patch('airflow.utils.dag_processing.Stats')
+    @mock.patch('airflow.utils.dag_processing.DagStateStats')
+    def test_dag_state_stats_refresh_process(self, mock_dag_state_stats, mock_stats):
+        with mock.patch('airflow.utils.dag_processing.multiprocessing.Process') as mock_process:
+            DagFileProcessorManager._launch_dag_state_stats_refresh()
+        helper = mock_process.call_args[1]['target']
+        with mock.patch('airflow.settings.configure_orm'), \
+                mock.patch('airflow.settings.dispose_orm'):
+            helper()
+        mock_dag_state_stats.refresh.assert_called_once_with()
+        mock_stats.timing.assert_called_once_with('dag_processing.dag_state_stats_refresh',
+                                                  mock.ANY)
+
     def test_find_zombies(self):
         manager = DagFileProcessorManager(
             dag_directory='directory',
@@ -215,6 +363,127 @@ class TestDagFileProcessorManager(unittest.TestCase):
             session.query(LJ).delete()
 
 
+class TestDagFileIndex(unittest.TestCase):
+    def setUp(self):
+        self.dag_directory = tempfile.mkdtemp()
+        self.dag_file = self._write('dag.py', DAG_FILE_CONTENT)
+        self.other_file = self._write('other.py', "import os\n")
+        self._write('ignored_dag.py', DAG_FILE_CONTENT)
+        self._write('.airflowignore', "ignored\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dag_directory)
+
+    def _write(self, name, content):
+        file_path = os.path.join(self.dag_directory, name)
+        with open(file_path, 'w') as f:
+            f.write(content)
+        return file_path
+
+    def test_refresh_only_examines_changed_files(self):
+        index = DagFileIndex(self.dag_directory, include_examples=False)
+        self.assertEqual([self.dag_file], index.refresh())
+        self.assertEqual([self.dag_file], index.file_paths)
+
+        with mock.patch('airflow.utils.dag_processing.might_contain_dag') as mock_might_contain:
+            self.assertEqual([], index.refresh())
+            mock_might_contain.assert_not_called()
+
+        self._write('other.py', DAG_FILE_CONTENT + "import os\n")
+        os.remove(self.dag_file)
+        self.assertEqual([self.other_file], index.refresh())
+        self.assertEqual([self.other_file], index.file_paths)
+
+    def test_refresh_applies_changed_ignore_patterns(self):
+        index = DagFileIndex(self.dag_directory, include_examples=False)
+        index.refresh()
+
+        self._write('.airflowignore', "other\n")
+        ignored_dag_file = os.path.join(self.dag_directory, 'ignored_dag.py')
+        self.assertEqual([ignored_dag_file], index.refresh())
+        self.assertEqual([self.dag_file, ignored_dag_file], index.file_paths)
+
+    @unittest.skipIf(INotify is None, "inotify_simple is not installed")
+    def test_refresh_from_events(self):
+        index = DagFileIndex(self.dag_directory, include_examples=False,
+                             use_inotify=True)
+        try:
+            index.refresh()
+            self.assertIsNone(index.refresh_from_events())
+
+            new_dag_file = self._write('new_dag.py', DAG_FILE_CONTENT)
+            os.remove(self.dag_file)
+            self.assertEqual([new_dag_file], index.refresh_from_events())
+            self.assertEqual([new_dag_file], index.file_paths)
+
+            os.mkdir(os.path.join(self.dag_directory, 'subdir'))
+            subdir_dag_file = self._write(os.path.join('subdir', 'dag.py'),
+                                          DAG_FILE_CONTENT)
+            self.assertEqual([subdir_dag_file], index.refresh_from_events())
+            self.assertEqual([new_dag_file, subdir_dag_file], index.file_paths)
+        finally:
+            index.close()
+
+
+class TestDagFileProcessorWorker(unittest.TestCase):
+
+    def setUp(self):
+        conf.set('scheduler', 'dag_processor_reuse_processes', 'True')
+        self.dag_path = os.path.join(TEST_DAG_FOLDER, 'test_scheduler_dags.py')
+
+    def tearDown(self):
+        conf.set('scheduler', 'dag_processor_reuse_processes', 'False')
+        for worker in DagFileProcessorWorker._idle_workers:
+            worker.terminate()
+            worker.join()
+        del DagFileProcessorWorker._idle_workers[:]
+
+    @staticmethod
+    def _process(file_path):
+        processor = DagFileProcessor(file_path, False, [], [])
+        processor.start()
+        timeout = time.time() + 60
+        while not processor.done and time.time() < timeout:
+            time.sleep(0.1)
+        return processor
+
+    def test_files_are_processed_by_the_same_worker(self):
+        first_processor = self._process(self.dag_path)
+        second_processor = self._process(self.dag_path)
+
+        self.assertEqual(first_processor.pid, second_processor.pid)
+        self.assertIn('test_start_date_scheduling',
+                      [simple_dag.dag_id for simple_dag in second_processor.result])
+        self.assertEqual(1, len(DagFileProcessorWorker._idle_workers))
+
+    def test_terminated_worker_is_not_reused(self):
+        processor = DagFileProcessor(self.dag_path, False, [], [])
+        processor.start()
+        processor.terminate(sigkill=True)
+        self.assertTrue(processor.done)
+        self.assertIsNone(processor.result)
+
+        self.assertNotEqual(processor.pid, self._process(self.dag_path).pid)
+
+    def test_unload_dag_modules(self):
+        dag_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dag_folder)
+        module_name = 'dag_processor_worker_helper_{}'.format(os.getpid())
+        with open(os.path.join(dag_folder, module_name + '.py'), 'w') as f:
+            f.write("VALUE = 1\n")
+        sys.path.insert(0, dag_folder)
+        self.addCleanup(sys.path.remove, dag_folder)
+
+        modules = set(sys.modules)
+        __import__(module_name)
+        __import__('airflow.operators.email_operator')
+        DagFileProcessorWorker._unload_dag_modules(
+            modules, os.path.join(dag_folder, 'dag.py'))
+
+        self.assertNotIn(module_name, sys.modules)
+        self.assertIn('airflow.operators.email_operator', sys.modules)
+
+
 class TestDagFileProcessorAgent(unittest.TestCase):
     def test_reload_module(self):
         """
@@ -20,9 +20,14 @@
 import logging
 import logging.config
 import os
+import shutil
+import tempfile
 import unittest
+
+import mock
 import six
 
+from airflow import configuration as conf
 from airflow.models import TaskInstance, DAG, DagRun
 from airflow.config_templates.airflow_local_settings import DEFAULT_LOGGING_CONFIG
 from airflow.operators.dummy_operator import DummyOperator
@@ -161,6 +166,117 @@ class TestFileTaskLogHandler(unittest.TestCase):
         os.remove(log_filename)
 
 
+class TestFileTaskHandlerChunks(unittest.TestCase):
+
+    def setUp(self):
+        self.log_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_folder)
+        chunk_size = conf.get('webserver', 'log_chunk_size')
+        self.addCleanup(conf.set, 'webserver', 'log_chunk_size', chunk_size)
+        conf.set('webserver', 'log_chunk_size', '10')
+
+        dag = DAG('dag_for_testing_log_chunks', start_date=DEFAULT_DATE)
+        task = DummyOperator(task_id='task_for_testing_log_chunks', dag=dag)
+        self.ti = TaskInstance(task=task, execution_date=DEFAULT_DATE)
+        self.ti.state = State.SUCCESS
+        self.ti.hostname = 'worker'
+        self.handler = FileTaskHandler(self.log_folder, '{task_id}/{try_number}.log')
+
+    def _write_log(self, content):
+        os.mkdir(os.path.join(self.log_folder, self.ti.task_id))
+        self.location = os.path.join(self.log_folder, self.ti.task_id, '1.log')
+        with open(self.location, 'wb') as f:
+            f.write(content)
+
+    def test_read_by_chunks_of_lines(self):
+        self._write_log(b'line 1\nline 2\nline 3')
+
+        log, metadata = self.handler._read(self.ti, 1)
+        self.assertEqual(log, '*** Reading local file: {}\nline 1\n'.format(self.location))
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 7, 'header_shown': True})
+
+        log, metadata = self.handler._read(self.ti, 1, metadata)
+        self.assertEqual(log, 'line 2\n')
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 14, 'header_shown': True})
+
+        log, metadata = self.handler._read(self.ti, 1, metadata)
+        self.assertEqual(log, 'line 3')
+        self.assertEqual(metadata, {'end_of_log': True, 'offset': 20, 'header_shown': True})
+
+    def test_read_long_line(self):
+        self._write_log(b'a line longer than a chunk\n')
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 0, 'download_logs': True})
+        self.assertTrue(log.endswith('a line lon'))
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 10, 'header_shown': True})
+
+    def test_read_running_task(self):
+        self.ti.state = State.RUNNING
+        self._write_log(b'line 1\nline')
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 0})
+        self.assertTrue(log.endswith('line 1\n'))
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 7, 'header_shown': True})
+
+        # The last line is only read once it is complete
+        log, metadata = self.handler._read(self.ti, 1, metadata)
+        self.assertEqual(log, '')
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 7, 'header_shown': True})
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 7, 'download_logs': True})
+        self.assertEqual(log, 'line')
+        self.assertEqual(metadata, {'end_of_log': True, 'offset': 11, 'header_shown': True})
+
+    def test_header_is_shown_once(self):
+        self.ti.state = State.RUNNING
+        self._write_log(b'')
+
+        log, metadata = self.handler._read(self.ti, 1)
+        self.assertEqual(log, '*** Reading local file: {}\n'.format(self.location))
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 0, 'header_shown': True})
+
+        # Nothing was written yet, the log is read from the same offset again
+        log, metadata = self.handler._read(self.ti, 1, metadata)
+        self.assertEqual(log, '')
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 0, 'header_shown': True})
+
+    def test_read_previous_try_of_running_task(self):
+        self.ti.state = State.RUNNING
+        self.ti.try_number = 2
+        self._write_log(b'line 1\nline')
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 7})
+        self.assertEqual(log, 'line')
+        self.assertEqual(metadata, {'end_of_log': True, 'offset': 11, 'header_shown': True})
+
+    @mock.patch('airflow.utils.log.file_task_handler.requests')
+    def test_read_range_from_worker(self, mock_requests):
+        mock_requests.get.return_value.status_code = 206
+        mock_requests.get.return_value.content = b'line 2\nlin'
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 7})
+        self.assertEqual(log, 'line 2\n')
+        self.assertEqual(metadata, {'end_of_log': False, 'offset': 14, 'header_shown': True})
+        self.assertEqual(mock_requests.get.call_args[1]['headers'], {'Range': 'bytes=7-16'})
+
+    @mock.patch('airflow.utils.log.file_task_handler.requests')
+    def test_read_from_worker_ignoring_range(self, mock_requests):
+        mock_requests.get.return_value.status_code = 200
+        mock_requests.get.return_value.content = b'line 1\nline 2\n'
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 7})
+        self.assertEqual(log, 'line 2\n')
+        self.assertEqual(metadata, {'end_of_log': True, 'offset': 14, 'header_shown': True})
+
+    @mock.patch('airflow.utils.log.file_task_handler.requests')
+    def test_read_after_end_of_worker_log(self, mock_requests):
+        mock_requests.get.return_value.status_code = 416
+
+        log, metadata = self.handler._read(self.ti, 1, {'offset': 14})
+        self.assertEqual(log, '')
+        self.assertEqual(metadata, {'end_of_log': True, 'offset': 14, 'header_shown': True})
+
+
 class TestFilenameRendering(unittest.TestCase):
 
     def setUp(self):
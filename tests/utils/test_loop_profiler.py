@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from airflow import settings
+from airflow.utils.loop_profiler import LoopProfiler
+
+
+class TestLoopProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @mock.patch('airflow.utils.loop_profiler.Stats')
+    def test_phases_are_timed_and_count_queries(self, mock_stats):
+        report_path = os.path.join(self.tmp_dir, 'report.json')
+        profiler = LoopProfiler('test.loop', report_path=report_path, report_size=2)
+        connection = settings.engine.connect()
+        profiler.start()
+        try:
+            for _ in range(3):
+                profiler.start_loop()
+                with profiler.phase('two_queries'):
+                    connection.execute('SELECT 1')
+                    connection.execute('SELECT 1')
+                with profiler.phase('no_query'):
+                    pass
+                loop = profiler.end_loop()
+        finally:
+            profiler.stop()
+
+        self.assertEqual(['two_queries', 'no_query'], list(loop['phases']))
+        self.assertEqual(2, loop['phases']['two_queries']['queries'])
+        self.assertEqual(0, loop['phases']['no_query']['queries'])
+        self.assertEqual(2, loop['queries'])
+        mock_stats.timing.assert_any_call('test.loop.two_queries', mock.ANY)
+        mock_stats.timing.assert_any_call('test.loop.duration', mock.ANY)
+        mock_stats.gauge.assert_any_call('test.loop.two_queries.queries', 2)
+
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(2, len(report['loops']))
+        self.assertEqual(2, report['loops'][-1]['queries'])
+
+        # queries are not counted once the profiler is stopped
+        with profiler.phase('stopped'):
+            connection.execute('SELECT 1')
+        connection.close()
+        mock_stats.gauge.assert_called_with('test.loop.stopped.queries', 0)
+
+    @mock.patch('airflow.utils.loop_profiler.Stats')
+    def test_paused_queries_are_not_counted(self, mock_stats):
+        profiler = LoopProfiler('test.loop')
+        connection = settings.engine.connect()
+        profiler.start()
+        try:
+            profiler.start_loop()
+            with profiler.phase('one_query'):
+                connection.execute('SELECT 1')
+                with profiler.paused():
+                    connection.execute('SELECT 1')
+            loop = profiler.end_loop()
+        finally:
+            profiler.stop()
+            connection.close()
+
+        self.assertEqual(1, loop['phases']['one_query']['queries'])
+        self.assertEqual(1, loop['queries'])
+
+    def test_profile_is_dumped_after_loops(self):
+        profile_path = os.path.join(self.tmp_dir, 'loops.prof')
+        profiler = LoopProfiler('test.loop', profile_loops=2, profile_path=profile_path)
+
+        for i in range(2):
+            self.assertFalse(os.path.exists(profile_path))
+            profiler.start_loop()
+            with profiler.phase('sort'):
+                sorted(range(1000), reverse=True)
+            profiler.end_loop()
+
+        self.assertTrue(os.path.exists(profile_path))
+        stats = pstats.Stats(profile_path)
+        self.assertTrue(any('sorted' in func[2] for func in stats.stats))
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+#
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import random
+import unittest
+
+from airflow.utils.priority_queue import IndexedPriorityQueue
+
+
+class TestIndexedPriorityQueue(unittest.TestCase):
+
+    def _make_queue(self, priorities):
+        queue = IndexedPriorityQueue(priority=lambda value: value[1])
+        for key, priority in priorities:
+            queue[key] = (key, priority)
+        return queue
+
+    def test_mapping(self):
+        queue = self._make_queue([('a', 1), ('b', 3), ('c', 2)])
+
+        self.assertEqual(['a', 'b', 'c'], list(queue))
+        self.assertEqual(3, len(queue))
+        self.assertIn('b', queue)
+        self.assertEqual(('c', 2), queue['c'])
+        self.assertEqual(('b', 3), queue.pop('b'))
+        self.assertNotIn('b', queue)
+        self.assertEqual([('a', ('a', 1)), ('c', ('c', 2))], list(queue.items()))
+
+        queue.clear()
+        self.assertEqual(0, len(queue))
+        self.assertEqual([], queue.highest(1))
+        self.assertRaises(KeyError, queue.pop_highest)
+
+    def test_pop_highest_keeps_insertion_order_of_equal_priorities(self):
+        queue = self._make_queue([('a', 1), ('b', 2), ('c', 1), ('d', 2)])
+
+        self.assertEqual(['b', 'd', 'a', 'c'],
+                         [queue.pop_highest()[0] for _ in range(4)])
+
+    def test_highest_does_not_remove(self):
+        queue = self._make_queue([('a', 1), ('b', 3), ('c', 2), ('d', 5)])
+
+        self.assertEqual([('d', ('d', 5)), ('b', ('b', 3))], queue.highest(2))
+        self.assertEqual(4, len(queue))
+
+    def test_update_priority(self):
+        queue = self._make_queue([('a', 1), ('b', 3), ('c', 2)])
+        queue['a'] = ('a', 4)
+        queue['b'] = ('b', 0)
+
+        self.assertEqual(['a', 'b', 'c'], list(queue))
+        self.assertEqual(['a', 'c', 'b'], [key for key, _ in queue.highest(3)])
+
+    def test_matches_sorting(self):
+        rand = random.Random(42)
+        queue = self._make_queue([(i, rand.randint(0, 20)) for i in range(200)])
+        for key in rand.sample(range(200), 80):
+            if rand.random() < 0.5:
+                del queue[key]
+            else:
+                queue[key] = (key, rand.randint(0, 20))
+
+        expected = sorted(queue.items(), key=lambda item: item[1][1], reverse=True)
+        self.assertEqual(expected[:10], queue.highest(10))
+        self.assertEqual(expected, [queue.pop_highest() for _ in range(len(queue))])
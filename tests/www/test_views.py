@@ -40,9 +40,11 @@ from werkzeug.test import Client
 from airflow import configuration as conf
 from airflow import models, settings
 from airflow.config_templates.airflow_local_settings import DEFAULT_LOGGING_CONFIG
+from airflow.dag.serialization import SerializedDagBag
 from airflow.jobs import BaseJob
 from airflow.models import DAG, DagRun, TaskInstance
 from airflow.models.connection import Connection
+from airflow.models.serialized_dag import SerializedDagModel
 from airflow.operators.dummy_operator import DummyOperator
 from airflow.settings import Session
 from airflow.utils import dates, timezone
@@ -461,6 +463,57 @@ class TestAirflowBaseViews(TestBase):
         url = 'tree?dag_id=example_bash_operator'
         resp = self.client.get(url, follow_redirects=True)
         self.check_content_in_response('runme_1', resp)
+        # The structure is fetched by the page, to be cached by the browser
+        self.check_content_in_response(
+            '/object/tree_structure?dag_id=example_bash_operator', resp)
+
+    def test_tree_structure(self):
+        url = 'object/tree_structure?dag_id=example_bash_operator'
+        resp = self.client.get(url, follow_redirects=True)
+        self.assertEqual(resp.status_code, 200)
+        structure = json.loads(resp.data.decode('utf-8'))
+        task_ids = [task['task_id'] for task in structure['tasks']]
+        self.assertEqual(sorted(task_ids), sorted(self.bash_dag.task_ids))
+        self.assertEqual(len(task_ids), len(set(task_ids)))
+        run_this = structure['tasks'][task_ids.index('run_this_last')]
+        self.assertEqual(sorted(task_ids[i] for i in run_this['upstream']),
+                         ['also_run_this', 'run_after_loop'])
+        self.assertEqual([task_ids[i] for i in structure['roots']], ['run_this_last'])
+
+        etag = resp.headers['ETag']
+        resp = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+
+    def test_tree_structure_with_root(self):
+        url = 'object/tree_structure?dag_id=example_bash_operator&root=run_after_loop'
+        resp = self.client.get(url, follow_redirects=True)
+        structure = json.loads(resp.data.decode('utf-8'))
+        self.assertEqual(sorted(task['task_id'] for task in structure['tasks']),
+                         ['run_after_loop', 'runme_0', 'runme_1', 'runme_2'])
+
+    def test_tree_states(self):
+        ti = self.bash_dagrun.get_task_instance('runme_1')
+        ti.set_state(State.SUCCESS)
+
+        url = 'object/tree_states?dag_id=example_bash_operator&base_date={}&num_runs=2'.format(
+            self.percent_encode(self.EXAMPLE_DAG_DEFAULT_DATE.isoformat()))
+        resp = self.client.get(url, follow_redirects=True)
+        states = json.loads(resp.data.decode('utf-8'))
+        self.assertEqual(states['dag_runs'][-1]['run_id'], self.run_id)
+        self.assertEqual(len(states['states']), len(states['task_ids']))
+
+        row = states['task_ids'].index('runme_1')
+        self.assertEqual(states['state_names'][states['states'][row][-1]], State.SUCCESS)
+        row = states['task_ids'].index('runme_0')
+        self.assertIsNone(states['state_names'][states['states'][row][-1]])
+
+    def test_tree_states_before_first_run(self):
+        url = 'object/tree_states?dag_id=example_bash_operator&base_date={}'.format(
+            self.percent_encode(datetime(2000, 1, 1).isoformat()))
+        resp = self.client.get(url, follow_redirects=True)
+        states = json.loads(resp.data.decode('utf-8'))
+        self.assertEqual(states['dates'], [])
+        self.assertEqual(states['states'], [[] for _ in states['task_ids']])
 
     def test_duration(self):
         url = 'duration?days=30&dag_id=example_bash_operator'
@@ -558,6 +611,27 @@ class TestAirflowBaseViews(TestBase):
         self.session.commit()
 
 
+class TestAirflowBaseViewsWithSerializedDags(TestAirflowBaseViews):
+    """
+    Runs the views on the DAGs serialized by the scheduler.
+    """
+
+    def setUp(self):
+        super(TestAirflowBaseViewsWithSerializedDags, self).setUp()
+        for dag in models.DagBag(include_examples=True).dags.values():
+            SerializedDagModel.write_dag(dag)
+        patcher = mock.patch('airflow.www.views.dagbag', SerializedDagBag())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_tree_uses_serialized_dag(self):
+        url = 'tree?dag_id=example_bash_operator'
+        with mock.patch('airflow.models.DagBag.process_file') as mock_process_file:
+            resp = self.client.get(url, follow_redirects=True)
+        self.check_content_in_response(['runme_1', 'BashOperator'], resp)
+        mock_process_file.assert_not_called()
+
+
 class TestConfigurationView(TestBase):
     def test_configuration_do_not_expose_config(self):
         self.logout()
@@ -681,6 +755,42 @@ class TestLogView(TestBase):
         self.assertEqual(200, response.status_code)
         self.assertIn('Log for testing.', response.data.decode('utf-8'))
 
+    def test_get_logs_with_metadata_as_download_file_by_chunks(self):
+        chunk_size = conf.get('webserver', 'log_chunk_size')
+        self.addCleanup(conf.set, 'webserver', 'log_chunk_size', chunk_size)
+        conf.set('webserver', 'log_chunk_size', '4')
+
+        url_template = "get_logs_with_metadata?dag_id={}&" \
+                       "task_id={}&execution_date={}&" \
+                       "try_number={}&metadata={}&format=file"
+        url = url_template.format(self.DAG_ID,
+                                  self.TASK_ID,
+                                  quote_plus(self.DEFAULT_DATE.isoformat()),
+                                  1,
+                                  json.dumps({}))
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        self.assertIn('Log for testing.', response.data.decode('utf-8'))
+
+    def test_get_logs_with_metadata_returns_offset(self):
+        url_template = "get_logs_with_metadata?dag_id={}&" \
+                       "task_id={}&execution_date={}&" \
+                       "try_number={}&metadata={}"
+        response = self.client.get(url_template.format(self.DAG_ID,
+                                                       self.TASK_ID,
+                                                       quote_plus(self.DEFAULT_DATE.isoformat()),
+                                                       1,
+                                                       json.dumps({})))
+        metadata = json.loads(response.data.decode('utf-8'))['metadata']
+
+        response = self.client.get(url_template.format(self.DAG_ID,
+                                                       self.TASK_ID,
+                                                       quote_plus(self.DEFAULT_DATE.isoformat()),
+                                                       1,
+                                                       json.dumps(metadata)))
+        self.assertGreater(metadata['offset'], 0)
+        self.assertNotIn('Log for testing.', response.data.decode('utf-8'))
+
     def test_get_logs_with_metadata(self):
         url_template = "get_logs_with_metadata?dag_id={}&" \
                        "task_id={}&execution_date={}&" \